@@ -21,6 +21,23 @@ class Settings:
     cloudinary_api_key: str | None = field(default_factory=lambda: os.getenv("CLOUDINARY_API_KEY"))
     cloudinary_api_secret: str | None = field(default_factory=lambda: os.getenv("CLOUDINARY_API_SECRET"))
     cloudinary_upload_folder: str = field(default_factory=lambda: os.getenv("CLOUDINARY_UPLOAD_FOLDER", "dcrm/csv"))
+    # Archive for raw uploads: "cloudinary", "s3" or "local"
+    object_storage_backend: str = field(
+        default_factory=lambda: os.getenv("OBJECT_STORAGE_BACKEND", "cloudinary").strip().lower()
+    )
+    s3_bucket: str | None = field(default_factory=lambda: os.getenv("S3_BUCKET"))
+    s3_prefix: str = field(default_factory=lambda: os.getenv("S3_PREFIX", "dcrm/csv/"))
+    s3_endpoint_url: str | None = field(default_factory=lambda: os.getenv("S3_ENDPOINT_URL"))
+    s3_region: str | None = field(default_factory=lambda: os.getenv("S3_REGION") or os.getenv("AWS_REGION"))
+    local_storage_dir: Path = field(
+        default_factory=lambda: Path(os.getenv("LOCAL_STORAGE_DIR", str(BASE_DIR / "storage" / "objects")))
+    )
+    # Optional public URL prefix for locally stored objects; file:// URIs are returned otherwise.
+    local_storage_base_url: str | None = field(default_factory=lambda: os.getenv("LOCAL_STORAGE_BASE_URL"))
+    # Local SHA-256 -> archived object index, consulted before the rate-limited Cloudinary Admin API.
+    object_index_dir: Path = field(
+        default_factory=lambda: Path(os.getenv("OBJECT_INDEX_DIR", str(BASE_DIR / "storage" / "object-index")))
+    )
 
     def __post_init__(self) -> None:
         if self.cloudinary_url:
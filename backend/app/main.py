@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .routers import (
     analyses,
@@ -15,21 +20,43 @@ from .routers import (
     uploads,
     waveforms,
 )
+from .repositories.test_results import test_result_writer
+from .services import inference_executor, upload_jobs, warmup
+from .services.inference_executor import InferenceSaturatedError
 
 
 from .db import database
 
+# ML libraries and model artifacts are not imported here; warmup loads them after startup.
+warmup.record("import app", time.perf_counter() - _import_started)
+
 app = FastAPI(title="DCRM Monitor API", version="0.1.0")
 
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    with warmup.timed("database connect"):
+        await database.connect()
+    upload_jobs.start()
+    warmup.start()
 
 @app.on_event("shutdown")
 async def shutdown():
+    warmup.stop()
+    await upload_jobs.shutdown()
+    inference_executor.shutdown()
+    await test_result_writer.flush()
     await database.disconnect()
 
 
+@app.exception_handler(InferenceSaturatedError)
+async def inference_saturated_handler(request: Request, exc: InferenceSaturatedError) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
 import os
 
 ALLOWED_ORIGINS = [
@@ -67,8 +94,18 @@ app.include_router(model_tests.router)
 
 @app.get("/healthz")
 async def healthcheck() -> dict[str, str]:
+    """Liveness: the process is up and serving, whether or not the models are loaded yet."""
     return {"status": "ok"}
 
+
+@app.get("/readyz")
+async def readiness() -> JSONResponse:
+    """Readiness: the models are loaded; 503 while warming up or when a model failed to load."""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warmup.is_ready() else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=warmup.report(),
+    )
+
 @app.get("/")
 async def root() -> dict[str, str]:
     return {"message": "DCRM API is running", "status": "online"}
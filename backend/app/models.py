@@ -92,12 +92,35 @@ class UploadResponse(BaseModel):
     secureUrl: AnyUrl
     bytes: int
     format: str
+    contentSha256: str | None = None
+    deduplicated: bool = False
     diagnostics: list[DiagnosticResult] | None = None
     diagnosticsProcessedRows: int | None = Field(default=None, ge=0)
     diagnosticsTotalRows: int | None = Field(default=None, ge=0)
     advancedDiagnostics: list[AdvancedDiagnosticResult] | None = None
     waveformPreview: WaveformPreview | None = None
     shap: ShapResponse | None = None
+    testResultId: str | None = None
+
+
+class WaveformAnalysisResponse(BaseModel):
+    publicId: str
+    diagnostics: list[DiagnosticResult] | None = None
+    diagnosticsProcessedRows: int | None = Field(default=None, ge=0)
+    diagnosticsTotalRows: int | None = Field(default=None, ge=0)
+    advancedDiagnostics: list[AdvancedDiagnosticResult] | None = None
+    waveformPreview: WaveformPreview | None = None
+    shap: ShapResponse | None = None
+
+
+class UploadJob(BaseModel):
+    jobId: str
+    status: str
+    fileName: str
+    includeShap: bool = False
+    error: str | None = None
+    createdAt: datetime
+    updatedAt: datetime
 
 
 class ShapValues(BaseModel):
@@ -166,6 +189,10 @@ class AdvancedModelArtifact(BaseModel):
 
 class AdvancedModelsStatus(BaseModel):
     directory: str
+    version: str
+    loadedAt: datetime
+    loadSeconds: float = Field(..., ge=0)
+    previousVersions: list[str]
     artifactCount: int = Field(..., ge=0)
     featureCount: int = Field(..., ge=0)
     classLabels: list[str]
@@ -173,6 +200,18 @@ class AdvancedModelsStatus(BaseModel):
     artifacts: list[AdvancedModelArtifact]
 
 
+class ModelReloadRequest(BaseModel):
+    version: str | None = None
+
+
+class ModelRegistryStatus(BaseModel):
+    activeVersion: str
+    loadedAt: datetime
+    loadSeconds: float = Field(..., ge=0)
+    previousVersions: list[str]
+    availableVersions: list[str]
+
+
 class AdvancedFeaturesResponse(BaseModel):
     features: list[str]
     classLabels: list[str]
@@ -202,14 +241,12 @@ class AdvancedBatchPredictionRequest(BaseModel):
     rows: list[dict[str, Any]]
 
 
-class WaveformPoint(BaseModel):
-    timeMs: float
-    values: dict[str, float | None]
-
-
 class WaveformPreview(BaseModel):
-    rowCount: int = Field(..., ge=1)
+    rowCount: int = Field(..., ge=1, description="Samples per series in this preview")
+    totalRows: int = Field(..., ge=1, description="Samples in the source trace before decimation")
+    downsampling: str | None = Field(default=None, description="Decimation method, or null when every sample is included")
     sourceName: str | None = None
     valueColumns: list[str]
     columnMap: dict[str, str] | None = None
-    points: list[WaveformPoint]
+    timeMs: list[float]
+    series: dict[str, list[float | None]]
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import secrets
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TEST_RESULTS_TABLE = "test_results"
+# Rows per INSERT statement and the longest a queued row waits before being flushed.
+TEST_RESULTS_BATCH_SIZE = max(1, int(os.getenv("TEST_RESULTS_BATCH_SIZE", "200")))
+TEST_RESULTS_FLUSH_MS = max(0.0, float(os.getenv("TEST_RESULTS_FLUSH_MS", "500")))
+# Queued rows beyond this are dropped with a warning instead of growing without bound.
+TEST_RESULTS_MAX_QUEUED = max(1, int(os.getenv("TEST_RESULTS_MAX_QUEUED", "10000")))
+
+# Column order of the bulk INSERT; Prisma fills none of these for rows written outside it.
+_COLUMNS = (
+    "id",
+    "breakerId",
+    "testDate",
+    "testType",
+    "fileName",
+    "fileUrl",
+    "testData",
+    "travelT1Max",
+    "velocityT1Max",
+    "resistanceCH1Avg",
+    "status",
+    "createdAt",
+    "updatedAt",
+    "componentHealth",
+)
+_JSON_COLUMNS = {"testData", "componentHealth"}
+
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+_cuid_counter = itertools.count(secrets.randbelow(36**4))
+
+
+def _base36(value: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        value, remainder = divmod(value, 36)
+        digits.append(_BASE36[remainder])
+    return "".join(reversed(digits))
+
+
+def new_cuid() -> str:
+    """Collision-resistant id in the shape of Prisma's ``cuid()`` (``c`` + time + counter + random)."""
+    return (
+        "c"
+        + _base36(int(time.time() * 1000), 8)
+        + _base36(next(_cuid_counter) % 36**4, 4)
+        + _base36(os.getpid() % 36**2, 2)
+        + _base36(secrets.randbits(64), 10)
+    )
+
+
+def build_test_result(
+    *,
+    breaker_id: str,
+    file_name: str,
+    file_url: Optional[str],
+    test_data: Dict[str, Any],
+    summary: Dict[str, Optional[float]],
+    component_health: Optional[Dict[str, Any]] = None,
+    test_type: str = "DCRM",
+    status: str = "COMPLETED",
+) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "id": new_cuid(),
+        "breakerId": breaker_id,
+        "testDate": now,
+        "testType": test_type,
+        "fileName": file_name,
+        "fileUrl": file_url,
+        "testData": test_data,
+        "travelT1Max": summary.get("travelT1Max"),
+        "velocityT1Max": summary.get("velocityT1Max"),
+        "resistanceCH1Avg": summary.get("resistanceCH1Avg"),
+        "status": status,
+        "createdAt": now,
+        "updatedAt": now,
+        "componentHealth": component_health,
+    }
+
+
+def diagnosis_summary(diagnostics_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-test roll-up of row-level diagnostics stored in ``testData``."""
+    diagnosis_counts = Counter(str(result["diagnosis"]) for result in diagnostics_results)
+    return {
+        "diagnosticsProcessedRows": len(diagnostics_results),
+        "primaryDiagnosis": diagnosis_counts.most_common(1)[0][0] if diagnosis_counts else None,
+        "diagnosisCounts": dict(diagnosis_counts),
+    }
+
+
+async def breaker_exists(breaker_id: str) -> bool:
+    """True if ``breaker_id`` is a row of ``breakers`` (``test_results.breakerId`` is a required FK)."""
+    from ..db import database
+
+    row = await database.fetch_one(query="SELECT 1 FROM breakers WHERE id = :id", values={"id": breaker_id})
+    return row is not None
+
+
+async def insert_test_results(records: List[Dict[str, Any]]) -> None:
+    """One multi-row ``INSERT ... VALUES`` for all ``records``."""
+    if not records:
+        return
+    from ..db import database
+
+    columns = ", ".join(f'"{column}"' for column in _COLUMNS)
+    rows = []
+    values: Dict[str, Any] = {}
+    for idx, record in enumerate(records):
+        placeholders = []
+        for column in _COLUMNS:
+            name = f"{column}_{idx}"
+            value = record.get(column)
+            if column in _JSON_COLUMNS:
+                placeholders.append(f"CAST(:{name} AS JSONB)")
+                value = json.dumps(value) if value is not None else None
+            else:
+                placeholders.append(f":{name}")
+            values[name] = value
+        rows.append(f"({', '.join(placeholders)})")
+    query = f"INSERT INTO {TEST_RESULTS_TABLE} ({columns}) VALUES {', '.join(rows)}"
+    await database.execute(query=query, values=values)
+
+
+class TestResultWriter:
+    """Write-behind queue: callers enqueue rows and return; a flusher inserts them in batches.
+
+    A batch is written once ``batch_size`` rows are waiting or ``flush_ms`` after the first
+    one arrived, whichever comes first. Rows of unrelated uploads share a batch, so a batch
+    that fails is retried row by row and only the offending rows are lost.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = TEST_RESULTS_BATCH_SIZE,
+        flush_ms: float = TEST_RESULTS_FLUSH_MS,
+        max_queued: int = TEST_RESULTS_MAX_QUEUED,
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.flush_ms = max(0.0, flush_ms)
+        self.max_queued = max(1, max_queued)
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def enqueue(self, record: Dict[str, Any]) -> None:
+        if len(self._pending) >= self.max_queued:
+            self.dropped += 1
+            logger.warning("Test result queue full (%d rows); dropping %s", self.max_queued, record.get("id"))
+            return
+        self._pending.append(record)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            self._pending = self._pending[self.batch_size :]
+            try:
+                await insert_test_results(batch)
+            except Exception:
+                if len(batch) == 1:
+                    self._record_failure(batch[0])
+                else:
+                    logger.warning("Bulk insert of %d test results failed; retrying row by row", len(batch), exc_info=True)
+                    await self._insert_one_by_one(batch)
+            else:
+                self.written += len(batch)
+            if len(self._pending) < self.batch_size:
+                break
+
+    async def _insert_one_by_one(self, batch: List[Dict[str, Any]]) -> None:
+        for record in batch:
+            try:
+                await insert_test_results([record])
+            except Exception:
+                self._record_failure(record)
+            else:
+                self.written += 1
+
+    def _record_failure(self, record: Dict[str, Any]) -> None:
+        self.failed += 1
+        logger.exception("Failed to persist test result %s (breaker %s)", record.get("id"), record.get("breakerId"))
+
+    async def flush(self) -> None:
+        """Writes everything queued so far; used on shutdown and by bulk importers."""
+        while self._pending:
+            await self._flush_pending()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": len(self._pending), "written": self.written, "failed": self.failed, "dropped": self.dropped}
+
+
+test_result_writer = TestResultWriter()
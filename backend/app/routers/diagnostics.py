@@ -3,17 +3,31 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import Any, Dict
+from concurrent.futures import BrokenExecutor
+from typing import Any, Dict, Tuple
 
 from fastapi import APIRouter, Body, HTTPException, status
 
 from ..services import diagnostics_service
+from ..services.inference_executor import run_inference
+from ..services.micro_batcher import MicroBatcher
+from ..services.prediction_cache import PredictionCache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/diagnostics", tags=["diagnostics"])
 
 
+async def _score_rows(rows: list[Dict[str, Any]]) -> list[Tuple[str, Dict[str, Any]]]:
+    # The worker reports the bundle version it scored with; the result cache is keyed on it.
+    version, results = await run_inference(diagnostics_service.predict_batch_versioned, rows)
+    return [(version, result) for result in results]
+
+
+_predict_batcher: MicroBatcher[Dict[str, Any], Tuple[str, Dict[str, Any]]] = MicroBatcher(_score_rows)
+_prediction_cache = PredictionCache()
+
+
 @router.get("/features")
 async def get_features() -> Dict[str, Any]:
     try:
@@ -24,13 +38,30 @@ async def get_features() -> Dict[str, Any]:
     return {"features": features}
 
 
+@router.get("/cache")
+async def get_prediction_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the ``/predict`` result cache."""
+    return _prediction_cache.stats()
+
+
 @router.post("/predict")
 async def predict(features: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+    cache_key = _prediction_cache.key(features)
+    cached = _prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = _prediction_cache.generation
     try:
-        prediction = diagnostics_service.predict_single(features)
+        version, prediction = await _predict_batcher.submit(features)
+        _prediction_cache.set(cache_key, generation, version, prediction)
         logger.info("Diagnostics prediction result: %s", json.dumps(prediction))
         print("Diagnostics prediction result:", prediction)
         return prediction
+    except BrokenExecutor as exc:
+        # The executor recreates its worker pool on the next request.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Inference workers are restarting"
+        ) from exc
     except RuntimeError as exc:
         logger.exception("Prediction failed: %s", exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
\ No newline at end of file
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import BrokenExecutor
 from datetime import datetime
+from typing import Any
 
 from fastapi import APIRouter, HTTPException, status
 
@@ -12,12 +15,24 @@ from ..models import (
     AdvancedModelsStatus,
     AdvancedPredictionRequest,
     AdvancedPredictionEnvelope,
+    ModelRegistryStatus,
+    ModelReloadRequest,
 )
-from ..services import advanced_models_service
+from ..services import advanced_models_service, inference_executor, model_registry
+from ..services.inference_executor import run_inference
+from ..services.micro_batcher import MicroBatcher
 
 router = APIRouter(prefix="/api/v1/new-models", tags=["new-models"])
 
 
+async def _score_rows(rows: list[dict[str, Any]]) -> list[tuple[dict[str, Any], list[str]]]:
+    results, available_models = await run_inference(advanced_models_service.batch_predict_with_models, rows)
+    return [(result, available_models) for result in results]
+
+
+_row_batcher: MicroBatcher[dict[str, Any], tuple[dict[str, Any], list[str]]] = MicroBatcher(_score_rows)
+
+
 @router.get("/status", response_model=AdvancedModelsStatus)
 def get_models_status() -> AdvancedModelsStatus:
     try:
@@ -27,6 +42,29 @@ def get_models_status() -> AdvancedModelsStatus:
     return AdvancedModelsStatus(**payload)
 
 
+async def _swap_models(swap, *args: Any) -> ModelRegistryStatus:
+    # Loading and the canary check run off the event loop; requests keep using the old bundle meanwhile.
+    try:
+        await asyncio.to_thread(swap, *args)
+        payload = advanced_models_service.describe_registry()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    await inference_executor.warm_up()
+    return ModelRegistryStatus(**payload)
+
+
+@router.post("/reload", response_model=ModelRegistryStatus)
+async def reload_models(payload: ModelReloadRequest | None = None) -> ModelRegistryStatus:
+    """Activates ``version`` (default: the bundle named by ``CURRENT``) without a restart."""
+    return await _swap_models(model_registry.reload, payload.version if payload else None)
+
+
+@router.post("/rollback", response_model=ModelRegistryStatus)
+async def rollback_models() -> ModelRegistryStatus:
+    """Re-activates the previously active bundle, which is still loaded."""
+    return await _swap_models(model_registry.rollback)
+
+
 @router.get("/features", response_model=AdvancedFeaturesResponse)
 def get_advanced_features() -> AdvancedFeaturesResponse:
     try:
@@ -37,24 +75,31 @@ def get_advanced_features() -> AdvancedFeaturesResponse:
 
 
 @router.post("/predict", response_model=AdvancedPredictionEnvelope)
-def predict_single(payload: AdvancedPredictionRequest) -> AdvancedPredictionEnvelope:
+async def predict_single(payload: AdvancedPredictionRequest) -> AdvancedPredictionEnvelope:
     try:
-        prediction = advanced_models_service.predict_row(payload.features)
+        prediction, available_models = await _row_batcher.submit(payload.features)
         result = AdvancedDiagnosticResult(rowIndex=0, **prediction)
+    except BrokenExecutor as exc:
+        # The executor recreates its worker pool on the next request.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Inference workers are restarting"
+        ) from exc
     except RuntimeError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     return AdvancedPredictionEnvelope(
         requestedAt=datetime.utcnow(),
         featuresUsed=list(payload.features.keys()),
-        availableModels=advanced_models_service.get_available_model_names(),
+        availableModels=available_models,
         result=result,
     )
 
 
 @router.post("/batch", response_model=AdvancedBatchPredictionEnvelope)
-def predict_batch(payload: AdvancedBatchPredictionRequest) -> AdvancedBatchPredictionEnvelope:
+async def predict_batch(payload: AdvancedBatchPredictionRequest) -> AdvancedBatchPredictionEnvelope:
     try:
-        results = advanced_models_service.batch_predict(payload.rows)
+        results, available_models = await run_inference(
+            advanced_models_service.batch_predict_with_models, payload.rows
+        )
     except RuntimeError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
@@ -64,6 +109,6 @@ def predict_batch(payload: AdvancedBatchPredictionRequest) -> AdvancedBatchPredi
     return AdvancedBatchPredictionEnvelope(
         requestedAt=datetime.utcnow(),
         rowCount=len(wrapped),
-        availableModels=advanced_models_service.get_available_model_names(),
+        availableModels=available_models,
         results=wrapped,
     )
@@ -1,258 +1,356 @@
 from __future__ import annotations
 
-import io
+import asyncio
 import logging
 import os
+import re
 import uuid
 from pathlib import Path
-
-import cloudinary
-import cloudinary.uploader
-import pandas as pd
-from fastapi import APIRouter, File, HTTPException, UploadFile, status
-
-from ..config import settings
-from ..models import UploadResponse, WaveformPoint, WaveformPreview
-from ..services import advanced_models_service, diagnostics_service, shap_service
+from typing import Any
+
+from fastapi import APIRouter, File, Header, HTTPException, Response, UploadFile, status
+
+from ..models import UploadJob, UploadResponse, WaveformAnalysisResponse
+from ..repositories.test_results import (
+    breaker_exists,
+    build_test_result,
+    diagnosis_summary,
+    test_result_writer,
+)
+from ..services import (
+    advanced_models_service,
+    diagnostics_service,
+    object_storage,
+    shap_service,
+    upload_jobs,
+    waveform_store,
+)
+from ..services.csv_ingest import IngestedCsv, SpooledUpload, ingest_csv, ingest_stored_waveform, spool_upload
+from ..services.inference_executor import InferenceSaturatedError, run_inference
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/uploads", tags=["uploads"])
 
-CLOUDINARY_CLOUD_NAME = settings.cloudinary_cloud_name
-CLOUDINARY_API_KEY = settings.cloudinary_api_key
-CLOUDINARY_API_SECRET = settings.cloudinary_api_secret
-CLOUDINARY_UPLOAD_FOLDER = settings.cloudinary_upload_folder
-MAX_DIAGNOSTIC_ROWS = int(os.getenv("UPLOAD_DIAGNOSTIC_ROW_LIMIT", "50"))
-MAX_WAVEFORM_POINTS = 600
-MAX_WAVEFORM_SERIES = 8
-# Column alias definitions to align incoming CSV headers with expected telemetry fields
-_COLUMN_ALIASES = {
-    "timeMs": [
-        "time_ms",
-        "time",
-        "timestamp",
-        "milliseconds",
-        "ms",
-        "t",
-    ],
-}
-
-
-def _normalize_column(name: str) -> str:
-    return (
-        name.strip()
-        .lower()
-        .replace(" ", "")
-        .replace("-", "")
-        .replace("/", "")
-        .replace("\\", "")
-        .replace("(", "")
-        .replace(")", "")
-        .replace("_", "")
-    )
+MAX_DIAGNOSTIC_ROWS = int(os.getenv("UPLOAD_DIAGNOSTIC_ROW_LIMIT", "5000"))
+_SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+@router.post("/", response_model=UploadResponse)
+async def upload_csv(
+    file: UploadFile = File(...),
+    include_shap: bool = False,  # Changed to simple query param (FastAPI default)
+    breaker_id: str | None = None,  # When set, the result is also recorded in test_results
+) -> UploadResponse:
+    _require_storage()
+
+    filename = file.filename or "upload.csv"
+    if not filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only .csv files are allowed")
+    await _require_breaker(breaker_id)
 
+    spooled = await _spool(file)
+    try:
+        return await _process_upload(filename, spooled, include_shap, breaker_id)
+    finally:
+        spooled.cleanup()
 
-def _slugify_column(name: str) -> str:
-    normalized = _normalize_column(name)
-    return normalized or "value"
 
+@router.post("/jobs", response_model=UploadJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_upload_job(
+    file: UploadFile = File(...), include_shap: bool = False, breaker_id: str | None = None
+) -> UploadJob:
+    """Accepts the CSV and runs the upload pipeline in the background; poll ``/jobs/{job_id}``."""
+    _require_storage()
 
-def _match_column(df: pd.DataFrame, aliases: list[str]) -> str | None:
-    normalized_aliases = {_normalize_column(alias) for alias in aliases}
-    for column in df.columns:
-        if _normalize_column(column) in normalized_aliases:
-            return column
-    return None
+    filename = file.filename or "upload.csv"
+    if not filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only .csv files are allowed")
+    await _require_breaker(breaker_id)
 
+    spooled = await _spool(file)
+    try:
+        job = await upload_jobs.get_job_store().create(filename, include_shap)
+    except Exception:
+        spooled.cleanup()
+        raise
 
-def _coerce_numeric(series_value: object) -> float | None:
-    if series_value is None or (isinstance(series_value, float) and pd.isna(series_value)):
-        return None
-    if isinstance(series_value, (int, float)):
-        return float(series_value)
-    if isinstance(series_value, str):
-        cleaned = series_value.replace(",", "").strip()
-        if not cleaned:
-            return None
+    async def run() -> dict[str, Any]:
         try:
-            return float(cleaned)
-        except ValueError:
-            return None
-    return None
-
-
-def _extract_waveform_preview(df: pd.DataFrame) -> WaveformPreview | None:
-    subset = df.iloc[:MAX_WAVEFORM_POINTS].copy()
-    time_column = _match_column(subset, _COLUMN_ALIASES["timeMs"])
-    if time_column:
-        time_series = pd.to_numeric(subset[time_column], errors="coerce")
-    else:
-        # Fallback: synthesize a time axis when CSV lacks explicit timestamps
-        time_series = pd.Series(
-            data=range(len(subset)),
-            index=subset.index,
-            dtype=float,
-        )
+            response = await _process_upload(filename, spooled, include_shap, breaker_id)
+        except HTTPException as exc:
+            raise upload_jobs.JobFailed(exc.status_code, str(exc.detail)) from exc
+        return response.model_dump(mode="json")
 
-    numeric_columns: list[tuple[str, pd.Series]] = []
-    for column in df.columns:
-        if column == time_column:
-            continue
-        numeric_series = pd.to_numeric(df[column], errors="coerce")
-        if numeric_series.notna().sum() == 0:
-            continue
-        numeric_columns.append((column, numeric_series))
-
-    if not numeric_columns:
-        return None
-
-    column_map: dict[str, str] = {}
-    ordered_columns: list[str] = []
-    for original, _ in numeric_columns:
-        slug = _slugify_column(original)
-        candidate = slug
-        suffix = 1
-        while candidate in column_map:
-            suffix += 1
-            candidate = f"{slug}{suffix}"
-        column_map[candidate] = original
-        ordered_columns.append(candidate)
-        if len(ordered_columns) >= MAX_WAVEFORM_SERIES:
-            break
-
-    points: list[WaveformPoint] = []
-    for idx, row in subset.iterrows():
-        raw_time = time_series.at[idx]
-        time_value = _coerce_numeric(raw_time)
-        if time_value is None:
-            continue
-
-        values: dict[str, float | None] = {}
-        for slug in ordered_columns:
-            original = column_map[slug]
-            values[slug] = _coerce_numeric(row.get(original))
-
-        points.append(
-            WaveformPoint(
-                timeMs=float(time_value),
-                values=values,
-            )
-        )
+    upload_jobs.submit_job(job["jobId"], run, retry_on=(InferenceSaturatedError,), cleanup=spooled.cleanup)
+    return UploadJob(**job)
+
+
+@router.get("/jobs/{job_id}", response_model=UploadJob)
+async def get_upload_job(job_id: str) -> UploadJob:
+    return UploadJob(**await _get_job(job_id))
 
-    if not points:
-        return None
 
-    return WaveformPreview(
-        rowCount=len(points),
-        sourceName=time_column or "row_index",
-        valueColumns=ordered_columns,
-        columnMap=column_map or None,
-        points=points,
+@router.get("/jobs/{job_id}/result", response_model=UploadResponse)
+async def get_upload_job_result(job_id: str) -> UploadResponse:
+    job = await _get_job(job_id)
+    if job["status"] == upload_jobs.JOB_FAILED:
+        raise HTTPException(
+            status_code=job["errorStatus"] or status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=job["error"] or "Upload processing failed",
+        )
+    if job["status"] != upload_jobs.JOB_SUCCEEDED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload job is {job['status']}")
+    if job["result"] is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload job result was already retrieved")
+    response = UploadResponse(**job["result"])
+    await upload_jobs.get_job_store().discard_result(job_id)
+    return response
+
+
+@router.post("/reanalyze/{public_id:path}", response_model=WaveformAnalysisResponse)
+async def reanalyze_upload(public_id: str, include_shap: bool = False) -> WaveformAnalysisResponse:
+    """Re-scores a previous upload from its stored waveform artifact, without re-parsing the CSV."""
+    waveform = await asyncio.to_thread(waveform_store.open_waveform, public_id)
+    if waveform is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No stored waveform for this upload")
+    if waveform.rows == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV has no data rows")
+
+    ingested = await asyncio.to_thread(
+        ingest_stored_waveform, waveform, diagnostic_rows=MAX_DIAGNOSTIC_ROWS, include_shap=include_shap
     )
+    diagnostics_results, advanced_results, shap_result = await _score_upload(ingested, waveform.sha256, include_shap)
+    return WaveformAnalysisResponse(
+        publicId=public_id,
+        diagnostics=diagnostics_results,
+        diagnosticsProcessedRows=len(diagnostics_results),
+        diagnosticsTotalRows=ingested.total_rows,
+        advancedDiagnostics=advanced_results or None,
+        waveformPreview=ingested.preview,
+        shap=shap_result,
+    )
+
+
+@router.get("/objects/{sha256}")
+async def read_archived_object(sha256: str, range_header: str | None = Header(default=None, alias="Range")) -> Response:
+    """Raw archived CSV by content hash; honours a single ``Range: bytes=start-end`` header."""
+    if not _SHA256_PATTERN.fullmatch(sha256):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a hex SHA-256 digest")
+    byte_range = _parse_range(range_header) if range_header else None
+    start, end = byte_range or (0, None)
 
-if settings.cloudinary_configured:
-    cloudinary.config(
-        cloud_name=CLOUDINARY_CLOUD_NAME,
-        api_key=CLOUDINARY_API_KEY,
-        api_secret=CLOUDINARY_API_SECRET,
-        secure=True,
+    storage = object_storage.get_storage()
+    try:
+        data = await asyncio.to_thread(storage.read_range, sha256, start, end)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Object not found") from exc
+
+    if byte_range is None:
+        return Response(content=data, media_type="text/csv")
+    if not data:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Range beyond end of object")
+    return Response(
+        content=data,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="text/csv",
+        headers={"Content-Range": f"bytes {start}-{start + len(data) - 1}/*"},
     )
-else:
-    logger.warning("Cloudinary configuration is incomplete. Upload endpoint will return 500 until configured.")
 
 
-@router.post("/", response_model=UploadResponse)
-async def upload_csv(
-    file: UploadFile = File(...),
-    include_shap: bool = False  # Changed to simple query param (FastAPI default)
-) -> UploadResponse:
-    if not settings.cloudinary_configured:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Cloudinary is not configured")
+def _parse_range(header: str) -> tuple[int, int | None]:
+    match = _RANGE_PATTERN.fullmatch(header.strip())
+    if match is None or not match.group(1):
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Only 'bytes=start-[end]' is supported"
+        )
+    start = int(match.group(1))
+    end = int(match.group(2)) + 1 if match.group(2) else None
+    if end is not None and end <= start:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Empty byte range")
+    return start, end
+
+
+async def _get_job(job_id: str) -> dict[str, Any]:
+    job = await upload_jobs.get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload job not found")
+    return job
+
+
+def _require_storage() -> None:
+    storage = object_storage.get_storage()
+    if not storage.configured:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{storage.name} is not configured"
+        )
+
+
+async def _require_breaker(breaker_id: str | None) -> None:
+    """Rejects unknown breakers up front; the write-behind insert would otherwise fail after we answered."""
+    if breaker_id and not await breaker_exists(breaker_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown breaker_id {breaker_id}")
+
+
+async def _spool(file: UploadFile) -> SpooledUpload:
+    try:
+        return await spool_upload(file)
+    finally:
+        await file.close()
 
-    filename = file.filename or "upload.csv"
-    if not filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only .csv files are allowed")
 
-    contents = await file.read()
-    if not contents:
+async def _process_upload(
+    filename: str, spooled: SpooledUpload, include_shap: bool, breaker_id: str | None = None
+) -> UploadResponse:
+    if spooled.size == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
 
     try:
-        dataframe = pd.read_csv(io.BytesIO(contents))
+        ingested = await asyncio.to_thread(
+            ingest_csv,
+            spooled.path,
+            expected_rows=max(0, spooled.line_count - 1),
+            diagnostic_rows=MAX_DIAGNOSTIC_ROWS,
+            include_shap=include_shap,
+            persist_sha256=spooled.sha256 if waveform_store.PERSIST_WAVEFORMS else None,
+        )
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid CSV format") from exc
 
-    if dataframe.empty:
+    try:
+        return await _score_and_archive(filename, spooled, ingested, include_shap, breaker_id)
+    finally:
+        if ingested.waveform is not None:
+            # No-op once committed; otherwise drops the staged artifact of a failed upload.
+            await asyncio.to_thread(ingested.waveform.discard)
+
+
+async def _score_and_archive(
+    filename: str, spooled: SpooledUpload, ingested: IngestedCsv, include_shap: bool, breaker_id: str | None
+) -> UploadResponse:
+    if ingested.total_rows == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV has no data rows")
 
+    # Archive the raw file while the models run; it is awaited once scoring is done.
+    storage = object_storage.get_storage()
+    public_id = f"{Path(filename).stem}-{uuid.uuid4().hex[:8]}"
+    archive = asyncio.ensure_future(
+        asyncio.to_thread(storage.put, spooled.path, public_id, spooled.size, spooled.sha256)
+    )
+    try:
+        diagnostics_results, advanced_results, shap_result = await _score_upload(
+            ingested, spooled.sha256, include_shap
+        )
+    except BaseException:
+        # The upload thread still reads the spooled file, which the caller deletes after we return.
+        await asyncio.gather(archive, return_exceptions=True)
+        raise
+
+    try:
+        stored = await archive
+    except Exception as exc:  # pragma: no cover - network call
+        logger.exception("%s upload failed: %s", storage.name, exc)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"{storage.name} upload failed") from exc
+
+    if ingested.waveform is not None:
+        try:
+            await asyncio.to_thread(ingested.waveform.commit, stored.public_id)
+        except (OSError, ValueError) as exc:
+            logger.warning("Could not persist waveform artifact for %s: %s", stored.public_id, exc)
+
+    test_result_id = None
+    if breaker_id:
+        # Write-behind: queued here, inserted in bulk by the writer shortly after.
+        record = build_test_result(
+            breaker_id=breaker_id,
+            file_name=filename,
+            file_url=stored.secure_url or None,
+            test_data=_test_data(stored, ingested, diagnostics_results),
+            summary=ingested.summary,
+            component_health=shap_result,
+        )
+        test_result_writer.enqueue(record)
+        test_result_id = record["id"]
+
+    return UploadResponse(
+        assetId=stored.asset_id,
+        publicId=stored.public_id,
+        secureUrl=stored.secure_url,
+        bytes=stored.bytes,
+        format=stored.format,
+        contentSha256=stored.sha256 or spooled.sha256,
+        deduplicated=stored.deduplicated,
+        diagnostics=diagnostics_results,
+        diagnosticsProcessedRows=len(diagnostics_results),
+        diagnosticsTotalRows=ingested.total_rows,
+        advancedDiagnostics=advanced_results or None,
+        waveformPreview=ingested.preview,
+        shap=shap_result,
+        testResultId=test_result_id,
+    )
+
+
+def _test_data(
+    stored: object_storage.StoredObject, ingested: IngestedCsv, diagnostics_results: list[dict[str, object]]
+) -> dict[str, Any]:
+    return {
+        "source": "api",
+        "publicId": stored.public_id,
+        "contentSha256": stored.sha256,
+        "totalRows": ingested.total_rows,
+        **diagnosis_summary(diagnostics_results),
+        "testResults": ingested.summary,
+    }
+
+
+async def _score_upload(
+    ingested: IngestedCsv, content_sha256: str, include_shap: bool
+) -> tuple[list[dict[str, object]], list[dict[str, object]], dict | None]:
     try:
-        diagnostics_service.ensure_models_ready()
+        await run_inference(diagnostics_service.check_models_ready)
     except RuntimeError as exc:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
 
     advanced_models_ready = True
     try:
-        advanced_models_service.ensure_advanced_models_ready()
+        await run_inference(advanced_models_service.check_advanced_models_ready)
     except RuntimeError as exc:
         advanced_models_ready = False
         logger.warning("Advanced model artifacts unavailable: %s", exc)
 
     diagnostics_results: list[dict[str, object]] = []
     advanced_results: list[dict[str, object]] = []
-    limited_dataframe = dataframe.head(MAX_DIAGNOSTIC_ROWS)
-    waveform_preview = _extract_waveform_preview(dataframe)
-    
+    limited_dataframe = ingested.head
+
     # Calculate SHAP if requested
     shap_result = None
     if include_shap:
-        try:
-            shap_result = shap_service.calculate_shap_for_waveform(dataframe)
-        except Exception as e:
-            logger.error(f"SHAP calculation error: {e}")
+        shap_key = shap_service.shap_cache_key(content_sha256)
+        shap_result = shap_service.get_cached_shap(shap_key)
+        if shap_result is None and ingested.window_features is not None:
+            try:
+                shap_result = await run_inference(shap_service.explain_window_features, ingested.window_features)
+            except Exception as e:
+                logger.error(f"SHAP calculation error: {e}")
+            if shap_result is not None:
+                shap_service.store_cached_shap(shap_key, shap_result)
 
-    for idx, row in limited_dataframe.iterrows():
-        try:
-            prediction = diagnostics_service.predict_single(row.to_dict())
-        except RuntimeError as exc:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    try:
+        predictions = await run_inference(diagnostics_service.predict_batch, limited_dataframe)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
+    for idx, prediction in zip(limited_dataframe.index, predictions):
         diagnostics_results.append({"rowIndex": int(idx), **prediction})
 
-        if advanced_models_ready:
-            try:
-                advanced_prediction = advanced_models_service.predict_row(row.to_dict())
+    if advanced_models_ready:
+        try:
+            advanced_predictions = await run_inference(advanced_models_service.batch_predict, limited_dataframe)
+        except RuntimeError as exc:  # pragma: no cover - batch specific issues
+            logger.warning("Advanced model prediction failed: %s", exc)
+        else:
+            for idx, advanced_prediction in zip(limited_dataframe.index, advanced_predictions):
                 advanced_results.append({"rowIndex": int(idx), **advanced_prediction})
-            except RuntimeError as exc:  # pragma: no cover - row specific issues
-                logger.warning("Advanced model prediction failed for row %s: %s", idx, exc)
-
-    public_id = f"{Path(filename).stem}-{uuid.uuid4().hex[:8]}"
-
-    try:
-        result = cloudinary.uploader.upload(
-            contents,
-            resource_type="raw",
-            folder=CLOUDINARY_UPLOAD_FOLDER,
-            public_id=public_id,
-            overwrite=False,
-            format="csv",
-        )
-    except Exception as exc:  # pragma: no cover - network call
-        logger.exception("Cloudinary upload failed: %s", exc)
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Cloudinary upload failed") from exc
-    finally:
-        await file.close()
 
-    return UploadResponse(
-        assetId=result.get("asset_id", ""),
-        publicId=result.get("public_id", public_id),
-        secureUrl=result.get("secure_url", ""),
-        bytes=result.get("bytes", len(contents)),
-        format=result.get("format", "csv"),
-        diagnostics=diagnostics_results,
-        diagnosticsProcessedRows=len(diagnostics_results),
-        diagnosticsTotalRows=len(dataframe),
-        advancedDiagnostics=advanced_results or None,
-        waveformPreview=waveform_preview,
-        shap=shap_result,
-    )
+    return diagnostics_results, advanced_results, shap_result
@@ -0,0 +1,332 @@
+"""Score a directory tree of historical DCRM CSVs in bulk.
+
+    python -m app.scripts.backfill "DCRM CSV files" --output parquet --out-dir backfill_out
+    python -m app.scripts.backfill "DCRM CSV files" --output postgres --breaker-id <breaker id>
+
+Files are parsed in a process pool with the upload parser (``csv_ingest``), scored in batches
+with the diagnostics and advanced models, and written in bulk. Every processed file is recorded
+by content hash in a JSONL manifest, so an interrupted run resumes where it stopped and
+duplicate captures are scored once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import pandas as pd
+
+MANIFEST_NAME = ".backfill-manifest.jsonl"
+DEFAULT_DIAGNOSTIC_ROWS = int(os.getenv("UPLOAD_DIAGNOSTIC_ROW_LIMIT", "5000"))
+_HASH_BLOCK_BYTES = 1024 * 1024
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    sha256: str
+    total_rows: int = 0
+    head: Optional[pd.DataFrame] = None
+    summary: Dict[str, Optional[float]] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def _hash_file(path: Path) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    line_count = 0
+    with path.open("rb") as handle:
+        while block := handle.read(_HASH_BLOCK_BYTES):
+            digest.update(block)
+            line_count += block.count(b"\n")
+    return digest.hexdigest(), line_count + 1
+
+
+_skip_hashes: Set[str] = set()
+
+
+def _init_worker(skip_hashes: Set[str]) -> None:
+    global _skip_hashes
+    _skip_hashes = skip_hashes
+
+
+def _parse_file(path: str, diagnostic_rows: int) -> Optional[ParsedFile]:
+    """Worker: hash and parse one file; returns None when the manifest already has it."""
+    from ..services.csv_ingest import ingest_csv
+
+    file_path = Path(path)
+    sha256, line_count = _hash_file(file_path)
+    if sha256 in _skip_hashes:
+        return None
+    try:
+        ingested = ingest_csv(file_path, expected_rows=line_count, diagnostic_rows=diagnostic_rows)
+    except Exception as exc:
+        return ParsedFile(path=path, sha256=sha256, error=f"{type(exc).__name__}: {exc}")
+    if ingested.total_rows == 0:
+        return ParsedFile(path=path, sha256=sha256, error="CSV has no data rows")
+    return ParsedFile(
+        path=path,
+        sha256=sha256,
+        total_rows=ingested.total_rows,
+        head=ingested.head,
+        summary=ingested.summary,
+    )
+
+
+def _iter_csv_files(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".csv"):
+                yield Path(dirpath) / filename
+
+
+def _load_manifest(path: Path, retry_failed: bool) -> Set[str]:
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with path.open() as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted run
+            if entry.get("status") == "done" or not retry_failed:
+                done.add(entry["sha256"])
+    return done
+
+
+def _score(batch: List[ParsedFile]) -> List[Dict[str, Any]]:
+    """One diagnostics and one advanced-model pass over the head rows of every file in ``batch``."""
+    from ..repositories.test_results import diagnosis_summary
+    from ..services import advanced_models_service, diagnostics_service
+
+    frames = [parsed.head for parsed in batch]
+    combined = pd.concat(frames, ignore_index=True)
+    predictions = diagnostics_service.predict_batch(combined)
+    try:
+        advanced = advanced_models_service.batch_predict(combined)
+    except RuntimeError as exc:
+        print(f"Advanced models unavailable, skipping them: {exc}", file=sys.stderr)
+        advanced = None
+
+    results = []
+    offset = 0
+    for parsed, frame in zip(batch, frames):
+        rows = slice(offset, offset + len(frame))
+        offset += len(frame)
+        file_predictions = predictions[rows]
+        result: Dict[str, Any] = {
+            **diagnosis_summary(file_predictions),
+            "meanConfidence": (
+                sum(p["confidence"] for p in file_predictions) / len(file_predictions) if file_predictions else None
+            ),
+        }
+        if advanced is not None:
+            file_advanced = advanced[rows]
+            result["anomalyRate"] = (
+                sum(1 for a in file_advanced if a["autoencoder"]["isAnomaly"]) / len(file_advanced)
+                if file_advanced
+                else None
+            )
+        results.append(result)
+    return results
+
+
+class _Sink(ABC):
+    @abstractmethod
+    def write(self, batch: List[ParsedFile], scores: List[Dict[str, Any]]) -> None: ...
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetSink(_Sink):
+    """One ``part-*.parquet`` file per batch, so a resumed run only ever appends parts."""
+
+    def __init__(self, out_dir: Path) -> None:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow") from exc
+        self.out_dir = out_dir
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(self, batch: List[ParsedFile], scores: List[Dict[str, Any]]) -> None:
+        scored_at = datetime.now(timezone.utc)
+        frame = pd.DataFrame(
+            [
+                {
+                    "path": parsed.path,
+                    "fileName": Path(parsed.path).name,
+                    "contentSha256": parsed.sha256,
+                    "totalRows": parsed.total_rows,
+                    **parsed.summary,
+                    **{key: value for key, value in score.items() if key != "diagnosisCounts"},
+                    "diagnosisCounts": json.dumps(score["diagnosisCounts"]),
+                    "scoredAt": scored_at,
+                }
+                for parsed, score in zip(batch, scores)
+            ]
+        )
+        name = f"part-{scored_at:%Y%m%dT%H%M%S%f}-{batch[0].sha256[:8]}.parquet"
+        frame.to_parquet(self.out_dir / name, index=False)
+
+
+class _PostgresSink(_Sink):
+    """Bulk ``INSERT`` into ``test_results`` through the shared ``databases`` pool."""
+
+    def __init__(self, breaker_id: str, test_type: str) -> None:
+        from ..db import database
+        from ..repositories.test_results import breaker_exists
+
+        self.breaker_id = breaker_id
+        self.test_type = test_type
+        self._database = database
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(database.connect())
+        if not self._loop.run_until_complete(breaker_exists(breaker_id)):
+            self.close()
+            raise SystemExit(f"Unknown --breaker-id {breaker_id}")
+
+    def write(self, batch: List[ParsedFile], scores: List[Dict[str, Any]]) -> None:
+        from ..repositories.test_results import build_test_result, insert_test_results
+
+        records = [
+            build_test_result(
+                breaker_id=self.breaker_id,
+                file_name=Path(parsed.path).name,
+                file_url=None,
+                test_data={
+                    "source": "backfill",
+                    "path": parsed.path,
+                    "contentSha256": parsed.sha256,
+                    "totalRows": parsed.total_rows,
+                    **score,
+                    "testResults": parsed.summary,
+                },
+                summary=parsed.summary,
+                test_type=self.test_type,
+            )
+            for parsed, score in zip(batch, scores)
+        ]
+        self._loop.run_until_complete(insert_test_results(records))
+
+    def close(self) -> None:
+        self._loop.run_until_complete(self._database.disconnect())
+        self._loop.close()
+
+
+def _append_manifest(manifest: Path, entries: List[Dict[str, Any]]) -> None:
+    with manifest.open("a") as handle:
+        for entry in entries:
+            handle.write(json.dumps(entry) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def run_backfill(args: argparse.Namespace) -> int:
+    root = Path(args.root).resolve()
+    manifest = Path(args.manifest) if args.manifest else root / MANIFEST_NAME
+    done = _load_manifest(manifest, args.retry_failed)
+    files = [str(path) for path in _iter_csv_files(root)]
+    print(f"{len(files)} CSV files under {root}; {len(done)} already in {manifest}")
+
+    if args.output == "postgres":
+        if not args.breaker_id:
+            raise SystemExit("--breaker-id is required for --output postgres (test_results.breakerId is mandatory)")
+        sink: _Sink = _PostgresSink(args.breaker_id, args.test_type)
+    else:
+        sink = _ParquetSink(Path(args.out_dir))
+
+    scored = failed = skipped = 0
+    started = time.monotonic()
+    pending_batch: List[ParsedFile] = []
+    seen: Set[str] = set(done)
+
+    def flush() -> None:
+        nonlocal scored, failed
+        if not pending_batch:
+            return
+        batch = list(pending_batch)
+        pending_batch.clear()
+        try:
+            scores = _score(batch)
+            sink.write(batch, scores)
+        except Exception as exc:
+            # Not recorded in the manifest, so the whole batch is retried on the next run.
+            failed += len(batch)
+            print(f"Batch of {len(batch)} files failed and will be retried next run: {exc}", file=sys.stderr)
+            return
+        _append_manifest(
+            manifest,
+            [{"sha256": parsed.sha256, "path": parsed.path, "rows": parsed.total_rows, "status": "done"} for parsed in batch],
+        )
+        scored += len(batch)
+        elapsed = time.monotonic() - started
+        print(f"scored {scored} files ({scored / max(elapsed, 1e-9):.1f}/s), {failed} failed, {skipped} skipped")
+
+    # Bounded in-flight window so parsed heads of thousands of files never pile up in memory.
+    window = max(1, args.workers) * 4
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(done,)) as pool:
+        queue = iter(files)
+        in_flight: Set[Future[Optional[ParsedFile]]] = set()
+        while True:
+            while len(in_flight) < window:
+                path = next(queue, None)
+                if path is None:
+                    break
+                in_flight.add(pool.submit(_parse_file, path, args.rows))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                parsed = future.result()
+                if parsed is None or parsed.sha256 in seen:
+                    skipped += 1
+                    continue
+                seen.add(parsed.sha256)
+                if parsed.error is not None:
+                    failed += 1
+                    _append_manifest(
+                        manifest,
+                        [{"sha256": parsed.sha256, "path": parsed.path, "status": "failed", "error": parsed.error}],
+                    )
+                    continue
+                pending_batch.append(parsed)
+                if len(pending_batch) >= args.batch_files:
+                    flush()
+        flush()
+
+    sink.close()
+    print(f"Done in {time.monotonic() - started:.1f}s: {scored} scored, {failed} failed, {skipped} skipped")
+    return 0 if failed == 0 else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to scan recursively for .csv files")
+    parser.add_argument("--output", choices=("parquet", "postgres"), default="parquet")
+    parser.add_argument("--out-dir", default="backfill_out", help="Parquet output directory")
+    parser.add_argument("--breaker-id", help="Breaker the rows belong to (required for postgres)")
+    parser.add_argument("--test-type", default="DCRM")
+    parser.add_argument("--manifest", help=f"Manifest path (default: <root>/{MANIFEST_NAME})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--batch-files", type=int, default=64, help="Files scored and written per batch")
+    parser.add_argument("--rows", type=int, default=DEFAULT_DIAGNOSTIC_ROWS, help="Rows scored per file")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-parse files the manifest marks failed")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run_backfill(build_parser().parse_args()))
@@ -0,0 +1,65 @@
+"""Package a legacy ``dcrm_models/shap_models`` folder, or repackage an existing bundle, as a new bundle version.
+
+    python -m app.scripts.build_model_bundle [--source dcrm_models/shap_models] [--no-activate]
+
+Repackaging a bundle directory brings it up to the current layout (e.g. adds the exported
+autoencoder weights) without retraining.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import joblib
+
+from ..services import model_registry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--source", default=str(model_registry.LEGACY_MODEL_DIR), help="Legacy pickle folder or bundle directory"
+    )
+    parser.add_argument("--root", default=str(model_registry.MODEL_BUNDLE_DIR), help="Bundle root directory")
+    parser.add_argument("--no-activate", action="store_true", help="Write the bundle without pointing CURRENT at it")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if (source / "manifest.json").exists():
+        bundle = model_registry.load_bundle(source)
+        artifacts = bundle.manifest["artifacts"]
+        models = {
+            "xgb_model": bundle.xgboost,
+            "ada_model": bundle.adaboost,
+            "scaler": bundle.scaler,
+            "label_encoder": bundle.label_encoder,
+            "feature_names": bundle.feature_names,
+            "ae_threshold": bundle.ae_threshold,
+            "autoencoder": source / artifacts["autoencoder"]["file"] if "autoencoder" in artifacts else None,
+        }
+        metadata = {**bundle.manifest.get("metadata", {}), "repackagedFrom": bundle.version}
+    else:
+        autoencoder = source / "autoencoder_model.keras"
+        models = {
+            "xgb_model": joblib.load(source / "xgboost_model.pkl"),
+            "ada_model": joblib.load(source / "adaboost_model.pkl"),
+            "scaler": joblib.load(source / "scaler.pkl"),
+            "label_encoder": joblib.load(source / "label_encoder.pkl"),
+            "feature_names": list(joblib.load(source / "feature_names.pkl")),
+            "ae_threshold": float(joblib.load(source / "ae_threshold.pkl")),
+            "autoencoder": autoencoder if autoencoder.exists() else None,
+        }
+        metadata = {"source": source.name}
+
+    path = model_registry.export_bundle(
+        **models,
+        root=Path(args.root),
+        metadata=metadata,
+        activate=not args.no_activate,
+    )
+    print(f"Wrote model bundle {path.name} to {path}")
+
+
+if __name__ == "__main__":
+    main()
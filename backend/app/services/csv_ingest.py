@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from fastapi import UploadFile
+
+from ..models import WaveformPreview
+from . import dcrm_csv
+from .shap_service import WindowFeatureAccumulator, WindowFeatures, _resolve_time_column
+from .test_summary import TestSummaryAccumulator
+from .waveform_preview import _COLUMN_ALIASES, PreviewAccumulator, _match_column
+from .waveform_store import StoredWaveform, WaveformWriter
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed per chunk; peak memory per upload scales with this, not with the file size.
+UPLOAD_CHUNK_ROWS = max(1, int(os.getenv("UPLOAD_CHUNK_ROWS", "50000")))
+# Where uploads are spooled while they are parsed; defaults to the system temp directory.
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+_READ_BLOCK_BYTES = 1024 * 1024
+_SNIFF_ROWS = 1000
+
+
+@dataclass
+class SpooledUpload:
+    path: Path
+    size: int
+    sha256: str
+    # Newline count; an upper bound on the number of data rows + header.
+    line_count: int
+
+    def cleanup(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+@dataclass
+class IngestedCsv:
+    total_rows: int
+    head: pd.DataFrame
+    preview: WaveformPreview | None
+    window_features: WindowFeatures | None
+    # test_results summary columns (travelT1Max, velocityT1Max, resistanceCH1Avg).
+    summary: dict[str, float | None]
+    # Staged waveform artifact, published under the publicId once the upload is archived.
+    waveform: WaveformWriter | None = None
+
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """Copies the request body to a temp file block by block, hashing it on the way."""
+    digest = hashlib.sha256()
+    size = 0
+    line_count = 0
+    last_byte = b""
+    if UPLOAD_SPOOL_DIR is not None:
+        Path(UPLOAD_SPOOL_DIR).mkdir(parents=True, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".csv", dir=UPLOAD_SPOOL_DIR, delete=False)
+    try:
+        with handle:
+            while block := await file.read(_READ_BLOCK_BYTES):
+                digest.update(block)
+                size += len(block)
+                line_count += block.count(b"\n")
+                last_byte = block[-1:]
+                handle.write(block)
+    except BaseException:
+        Path(handle.name).unlink(missing_ok=True)
+        raise
+    if last_byte and last_byte != b"\n":
+        line_count += 1
+    return SpooledUpload(path=Path(handle.name), size=size, sha256=digest.hexdigest(), line_count=line_count)
+
+
+def _sniff_dtypes(path: Path) -> dict[str, type]:
+    """float32 for numeric measurement columns; time stays float64 so window edges stay exact."""
+    sample = pd.read_csv(path, nrows=_SNIFF_ROWS)
+    columns = [str(column) for column in sample.columns]
+    time_columns = {_resolve_time_column(columns), _match_column(columns, _COLUMN_ALIASES["timeMs"])}
+    dtypes: dict[str, type] = {}
+    for column in sample.columns:
+        if not pd.api.types.is_numeric_dtype(sample[column]) or pd.api.types.is_bool_dtype(sample[column]):
+            continue
+        dtypes[column] = np.float64 if str(column) in time_columns else np.float32
+    return dtypes
+
+
+def ingest_csv(
+    path: Path,
+    expected_rows: int,
+    diagnostic_rows: int,
+    include_shap: bool = False,
+    segment_ms: int = 10,
+    persist_sha256: str | None = None,
+) -> IngestedCsv:
+    """Parses a spooled CSV in ``UPLOAD_CHUNK_ROWS`` chunks, keeping only bounded summaries.
+
+    Only the first ``diagnostic_rows`` rows are retained; the preview and SHAP window features
+    are accumulated chunk by chunk. With ``persist_sha256`` the parsed columns are also staged
+    as a waveform artifact (see ``waveform_store``). Vendor DCRM exports are recognised by their
+    data header and read with ``dcrm_csv``. Raises pandas parser errors for malformed files.
+    """
+    data_block = dcrm_csv.find_data_block(path)
+    if data_block is not None:
+
+        def run_vendor(coerce: bool) -> IngestedCsv:
+            chunks = dcrm_csv.iter_dcrm_frames(path, data_block, UPLOAD_CHUNK_ROWS, coerce)
+            return _ingest_chunks(chunks, expected_rows, diagnostic_rows, include_shap, segment_ms, persist_sha256)
+
+        try:
+            return run_vendor(False)
+        except ValueError:
+            return run_vendor(True)
+
+    dtypes = _sniff_dtypes(path)
+
+    def run(dtype_map: dict[str, type]) -> IngestedCsv:
+        with pd.read_csv(path, chunksize=UPLOAD_CHUNK_ROWS, dtype=dtype_map or None) as reader:
+            return _ingest_chunks(reader, expected_rows, diagnostic_rows, include_shap, segment_ms, persist_sha256)
+
+    try:
+        return run(dtypes)
+    except ValueError:
+        # A column looked numeric in the sample but is not further down; parse it untyped.
+        if not dtypes:
+            raise
+        return run({})
+
+
+def ingest_stored_waveform(
+    waveform: StoredWaveform,
+    diagnostic_rows: int,
+    include_shap: bool = False,
+    segment_ms: int = 10,
+) -> IngestedCsv:
+    """Same summaries as ``ingest_csv``, read from a memory-mapped waveform artifact."""
+    return _ingest_chunks(
+        waveform.iter_chunks(UPLOAD_CHUNK_ROWS), waveform.rows, diagnostic_rows, include_shap, segment_ms
+    )
+
+
+def _ingest_chunks(
+    chunks: Iterable[pd.DataFrame],
+    expected_rows: int,
+    diagnostic_rows: int,
+    include_shap: bool,
+    segment_ms: int,
+    persist_sha256: str | None = None,
+) -> IngestedCsv:
+    total_rows = 0
+    head_parts: list[pd.DataFrame] = []
+    head_rows = 0
+    preview: PreviewAccumulator | None = None
+    windows: WindowFeatureAccumulator | None = None
+    summary: TestSummaryAccumulator | None = None
+    writer: WaveformWriter | None = None
+    columns: list[str] = []
+
+    try:
+        for chunk in chunks:
+            if preview is None:
+                columns = [str(column) for column in chunk.columns]
+                preview = PreviewAccumulator(columns, expected_rows)
+                summary = TestSummaryAccumulator(columns)
+                if include_shap:
+                    windows = WindowFeatureAccumulator(columns, segment_ms)
+                if persist_sha256 is not None:
+                    writer = WaveformWriter(columns, persist_sha256)
+            chunk = chunk.set_axis(columns, axis=1)
+            chunk.index = pd.RangeIndex(total_rows, total_rows + len(chunk))
+            total_rows += len(chunk)
+
+            if head_rows < diagnostic_rows:
+                head_parts.append(chunk.iloc[: diagnostic_rows - head_rows])
+                head_rows += len(head_parts[-1])
+            preview.update(chunk)
+            summary.update(chunk)
+            if windows is not None:
+                try:
+                    windows.update(chunk)
+                except Exception as exc:
+                    # SHAP is best effort; an unusable column must not fail the upload itself.
+                    logger.error(f"SHAP feature extraction failed: {exc}")
+                    windows = None
+            if writer is not None:
+                writer.update(chunk)
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
+
+    if writer is not None:
+        writer.close()
+    head = pd.concat(head_parts) if head_parts else pd.DataFrame(columns=columns)
+    window_features = None
+    if windows is not None:
+        window_features = windows.finalize()
+    return IngestedCsv(
+        total_rows=total_rows,
+        head=head,
+        preview=preview.finalize() if preview is not None else None,
+        window_features=window_features,
+        summary=summary.finalize() if summary is not None else {},
+        waveform=writer,
+    )
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Vendor DCRM exports start with a block of test-info lines; the samples follow the line whose
+# first field is this header. Column layout (see src/app/api/dcrm-data/route.ts):
+#   0-5 coil current C1-C6 (A), 7-12 contact travel T1-T6 (mm),
+#   14-25 DCRM resistance (microOhm) and current (A) alternating for CH1-CH6.
+VENDOR_HEADER = b"Coil Current C1 (A)"
+VENDOR_FIELDS = 26
+COIL_CURRENT_COLUMNS = (0, 1, 2, 3, 4, 5)
+TRAVEL_COLUMNS = (7, 8, 9, 10, 11, 12)
+RESISTANCE_COLUMNS = (14, 16, 18, 20, 22, 24)
+CURRENT_COLUMNS = (15, 17, 19, 21, 23, 25)
+# The recorder samples at 10 kHz and the export carries no time column.
+SAMPLE_MS = 0.1
+# Readings outside this range are recorder fill values, not measurements; they are zeroed.
+OUTLIER_MAX = 7900.0
+OUTLIER_MIN = -100.0
+
+_HEADER_SCAN_BYTES = 1024 * 1024
+_FOOTER_SCAN_BYTES = 64 * 1024
+_NUMERIC_START = frozenset(b"0123456789+-.,")
+# Vendor files carry non-UTF-8 units (µ) in the preamble; the data block itself is ASCII.
+_ENCODING = "latin-1"
+
+TIME_COLUMN = "Time (ms)"
+# Column names of the single-header CSVs the API already accepts, so vendor data flows
+# through the same preview, summary and SHAP code.
+FRAME_COLUMNS = (
+    [TIME_COLUMN]
+    + [f"Resistance CH{ch} (microOhm)" for ch in range(1, 7)]
+    + [f"Contact Travel T{ch} (mm)" for ch in range(1, 7)]
+    + [f"Current CH{ch} (A)" for ch in range(1, 7)]
+    + [f"Coil Current C{ch} (A)" for ch in range(1, 7)]
+)
+
+
+@dataclass
+class DcrmArrays:
+    """Structure-of-arrays view of a capture; each channel block is ``(6, n_samples)`` float32."""
+
+    time_ms: np.ndarray
+    resistance: np.ndarray
+    travel: np.ndarray
+    current: np.ndarray
+    coil_current: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.time_ms)
+
+    def to_frame(self) -> pd.DataFrame:
+        return _frame(self.time_ms, np.vstack([self.resistance, self.travel, self.current, self.coil_current]).T)
+
+
+def find_data_block(path: Path) -> tuple[int, int] | None:
+    """Byte range of the sample lines of a vendor export, or None for any other CSV.
+
+    A file is a vendor export when the line holding ``VENDOR_HEADER`` starts with it; the API's
+    single-header format also names that column, but later in the line. Trailing non-numeric
+    lines (export footers) are left out of the range so the typed fast path can read it.
+    """
+    with Path(path).open("rb") as handle:
+        head = handle.read(_HEADER_SCAN_BYTES)
+        marker = head.find(VENDOR_HEADER)
+        if marker == -1:
+            return None
+        line_start = head.rfind(b"\n", 0, marker) + 1
+        if head[line_start:marker].strip(b"\xef\xbb\xbf\"' \t") != b"":
+            return None
+        line_end = head.find(b"\n", marker)
+        start = len(head) if line_end == -1 else line_end + 1
+
+        size = handle.seek(0, io.SEEK_END)
+        tail_start = max(start, size - _FOOTER_SCAN_BYTES)
+        handle.seek(tail_start)
+        tail = handle.read()
+    keep = len(tail)
+    while keep:
+        body = tail[:keep].rstrip()
+        cut = body.rfind(b"\n") + 1
+        last = body[cut:]
+        if not last or last[0] in _NUMERIC_START or (cut == 0 and tail_start > start):
+            # The first line of the tail may be partial; never trim into it.
+            break
+        keep = cut
+    return start, tail_start + keep
+
+
+class _BoundedReader(io.RawIOBase):
+    """Exposes ``length`` bytes of ``handle`` from its current position as a file."""
+
+    def __init__(self, handle: BinaryIO, length: int) -> None:
+        self._handle = handle
+        self._remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._handle.read(size)
+        buffer[: len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _frame(time_ms: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    columns = {TIME_COLUMN: time_ms}
+    for name, column in zip(FRAME_COLUMNS[1:], values.T):
+        columns[name] = column
+    return pd.DataFrame(columns, copy=False)
+
+
+# Frame column order expressed as vendor field indices.
+_FRAME_FIELDS = np.array(RESISTANCE_COLUMNS + TRAVEL_COLUMNS + CURRENT_COLUMNS + COIL_CURRENT_COLUMNS)
+# Fields the models are trained on: travel T1-T6 and the DCRM block (coil currents are display only).
+_REQUIRED_FIELDS = np.array(TRAVEL_COLUMNS + tuple(range(RESISTANCE_COLUMNS[0], VENDOR_FIELDS)))
+
+
+def _clean(block: np.ndarray) -> np.ndarray:
+    # Short rows and rows with a blank or non-numeric required field are dropped, as the line
+    # parser the models were trained with did; footers and truncated last lines go with them.
+    block = block[~np.isnan(block[:, _REQUIRED_FIELDS]).any(axis=1)]
+    # Out-of-range markers become 0, as in the training parser and the dashboard.
+    return np.where((block > OUTLIER_MAX) | (block < OUTLIER_MIN) | np.isnan(block), np.float32(0), block)
+
+
+def iter_sample_blocks(
+    path: Path,
+    data_block: tuple[int, int],
+    chunk_rows: int | None = None,
+    coerce: bool = False,
+) -> Iterator[np.ndarray]:
+    """Yields cleaned ``(rows, 26)`` float32 sample blocks read by the pandas C parser.
+
+    Raises ``ValueError`` on non-numeric fields unless ``coerce`` is set, in which case they
+    are read as missing and their rows dropped by the cleaning step; callers retry with
+    ``coerce=True`` so clean files keep the fast path.
+    """
+    start, end = data_block
+    with Path(path).open("rb") as handle:
+        handle.seek(start)
+        try:
+            reader = pd.read_csv(
+                io.BufferedReader(_BoundedReader(handle, end - start)),
+                header=None,
+                # Fixed names so a short first row does not set the column count for the file.
+                names=range(VENDOR_FIELDS),
+                usecols=range(VENDOR_FIELDS),
+                dtype=str if coerce else np.float32,
+                encoding=_ENCODING,
+                engine="c",
+                chunksize=chunk_rows,
+            )
+        except pd.errors.EmptyDataError:
+            return
+        chunks = [reader] if chunk_rows is None else reader
+        for chunk in chunks:
+            if coerce:
+                chunk = chunk.apply(pd.to_numeric, errors="coerce")
+            yield _clean(chunk.to_numpy(dtype=np.float32))
+
+
+def iter_dcrm_frames(
+    path: Path,
+    data_block: tuple[int, int],
+    chunk_rows: int,
+    coerce: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """Vendor samples as DataFrames with ``FRAME_COLUMNS`` and a synthesized 10 kHz time axis."""
+    rows = 0
+    for block in iter_sample_blocks(path, data_block, chunk_rows, coerce):
+        time_ms = np.arange(rows, rows + len(block), dtype=np.float64) * SAMPLE_MS
+        rows += len(block)
+        yield _frame(time_ms, block[:, _FRAME_FIELDS])
+
+
+def parse_dcrm_csv(path: Path) -> DcrmArrays:
+    """Parses a whole vendor export; raises ``ValueError`` when the data header is missing."""
+    data_block = find_data_block(path)
+    if data_block is None:
+        raise ValueError(f"{path}: DCRM data header {VENDOR_HEADER.decode()!r} not found")
+    try:
+        blocks = list(iter_sample_blocks(path, data_block))
+    except ValueError:
+        blocks = list(iter_sample_blocks(path, data_block, coerce=True))
+    samples = np.concatenate(blocks) if blocks else np.empty((0, VENDOR_FIELDS), dtype=np.float32)
+
+    def channels(fields: tuple[int, ...]) -> np.ndarray:
+        return np.ascontiguousarray(samples[:, fields].T)
+
+    return DcrmArrays(
+        time_ms=np.arange(len(samples), dtype=np.float64) * SAMPLE_MS,
+        resistance=channels(RESISTANCE_COLUMNS),
+        travel=channels(TRAVEL_COLUMNS),
+        current=channels(CURRENT_COLUMNS),
+        coil_current=channels(COIL_CURRENT_COLUMNS),
+    )
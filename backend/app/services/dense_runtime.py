@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# Largest |numpy - keras| accepted when exporting, relative to the output scale.
+PARITY_TOLERANCE = 1e-4
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0, out=x),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+class DenseNetwork:
+    """NumPy forward pass of a Keras ``Sequential`` stack of ``Dense`` layers (float32, like Keras).
+
+    ``predict`` takes the same arguments as ``keras.Model.predict`` so services can use either.
+    """
+
+    def __init__(self, weights: list[np.ndarray], biases: list[np.ndarray], activations: list[str]) -> None:
+        unknown = set(activations) - set(_ACTIVATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported activations: {', '.join(sorted(unknown))}")
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+
+    @property
+    def input_dim(self) -> int:
+        return self.weights[0].shape[0]
+
+    def predict(self, x: Any, batch_size: int | None = None, verbose: int = 0) -> np.ndarray:
+        output = np.asarray(x, dtype=np.float32)
+        for weight, bias, activation in zip(self.weights, self.biases, self.activations):
+            output = output @ weight
+            output += bias
+            output = _ACTIVATIONS[activation](output)
+        return output
+
+    def save(self, path: Path) -> None:
+        arrays = {f"w{idx}": weight for idx, weight in enumerate(self.weights)}
+        arrays.update({f"b{idx}": bias for idx, bias in enumerate(self.biases)})
+        with open(path, "wb") as handle:
+            np.savez(handle, activations=np.asarray(self.activations), **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> DenseNetwork:
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(name) for name in data["activations"]]
+            count = len(activations)
+            return cls(
+                [data[f"w{idx}"] for idx in range(count)],
+                [data[f"b{idx}"] for idx in range(count)],
+                activations,
+            )
+
+    @classmethod
+    def from_keras(cls, model: Any) -> DenseNetwork:
+        """Copies the weights of a Keras model made only of ``Dense`` layers; raises ``ValueError`` otherwise."""
+        weights, biases, activations = [], [], []
+        for layer in model.layers:
+            if type(layer).__name__ != "Dense" or not layer.use_bias:
+                raise ValueError(f"Layer {layer.name} ({type(layer).__name__}) is not a Dense layer with bias")
+            kernel, bias = layer.get_weights()
+            weights.append(kernel)
+            biases.append(bias)
+            activations.append(layer.activation.__name__)
+        if not weights:
+            raise ValueError("Model has no Dense layers")
+        return cls(weights, biases, activations)
+
+
+def export_keras(model: Any, path: Path, seed: int = 0) -> DenseNetwork:
+    """Writes ``model`` as a ``.npz`` after checking the NumPy pass against Keras on random inputs."""
+    network = DenseNetwork.from_keras(model)
+    probe = np.random.default_rng(seed).standard_normal((256, network.input_dim)).astype(np.float32)
+    expected = np.asarray(model.predict(probe, verbose=0), dtype=np.float32)
+    error = float(np.max(np.abs(network.predict(probe) - expected)))
+    scale = max(1.0, float(np.max(np.abs(expected))))
+    if error > PARITY_TOLERANCE * scale:
+        raise ValueError(f"NumPy forward pass differs from Keras by {error:.3g}")
+    network.save(path)
+    return network
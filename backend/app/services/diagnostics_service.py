@@ -1,24 +1,16 @@
 from __future__ import annotations
 
-import json
 import logging
 import math
-import os
-from pathlib import Path
-from threading import Lock
-from typing import Any, Dict, Mapping, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
-import joblib
+import numpy as np
 import pandas as pd
 
-logger = logging.getLogger(__name__)
+from . import model_registry
+from .model_registry import ModelBundle
 
-MODEL_DIR = Path(os.getenv("DCRM_MODEL_DIR", "dcrm_models"))
-_xgb_model = None
-_ada_model = None
-_feature_names: list[str] = []
-_label_map: Dict[int, str] = {}
-_model_lock = Lock()
+logger = logging.getLogger(__name__)
 
 
 def _normalize_label_value(value: Any) -> Optional[str]:
@@ -32,104 +24,96 @@ def _normalize_label_value(value: Any) -> Optional[str]:
     return text
 
 
-def _resolve_label(idx: int) -> str:
-    label = _label_map.get(int(idx))
+def _resolve_label(class_labels: np.ndarray, idx: int) -> str:
+    label = _normalize_label_value(class_labels[int(idx)]) if 0 <= int(idx) < len(class_labels) else None
     if label:
         return label
     return f"class_{int(idx)}"
 
 
-def _load_models() -> None:
-    global _xgb_model, _ada_model, _feature_names, _label_map
-
-    if not MODEL_DIR.exists():
-        logger.warning("Model directory %s does not exist", MODEL_DIR)
-        return
+def ensure_models_ready() -> ModelBundle:
+    """The shared model bundle (see ``model_registry``); raises ``RuntimeError`` when it cannot load.
 
-    # Update path to use the consolidated 'shap_models' subdirectory
-    consolidated_dir = MODEL_DIR / "shap_models"
-    
+    In-process only: the bundle is not picklable. Dispatch ``check_models_ready`` through
+    ``run_inference`` instead.
+    """
     try:
-        # Load models from the consolidated directory using new filenames
-        # Note: We use the same models trained for SHAP as they are the most recent/valid ones
-        _xgb_model = joblib.load(consolidated_dir / "xgboost_model.pkl")
-        _ada_model = joblib.load(consolidated_dir / "adaboost_model.pkl")
-        
-        # Feature names are now standard
-        _feature_names = joblib.load(consolidated_dir / "feature_names.pkl")
-
-        # Label encoder instead of label_map
-        label_encoder = joblib.load(consolidated_dir / "label_encoder.pkl")
-        
-        # Reconstruct label map from encoder
-        cleaned: Dict[int, str] = {}
-        for idx, label in enumerate(label_encoder.classes_):
-             cleaned[idx] = str(label)
-        _label_map = cleaned
-
-        logger.info("Diagnostics models loaded successfully from %s", consolidated_dir)
-    except Exception as exc:  # pragma: no cover - runtime artifacts
-        logger.exception("Failed to load diagnostics models: %s", exc)
-        _xgb_model = None
-        _ada_model = None
-        _feature_names = []
-        _label_map = {}
-
-
-_load_models()
-
-
-def ensure_models_ready() -> None:
-    if _xgb_model and _ada_model and _feature_names:
-        return
-
-    with _model_lock:
-        if not (_xgb_model and _ada_model and _feature_names):
-            _load_models()
-
-    if not (_xgb_model and _ada_model and _feature_names):
-        raise RuntimeError(
-            "Diagnostic models are not loaded. Ensure artifacts exist in DCRM_MODEL_DIR."
-        )
+        bundle = model_registry.get_bundle()
+    except RuntimeError as exc:
+        raise RuntimeError(f"Diagnostic models are not loaded: {exc}") from exc
+    if not bundle.feature_names:
+        raise RuntimeError("Diagnostic models are not loaded: the model bundle lists no features.")
+    return bundle
+
+
+def check_models_ready() -> str:
+    """``ensure_models_ready`` for ``run_inference``: returns only the version of the loaded bundle."""
+    return ensure_models_ready().version
 
 
 def get_feature_names() -> list[str]:
-    ensure_models_ready()
-    return list(_feature_names)
+    return list(ensure_models_ready().feature_names)
 
 
 def get_models() -> tuple[Any, Any, list[str]]:
-    ensure_models_ready()
-    return _xgb_model, _ada_model, list(_feature_names)
+    bundle = ensure_models_ready()
+    return bundle.xgboost, bundle.adaboost, list(bundle.feature_names)
 
 
-def _build_dataframe_row(features: Mapping[str, Any]) -> pd.DataFrame:
-    row: list[float] = []
-    for name in _feature_names:
-        value = features.get(name, 50.0)
-        try:
-            row.append(float(value))
-        except (TypeError, ValueError):
-            row.append(50.0)
-    return pd.DataFrame([row], columns=_feature_names)
+def _coerce_feature_value(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 50.0
+
+
+def _feature_matrix(rows: pd.DataFrame | Iterable[Mapping[str, Any]], feature_names: list[str]) -> np.ndarray:
+    """``(rows, features)`` float array in model order; missing or non-numeric values become 50.0."""
+    if not isinstance(rows, pd.DataFrame):
+        records = list(rows)
+        matrix = np.empty((len(records), len(feature_names)))
+        for col, name in enumerate(feature_names):
+            matrix[:, col] = np.fromiter(
+                (_coerce_feature_value(record.get(name, 50.0)) for record in records),
+                dtype=float,
+                count=len(records),
+            )
+        return matrix
+
+    matrix = np.full((len(rows), len(feature_names)), 50.0)
+    for col, name in enumerate(feature_names):
+        if name not in rows.columns:
+            continue
+        values = rows[name]
+        if pd.api.types.is_numeric_dtype(values):
+            matrix[:, col] = values.to_numpy(dtype=float)
+        else:
+            matrix[:, col] = np.fromiter(
+                (_coerce_feature_value(value) for value in values),
+                dtype=float,
+                count=len(values),
+            )
+    return matrix
 
 
 def predict_single(features: Mapping[str, Any]) -> Dict[str, Any]:
-    ensure_models_ready()
-    input_df = _build_dataframe_row(features)
+    bundle = ensure_models_ready()
+    labels = bundle.class_labels
+    matrix = _feature_matrix([features], bundle.feature_names)
 
     try:
-        xgb_pred_idx = _xgb_model.predict(input_df)[0]
-        xgb_proba = _xgb_model.predict_proba(input_df)[0]
-        xgb_label = _resolve_label(int(xgb_pred_idx))
+        xgb_pred, xgb_proba_rows = bundle.tree_scorers.xgboost(matrix)
+        xgb_pred_idx = xgb_pred[0]
+        xgb_proba = xgb_proba_rows[0]
+        xgb_label = _resolve_label(labels, int(xgb_pred_idx))
         xgb_conf = float(xgb_proba[int(xgb_pred_idx)] * 100)
 
-        ada_pred_idx = _ada_model.predict(input_df)[0]
-        ada_label = _resolve_label(int(ada_pred_idx))
+        ada_pred_idx = bundle.tree_scorers.adaboost(matrix)[0][0]
+        ada_label = _resolve_label(labels, int(ada_pred_idx))
 
         probabilities: Dict[str, float] = {}
         for idx, prob in enumerate(xgb_proba):
-            label = _resolve_label(idx)
+            label = _resolve_label(labels, idx)
             probabilities[label] = float(prob * 100)
 
         return {
@@ -142,3 +126,48 @@ def predict_single(features: Mapping[str, Any]) -> Dict[str, Any]:
     except Exception as exc:  # pragma: no cover - model dependent
         logger.exception("Prediction failed: %s", exc)
         raise RuntimeError(str(exc)) from exc
+
+
+def predict_batch(rows: pd.DataFrame | Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Scores every row with one call per model and returns ``predict_single`` shaped results."""
+    return _predict_batch(ensure_models_ready(), rows)
+
+
+def predict_batch_versioned(rows: Iterable[Mapping[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """``predict_batch`` plus the version of the bundle that scored it, as loaded in this process."""
+    bundle = ensure_models_ready()
+    return bundle.version, _predict_batch(bundle, rows)
+
+
+def _predict_batch(
+    bundle: ModelBundle, rows: pd.DataFrame | Iterable[Mapping[str, Any]]
+) -> List[Dict[str, Any]]:
+    matrix = _feature_matrix(rows, bundle.feature_names)
+    if not len(matrix):
+        return []
+
+    try:
+        xgb_pred_idx, xgb_proba = bundle.tree_scorers.xgboost(matrix)
+        ada_pred_idx, _ = bundle.tree_scorers.adaboost(matrix)
+    except Exception as exc:  # pragma: no cover - model dependent
+        logger.exception("Batch prediction failed: %s", exc)
+        raise RuntimeError(str(exc)) from exc
+    labels = [_resolve_label(bundle.class_labels, idx) for idx in range(xgb_proba.shape[1])]
+    percentages = (xgb_proba * 100).tolist()
+    confidences = (xgb_proba[np.arange(len(xgb_proba)), xgb_pred_idx] * 100).tolist()
+
+    results: List[Dict[str, Any]] = []
+    for pred_idx, confidence, ada_idx, row_percentages in zip(
+        xgb_pred_idx.tolist(), confidences, ada_pred_idx.tolist(), percentages
+    ):
+        xgb_label = _resolve_label(bundle.class_labels, pred_idx)
+        results.append(
+            {
+                "diagnosis": xgb_label,
+                "confidence": confidence,
+                "secondary_diagnosis": _resolve_label(bundle.class_labels, ada_idx),
+                "probabilities": dict(zip(labels, row_percentages)),
+                "status": "Healthy" if xgb_label == "Healthy" else "Faulty",
+            }
+        )
+    return results
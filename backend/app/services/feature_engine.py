@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# Bump whenever a feature definition below, or the parsing feeding it, changes; cached training
+# matrices key on it. 2: malformed vendor rows are dropped again instead of zero-filled.
+FEATURE_SPEC_VERSION = 2
+# Features the window models are trained on, in column order.
+FEATURE_NAMES = (
+    "window_mean_resistance",
+    "window_std_resistance",
+    "window_max_resistance",
+    "window_mean_travel",
+    "window_std_travel",
+    "window_mean_current",
+    "window_std_current",
+    "Rp_avg",
+    "Ra_ta",
+    "T_overlap",
+)
+
+
+@dataclass
+class ChannelStats:
+    """Population mean/std/max per window; arrays share one shape, e.g. ``(windows, channels)``."""
+
+    mean: np.ndarray
+    std: np.ndarray
+    max: np.ndarray
+
+
+def window_view(values: np.ndarray, window_size: int, n_windows: int | None = None) -> np.ndarray:
+    """``(N, channels)`` -> ``(windows, window_size, channels)`` over consecutive complete windows.
+
+    Only the sample axis is split, so the result is a view for any input strides, including the
+    transposed ``(6, N)`` channel blocks of ``dcrm_csv.DcrmArrays``.
+    """
+    if values.ndim == 1:
+        values = values[:, None]
+    available = len(values) // window_size
+    n_windows = available if n_windows is None else max(0, min(n_windows, available))
+    return values[: n_windows * window_size].reshape(n_windows, window_size, values.shape[1])
+
+
+def strided_window_stats(values: np.ndarray, window_size: int, n_windows: int | None = None) -> ChannelStats:
+    """Per-window stats of an ``(N, channels)`` array, reduced along the window axis in one pass."""
+    windows = window_view(values, window_size, n_windows)
+    return ChannelStats(
+        mean=windows.mean(axis=1, dtype=np.float64),
+        std=windows.std(axis=1, dtype=np.float64),
+        max=windows.max(axis=1).astype(np.float64),
+    )
+
+
+def assemble_features(
+    resistance: ChannelStats | None,
+    travel: ChannelStats | None,
+    current: ChannelStats | None,
+    shape: tuple[int, ...],
+    occupied: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """Model features from per-window channel stats; the one definition training and serving share.
+
+    Missing channels leave their features out (callers fill them); ``occupied`` masks windows
+    that received no samples.
+    """
+    features: dict[str, np.ndarray] = {}
+    r_mean = np.zeros(shape)
+    t_mean = np.zeros(shape)
+    if resistance is not None:
+        r_mean = resistance.mean
+        features["window_mean_resistance"] = resistance.mean
+        features["window_std_resistance"] = resistance.std
+        features["window_max_resistance"] = resistance.max
+        features["Rp_avg"] = resistance.mean
+    if travel is not None:
+        t_mean = travel.mean
+        features["window_mean_travel"] = travel.mean
+        features["window_std_travel"] = travel.std
+        features["window_max_travel"] = travel.max
+    if current is not None:
+        features["window_mean_current"] = current.mean
+        features["window_std_current"] = current.std
+
+    keep = t_mean != 0 if occupied is None else occupied & (t_mean != 0)
+    features["Ra_ta"] = np.where(keep, r_mean * t_mean, 0.0)
+    features["T_overlap"] = np.zeros(shape)
+    return features
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+# Identifier columns that never reach the advanced models.
+DROP_COLUMNS = frozenset(
+    {
+        "breaker_id",
+        "bay_id",
+        "raw_timeseries_id",
+        "operation_count_total",
+        "overall_health",
+    }
+)
+
+
+def _to_float(value: Any) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+class FeatureSchema:
+    """Raw rows -> scaled float32 model matrix, compiled once per model bundle.
+
+    Encoding matches a per-row ``pd.get_dummies`` aligned to ``feature_names``: text cells set
+    their ``<column>_<value>`` indicator, other cells are read as numbers, identifier columns
+    are dropped, and anything missing or non-numeric becomes 0. Scaling applies the
+    ``StandardScaler`` mean/scale vectors in float64, exactly like ``transform``.
+    """
+
+    def __init__(self, feature_names: list[str], scaler: Any, drop_columns: Iterable[str] = DROP_COLUMNS) -> None:
+        self.feature_names = list(feature_names)
+        self.index = {name: idx for idx, name in enumerate(self.feature_names)}
+        self._drop = frozenset(drop_columns)
+        self._scaler = scaler
+        self._mean = np.asarray(scaler.mean_, dtype=np.float64) if getattr(scaler, "with_mean", False) else None
+        self._scale = np.asarray(scaler.scale_, dtype=np.float64) if getattr(scaler, "with_std", False) else None
+        # Anything but a fitted StandardScaler keeps going through its own transform.
+        self._compiled = type(scaler).__name__ == "StandardScaler" and hasattr(scaler, "scale_")
+
+    def encode_records(self, records: list[Mapping[str, Any]]) -> np.ndarray:
+        matrix = np.zeros((len(records), len(self.feature_names)))
+        index = self.index
+        for row, record in enumerate(records):
+            for column, value in record.items():
+                if column in self._drop:
+                    continue
+                if isinstance(value, str):
+                    idx = index.get(f"{column}_{value}")
+                    if idx is not None:
+                        matrix[row, idx] = 1.0
+                    continue
+                idx = index.get(column)
+                if idx is not None:
+                    matrix[row, idx] = _to_float(value)
+        return matrix
+
+    def encode_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """Column-wise ``encode_records`` for DataFrame inputs (uploads, backfill)."""
+        matrix = np.zeros((len(frame), len(self.feature_names)))
+        for column in frame.columns:
+            if column in self._drop:
+                continue
+            values = frame[column]
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                if column in self.index:
+                    matrix[:, self.index[column]] = values.to_numpy(dtype=float, na_value=np.nan)
+                continue
+
+            is_text = values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+            if column in self.index:
+                numeric = pd.to_numeric(values.where(~is_text), errors="coerce")
+                matrix[:, self.index[column]] = numeric.to_numpy(dtype=float, na_value=np.nan)
+            if not is_text.any():
+                continue
+            text_values = values[is_text]
+            for value in text_values.unique():
+                dummy = f"{column}_{value}"
+                if dummy in self.index:
+                    rows = np.flatnonzero(is_text)[(text_values == value).to_numpy()]
+                    matrix[rows, self.index[dummy]] = 1.0
+        matrix[np.isnan(matrix)] = 0.0
+        return matrix
+
+    def scale(self, matrix: np.ndarray) -> np.ndarray:
+        if not self._compiled:
+            if not len(matrix):
+                # sklearn scalers reject empty input.
+                return matrix.astype(np.float32)
+            frame = pd.DataFrame(matrix, columns=self.feature_names)
+            return np.ascontiguousarray(self._scaler.transform(frame), dtype=np.float32)
+        if self._mean is not None:
+            matrix -= self._mean
+        if self._scale is not None:
+            matrix /= self._scale
+        return matrix.astype(np.float32)
+
+    def transform(self, rows: pd.DataFrame | Iterable[Mapping[str, Any]]) -> np.ndarray:
+        """Scaled ``(rows, features)`` float32 matrix in ``feature_names`` order."""
+        if isinstance(rows, pd.DataFrame):
+            matrix = self.encode_frame(rows)
+        else:
+            matrix = self.encode_records(list(rows))
+        return self.scale(matrix)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from . import model_registry
+
+logger = logging.getLogger(__name__)
+
+# "process" keeps CPU-bound inference off the event loop and the GIL, "thread" only off the
+# event loop, and "inline" runs on the caller (useful for debugging and single-core hosts).
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "process").strip().lower()
+INFERENCE_WORKERS = max(1, int(os.getenv("INFERENCE_WORKERS", "1")))
+INFERENCE_MAX_PENDING = max(1, int(os.getenv("INFERENCE_MAX_PENDING", "32")))
+# Thread/inline executors pickle each function's first arguments and result anyway, so code that
+# only works without a process boundary fails in development instead of in production.
+INFERENCE_CHECK_PICKLE = os.getenv("INFERENCE_CHECK_PICKLE", "1").strip().lower() not in {"0", "false", "no"}
+
+T = TypeVar("T")
+
+_executor: Executor | None = None
+_pending = 0
+_pickle_checked: set[str] = set()
+
+
+class InferenceSaturatedError(Exception):
+    """Raised when ``INFERENCE_MAX_PENDING`` jobs are already queued or running."""
+
+
+def _warm_worker() -> None:
+    """Process-pool initializer: load every model once so the first job does not pay for it."""
+    from . import warmup
+
+    warmup.warm_models()
+
+
+def _create_executor() -> Executor | None:
+    if INFERENCE_EXECUTOR == "inline":
+        return None
+    if INFERENCE_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    if INFERENCE_EXECUTOR != "process":
+        logger.warning("Unknown INFERENCE_EXECUTOR '%s'; falling back to a process pool", INFERENCE_EXECUTOR)
+    # Spawned workers start from a clean interpreter instead of inheriting TensorFlow state.
+    return ProcessPoolExecutor(
+        max_workers=INFERENCE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker,
+    )
+
+
+def _check_picklable(func: Callable[..., Any], args: tuple, kwargs: dict, result: Any) -> None:
+    """Raises ``TypeError`` unless ``func``'s call and result could cross a process boundary."""
+    name = f"{func.__module__}.{getattr(func, '__qualname__', func)}"
+    if name in _pickle_checked:
+        return
+    for what, value in (("arguments", (func, args, kwargs)), ("result", result)):
+        try:
+            pickle.dumps(value)
+        except Exception as exc:
+            raise TypeError(
+                f"run_inference({name}) {what} cannot be pickled for the process executor: {exc}"
+            ) from exc
+    _pickle_checked.add(name)
+
+
+def _get_executor() -> Executor | None:
+    global _executor
+    if _executor is None:
+        _executor = _create_executor()
+    return _executor
+
+
+def pending_jobs() -> int:
+    return _pending
+
+
+async def run_inference(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a module-level service function on the inference executor.
+
+    ``func``, its arguments and its result must be picklable, since the default executor is a
+    process pool; thread and inline executors check this once per function (``INFERENCE_CHECK_PICKLE``).
+    Raises ``InferenceSaturatedError`` instead of queueing once the pending limit is reached.
+    """
+    global _executor, _pending
+
+    if _pending >= INFERENCE_MAX_PENDING:
+        raise InferenceSaturatedError("Inference capacity exhausted. Retry shortly.")
+
+    _pending += 1
+    try:
+        executor = _get_executor()
+        if executor is None:
+            result = func(*args, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+            except BrokenProcessPool:
+                logger.exception("Inference worker pool crashed; it will be recreated on the next request")
+                _executor = None
+                raise
+        if INFERENCE_CHECK_PICKLE and not isinstance(executor, ProcessPoolExecutor):
+            _check_picklable(func, args, kwargs, result)
+        return result
+    finally:
+        _pending -= 1
+
+
+def restart() -> None:
+    """Retires the worker pool: new jobs start fresh workers, running jobs finish on the old ones."""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _on_bundle_swap(bundle: model_registry.ModelBundle, previous: model_registry.ModelBundle | None) -> None:
+    # Threads and inline calls read the swapped registry directly; worker processes hold their own
+    # copy and pick up the new (pinned) version when respawned.
+    if isinstance(_executor, ProcessPoolExecutor):
+        restart()
+
+
+model_registry.add_listener(_on_bundle_swap)
+
+
+async def warm_up() -> list[dict[str, Any]]:
+    """Loads the models wherever inference runs and returns one timing report per worker.
+
+    ``inline`` warms this process from a helper thread so the event loop stays free.
+    """
+    from . import warmup
+
+    executor = _get_executor()
+    if executor is None:
+        return [await asyncio.to_thread(warmup.warm_models)]
+    loop = asyncio.get_running_loop()
+    # One job per worker: a process pool spawns a new worker for each job no idle worker can take.
+    jobs = [loop.run_in_executor(executor, warmup.warm_models) for _ in range(INFERENCE_WORKERS)]
+    reports = await asyncio.gather(*jobs)
+    unique = {report["pid"]: report for report in reports}
+    return list(unique.values())
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
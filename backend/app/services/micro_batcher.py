@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from concurrent.futures import BrokenExecutor
+from typing import Awaitable, Callable, Generic, List, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+PREDICT_BATCH_MAX_SIZE = max(1, int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64")))
+PREDICT_BATCH_MAX_WAIT_MS = max(0.0, float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5")))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent single-row requests into one batched scoring call.
+
+    Rows are held for at most ``max_wait_ms`` or until ``max_batch_size`` rows are waiting,
+    then scored together and each caller receives its own result. When a batch fails with a
+    ``RuntimeError`` (an input or model error) its rows are retried one by one so a single bad
+    row only fails its caller. A broken executor fails the whole batch at once: retrying every
+    row against a dead worker pool would only multiply the load during the outage.
+    """
+
+    def __init__(
+        self,
+        score_batch: Callable[[List[T]], Awaitable[List[R]]],
+        *,
+        max_batch_size: int = PREDICT_BATCH_MAX_SIZE,
+        max_wait_ms: float = PREDICT_BATCH_MAX_WAIT_MS,
+    ) -> None:
+        self._score_batch = score_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._pending: List[Tuple[T, asyncio.Future[R]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: Set[asyncio.Task[None]] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[R] = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future[R]]]) -> None:
+        try:
+            results = await self._score_batch([item for item, _ in batch])
+        except BrokenExecutor as exc:
+            self._fail(batch, exc)
+            return
+        except RuntimeError as exc:
+            if len(batch) > 1:
+                logger.warning("Batch of %d rows failed (%s); retrying rows individually", len(batch), exc)
+                await asyncio.gather(*(self._run([entry]) for entry in batch))
+                return
+            self._fail(batch, exc)
+            return
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[T, asyncio.Future[R]]], exc: BaseException) -> None:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(exc)
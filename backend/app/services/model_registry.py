@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from .dense_runtime import DenseNetwork, export_keras
+from .feature_schema import FeatureSchema
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+# One directory per bundle version plus a CURRENT file naming the active one.
+MODEL_BUNDLE_DIR = Path(os.getenv("MODEL_BUNDLE_DIR", str(_BACKEND_DIR / "dcrm_models" / "bundles")))
+# Pre-bundle layout (duplicated pickles); only read when no bundle exists.
+LEGACY_MODEL_DIR = Path(os.getenv("DCRM_MODEL_DIR", str(_BACKEND_DIR / "dcrm_models"))) / "shap_models"
+# Serve this version instead of CURRENT. Reloads set it so respawned workers load what the API validated.
+MODEL_BUNDLE_VERSION_ENV = "MODEL_BUNDLE_VERSION"
+# Previously active bundles kept loaded for an instant rollback.
+MODEL_REGISTRY_HISTORY = max(0, int(os.getenv("MODEL_REGISTRY_HISTORY", "2")))
+# "numpy" serves the autoencoder from its exported weights; "keras" forces the TensorFlow model.
+AUTOENCODER_RUNTIME = os.getenv("AUTOENCODER_RUNTIME", "numpy").strip().lower()
+
+BUNDLE_FORMAT = 1
+_MANIFEST = "manifest.json"
+_CURRENT = "CURRENT"
+_ARTIFACT_FILES = {
+    "xgboost": "xgboost.ubj",
+    "adaboost": "adaboost.joblib",
+    "scaler": "scaler.joblib",
+    "label_encoder": "label_encoder.joblib",
+    "autoencoder": "autoencoder.keras",
+    "autoencoder_weights": "autoencoder.npz",
+}
+_LEGACY_FILES = {
+    "xgboost": "xgboost_model.pkl",
+    "adaboost": "adaboost_model.pkl",
+    "scaler": "scaler.pkl",
+    "label_encoder": "label_encoder.pkl",
+    "autoencoder": "autoencoder_model.keras",
+}
+_HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        while block := handle.read(_HASH_BLOCK_BYTES):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_xgboost(path: Path) -> Any:
+    import xgboost as xgb
+
+    model = xgb.XGBClassifier()
+    model.load_model(path)
+    return model
+
+
+class ModelBundle:
+    """One consistent set of window models shared by diagnostics, advanced models and SHAP.
+
+    Classifiers, scaler and encoder load eagerly; numpy arrays inside the joblib files are
+    memory-mapped read-only, so worker processes share their pages. The autoencoder loads on
+    first use, from its exported weights when present (no TensorFlow) and from Keras otherwise.
+    """
+
+    def __init__(
+        self,
+        *,
+        version: str,
+        path: Path,
+        manifest: dict[str, Any],
+        xgboost: Any,
+        adaboost: Any,
+        scaler: Any,
+        label_encoder: Any,
+    ) -> None:
+        self.version = version
+        self.path = path
+        self.manifest = manifest
+        self.xgboost = xgboost
+        self.adaboost = adaboost
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.feature_names: list[str] = list(manifest["featureNames"])
+        self.class_labels = np.asarray([str(label) for label in manifest["classLabels"]], dtype=object)
+        threshold = manifest.get("aeThreshold")
+        self.ae_threshold: float | None = None if threshold is None else float(threshold)
+        self.loaded_at = datetime.utcnow()
+        self.load_seconds = 0.0
+        self._autoencoder: Any = None
+        self._autoencoder_lock = Lock()
+        self._tree_scorers: Any = None
+        self._feature_schema: FeatureSchema | None = None
+
+    @property
+    def autoencoder(self) -> Any:
+        artifacts = self.manifest["artifacts"]
+        if self._autoencoder is None and ("autoencoder" in artifacts or "autoencoder_weights" in artifacts):
+            with self._autoencoder_lock:
+                if self._autoencoder is None:
+                    self._autoencoder = self._load_autoencoder()
+        return self._autoencoder
+
+    @property
+    def feature_schema(self) -> FeatureSchema:
+        """Raw-row encoder and scaler of the advanced models, compiled on first use."""
+        if self._feature_schema is None:
+            self._feature_schema = FeatureSchema(self.feature_names, self.scaler)
+        return self._feature_schema
+
+    @property
+    def tree_scorers(self) -> Any:
+        """``tree_fastpath.TreeScorers`` for the classifiers, compiled on first use."""
+        if self._tree_scorers is None:
+            # Imported here: sklearn is not needed to import the app (see ``warmup``).
+            from .tree_fastpath import TreeScorers
+
+            self._tree_scorers = TreeScorers(self.xgboost, self.adaboost, self.feature_names)
+        return self._tree_scorers
+
+    def _load_autoencoder(self) -> Any:
+        artifacts = self.manifest["artifacts"]
+        if "autoencoder_weights" in artifacts and (AUTOENCODER_RUNTIME != "keras" or "autoencoder" not in artifacts):
+            return DenseNetwork.load(self.path / artifacts["autoencoder_weights"]["file"])
+        from tensorflow import keras
+
+        return keras.models.load_model(self.path / artifacts["autoencoder"]["file"], compile=False)
+
+    def available_models(self) -> list[str]:
+        artifacts = self.manifest["artifacts"]
+        names = [name for name in ("xgboost", "adaboost") if name in artifacts]
+        if "autoencoder" in artifacts or "autoencoder_weights" in artifacts:
+            names.append("autoencoder")
+        return names
+
+    def artifacts(self) -> list[dict[str, Any]]:
+        return [
+            {"name": info["file"], "kind": kind, "sizeBytes": info["bytes"], "sha256": info["sha256"]}
+            for kind, info in self.manifest["artifacts"].items()
+        ]
+
+
+def load_bundle(path: Path, verify: bool = True) -> ModelBundle:
+    """Loads a bundle directory; raises ``RuntimeError`` on a bad manifest or checksum."""
+    try:
+        manifest = json.loads((path / _MANIFEST).read_text())
+    except (OSError, ValueError) as exc:
+        raise RuntimeError(f"Model bundle {path} has no readable manifest: {exc}") from exc
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise RuntimeError(f"Model bundle {path} has unsupported format {manifest.get('format')}")
+
+    artifacts = manifest["artifacts"]
+    if verify:
+        for info in artifacts.values():
+            artifact = path / info["file"]
+            if not artifact.exists() or _sha256(artifact) != info["sha256"]:
+                raise RuntimeError(f"Model bundle artifact {artifact} is missing or fails its checksum")
+
+    def joblib_artifact(kind: str) -> Any:
+        return joblib.load(path / artifacts[kind]["file"], mmap_mode="r")
+
+    try:
+        return ModelBundle(
+            version=manifest["version"],
+            path=path,
+            manifest=manifest,
+            xgboost=_load_xgboost(path / artifacts["xgboost"]["file"]),
+            adaboost=joblib_artifact("adaboost"),
+            scaler=joblib_artifact("scaler"),
+            label_encoder=joblib_artifact("label_encoder"),
+        )
+    except Exception as exc:
+        raise RuntimeError(f"Model bundle {path} failed to load: {exc}") from exc
+
+
+def _legacy_version(path: Path) -> str:
+    parts = []
+    for filename in sorted(_LEGACY_FILES.values()):
+        try:
+            info = (path / filename).stat()
+            parts.append(f"{filename}:{info.st_size}:{info.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{filename}:missing")
+    return "legacy-" + hashlib.sha256("|".join(parts).encode()).hexdigest()[:8]
+
+
+def _load_legacy_bundle(path: Path) -> ModelBundle:
+    """Wraps the pre-bundle pickles in ``path`` so older model directories keep working."""
+    try:
+        label_encoder = joblib.load(path / _LEGACY_FILES["label_encoder"])
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": _legacy_version(path),
+            "featureNames": list(joblib.load(path / "feature_names.pkl")),
+            "classLabels": [str(label) for label in label_encoder.classes_],
+            "aeThreshold": float(joblib.load(path / "ae_threshold.pkl")),
+            "artifacts": {
+                kind: {"file": filename, "sha256": "", "bytes": (path / filename).stat().st_size}
+                for kind, filename in _LEGACY_FILES.items()
+                if (path / filename).exists()
+            },
+        }
+        return ModelBundle(
+            version=manifest["version"],
+            path=path,
+            manifest=manifest,
+            xgboost=joblib.load(path / _LEGACY_FILES["xgboost"]),
+            adaboost=joblib.load(path / _LEGACY_FILES["adaboost"]),
+            scaler=joblib.load(path / _LEGACY_FILES["scaler"]),
+            label_encoder=label_encoder,
+        )
+    except Exception as exc:
+        raise RuntimeError(f"No model bundle in {MODEL_BUNDLE_DIR} and no usable legacy artifacts in {path}: {exc}") from exc
+
+
+def active_bundle_path(root: Path = MODEL_BUNDLE_DIR) -> Path | None:
+    """Directory named by ``CURRENT``, else the newest version; None when there is no bundle."""
+    try:
+        current = (root / _CURRENT).read_text().strip()
+    except OSError:
+        current = ""
+    if current and (root / current / _MANIFEST).exists():
+        return root / current
+    if not root.is_dir():
+        return None
+    versions = sorted(child for child in root.iterdir() if (child / _MANIFEST).exists())
+    return versions[-1] if versions else None
+
+
+def list_versions(root: Path = MODEL_BUNDLE_DIR) -> list[str]:
+    """Bundle versions under ``root``, oldest first."""
+    if not root.is_dir():
+        return []
+    return sorted(child.name for child in root.iterdir() if (child / _MANIFEST).exists())
+
+
+def _resolve_path(version: str | None = None) -> Path | None:
+    version = version or os.getenv(MODEL_BUNDLE_VERSION_ENV)
+    if version:
+        path = MODEL_BUNDLE_DIR / version
+        if not (path / _MANIFEST).exists():
+            raise RuntimeError(f"Model bundle version {version} does not exist in {MODEL_BUNDLE_DIR}")
+        return path
+    return active_bundle_path()
+
+
+def _load(version: str | None = None) -> ModelBundle:
+    started = time.perf_counter()
+    path = _resolve_path(version)
+    if path is not None:
+        bundle = load_bundle(path)
+        logger.info("Loaded model bundle %s from %s", bundle.version, path)
+    else:
+        bundle = _load_legacy_bundle(LEGACY_MODEL_DIR)
+        logger.warning("No model bundle in %s; loaded legacy artifacts from %s", MODEL_BUNDLE_DIR, LEGACY_MODEL_DIR)
+    bundle.load_seconds = time.perf_counter() - started
+    return bundle
+
+
+def validate_bundle(bundle: ModelBundle) -> None:
+    """Runs every model of ``bundle`` on a canary vector; raises ``RuntimeError`` on bad output."""
+    n_classes = len(bundle.class_labels)
+    try:
+        zeros = pd.DataFrame(np.zeros((1, len(bundle.feature_names))), columns=bundle.feature_names)
+        canary = pd.DataFrame(bundle.scaler.transform(zeros), columns=bundle.feature_names)
+        for name in ("xgboost", "adaboost"):
+            proba = np.asarray(getattr(bundle, name).predict_proba(canary))
+            if proba.shape != (1, n_classes) or not np.all(np.isfinite(proba)) or abs(proba.sum() - 1.0) > 1e-3:
+                raise RuntimeError(f"{name} returned {proba.tolist()} for the canary vector")
+        if bundle.autoencoder is not None:
+            reconstruction = np.asarray(bundle.autoencoder.predict(canary, verbose=0))
+            if reconstruction.shape != canary.shape or not np.all(np.isfinite(reconstruction)):
+                raise RuntimeError(f"autoencoder returned shape {reconstruction.shape} for the canary vector")
+    except RuntimeError:
+        raise
+    except Exception as exc:
+        raise RuntimeError(f"Model bundle {bundle.version} failed its canary check: {exc}") from exc
+
+
+# Readers take the current reference without locking; bundles are never mutated after
+# loading, so a request keeps a consistent set of models even if a swap happens mid-call.
+# ``_lock`` only serializes loads and swaps.
+_lock = Lock()
+_active: ModelBundle | None = None
+_history: deque[ModelBundle] = deque(maxlen=MODEL_REGISTRY_HISTORY or None)
+_listeners: list[Callable[[ModelBundle, ModelBundle | None], None]] = []
+
+
+def add_listener(callback: Callable[[ModelBundle, ModelBundle | None], None]) -> None:
+    """Calls ``callback(new, old)`` after every swap (reload or rollback), not on the first load."""
+    _listeners.append(callback)
+
+
+def get_bundle() -> ModelBundle:
+    """The process-wide active bundle, loaded on first use; raises ``RuntimeError`` if unavailable."""
+    global _active
+    bundle = _active
+    if bundle is not None:
+        return bundle
+    with _lock:
+        if _active is None:
+            _active = _load()
+        return _active
+
+
+def _pin(bundle: ModelBundle) -> None:
+    if bundle.path.parent == MODEL_BUNDLE_DIR:
+        os.environ[MODEL_BUNDLE_VERSION_ENV] = bundle.path.name
+    else:
+        os.environ.pop(MODEL_BUNDLE_VERSION_ENV, None)
+
+
+def _swap(bundle: ModelBundle) -> ModelBundle | None:
+    global _active
+    previous, _active = _active, bundle
+    _pin(bundle)
+    for callback in _listeners:
+        try:
+            callback(bundle, previous)
+        except Exception:
+            logger.exception("Model registry listener %r failed", callback)
+    return previous
+
+
+def reload(version: str | None = None) -> ModelBundle:
+    """Loads ``version`` (default: ``CURRENT``), checks it on a canary vector and swaps it in.
+
+    The active bundle keeps serving until the swap and is kept for ``rollback``. Raises
+    ``RuntimeError`` and leaves the active bundle in place when loading or validation fails.
+    """
+    with _lock:
+        path = _resolve_path(version) if version else active_bundle_path()
+        if path is None:
+            raise RuntimeError(f"No model bundle in {MODEL_BUNDLE_DIR} to reload")
+        bundle = _load(path.name)
+        validate_bundle(bundle)
+        previous = _swap(bundle)
+        if previous is not None and MODEL_REGISTRY_HISTORY:
+            _history.append(previous)
+    logger.info(
+        "Activated model bundle %s (was %s)", bundle.version, previous.version if previous is not None else None
+    )
+    return bundle
+
+
+def rollback() -> ModelBundle:
+    """Swaps back to the most recently replaced bundle; raises ``RuntimeError`` if none is kept."""
+    with _lock:
+        if not _history:
+            raise RuntimeError("No previous model bundle is loaded to roll back to")
+        bundle = _history.pop()
+        _swap(bundle)
+    logger.info("Rolled back to model bundle %s", bundle.version)
+    return bundle
+
+
+def previous_versions() -> list[str]:
+    """Versions available to ``rollback``, most recent first."""
+    return [bundle.version for bundle in reversed(_history)]
+
+
+def active_version() -> str | None:
+    """Version of the bundle ``get_bundle`` serves (or would load), without loading any model."""
+    bundle = _active
+    if bundle is not None:
+        return bundle.version
+    try:
+        path = _resolve_path()
+    except RuntimeError:
+        return None
+    if path is None:
+        return _legacy_version(LEGACY_MODEL_DIR)
+    try:
+        return json.loads((path / _MANIFEST).read_text())["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _export_weights(autoencoder: Any, path: Path) -> None:
+    try:
+        export_keras(autoencoder, path)
+    except ValueError as exc:
+        logger.warning("Autoencoder will be served through Keras; weight export failed: %s", exc)
+
+
+def export_bundle(
+    *,
+    xgb_model: Any,
+    ada_model: Any,
+    scaler: Any,
+    label_encoder: Any,
+    feature_names: list[str],
+    ae_threshold: float | None,
+    autoencoder: Any = None,
+    root: Path = MODEL_BUNDLE_DIR,
+    metadata: dict[str, Any] | None = None,
+    activate: bool = True,
+) -> Path:
+    """Writes a new bundle version under ``root`` and, with ``activate``, points ``CURRENT`` at it.
+
+    ``autoencoder`` is a Keras model or the path of a saved ``.keras`` file; its weights are also
+    exported for the NumPy runtime (copied from an ``autoencoder.npz`` next to the file if present).
+    """
+    from .feature_engine import FEATURE_SPEC_VERSION
+
+    root.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=root))
+    try:
+        staging.chmod(0o755)
+        xgb_model.save_model(staging / _ARTIFACT_FILES["xgboost"])
+        # Uncompressed so the arrays can be memory-mapped on load.
+        joblib.dump(ada_model, staging / _ARTIFACT_FILES["adaboost"])
+        joblib.dump(scaler, staging / _ARTIFACT_FILES["scaler"])
+        joblib.dump(label_encoder, staging / _ARTIFACT_FILES["label_encoder"])
+        weights_path = staging / _ARTIFACT_FILES["autoencoder_weights"]
+        if isinstance(autoencoder, (str, Path)):
+            shutil.copyfile(autoencoder, staging / _ARTIFACT_FILES["autoencoder"])
+            exported = Path(autoencoder).with_name(_ARTIFACT_FILES["autoencoder_weights"])
+            if exported.exists():
+                shutil.copyfile(exported, weights_path)
+            else:
+                from tensorflow import keras
+
+                _export_weights(keras.models.load_model(autoencoder, compile=False), weights_path)
+        elif autoencoder is not None:
+            autoencoder.save(staging / _ARTIFACT_FILES["autoencoder"])
+            _export_weights(autoencoder, weights_path)
+
+        artifacts = {}
+        for kind, filename in _ARTIFACT_FILES.items():
+            artifact = staging / filename
+            if artifact.exists():
+                artifacts[kind] = {"file": filename, "sha256": _sha256(artifact), "bytes": artifact.stat().st_size}
+        fingerprint = hashlib.sha256("".join(info["sha256"] for info in artifacts.values()).encode()).hexdigest()
+        version = f"{datetime.utcnow():%Y%m%dT%H%M%SZ}-{fingerprint[:8]}"
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": version,
+            "createdAt": datetime.utcnow().isoformat(),
+            "featureSpecVersion": FEATURE_SPEC_VERSION,
+            "featureNames": list(feature_names),
+            "classLabels": [str(label) for label in label_encoder.classes_],
+            "aeThreshold": None if ae_threshold is None else float(ae_threshold),
+            "artifacts": artifacts,
+            "metadata": metadata or {},
+        }
+        (staging / _MANIFEST).write_text(json.dumps(manifest, indent=2))
+        target = root / version
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if activate:
+        pointer = root / f"{_CURRENT}.{os.getpid()}.tmp"
+        pointer.write_text(version + "\n")
+        os.replace(pointer, root / _CURRENT)
+    return target
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import urllib.request
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import BinaryIO, Callable, Protocol
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+
+from ..config import settings
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Recently seen content hashes, so repeat uploads skip even the backend existence check.
+_DEDUP_CACHE_SIZE = 1024
+
+
+@dataclass
+class StoredObject:
+    asset_id: str
+    public_id: str
+    secure_url: str
+    bytes: int
+    format: str
+    sha256: str = ""
+    # True when an identical file was already archived and the transfer was skipped.
+    deduplicated: bool = False
+
+
+class ObjectStorage(Protocol):
+    """Archive for raw uploads, content-addressed by SHA-256.
+
+    All methods block; callers run them off the event loop.
+    """
+
+    name: str
+
+    @property
+    def configured(self) -> bool: ...
+
+    def put(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject: ...
+
+    def find(self, sha256: str) -> StoredObject | None: ...
+
+    def read_range(self, sha256: str, start: int = 0, end: int | None = None) -> bytes: ...
+
+
+class _DedupStorage(ABC):
+    """Shared ``put``: return the archived copy when the content hash is already stored."""
+
+    name = "Object storage"
+
+    def __init__(self) -> None:
+        self._known: LRUCache[str, StoredObject] = LRUCache(_DEDUP_CACHE_SIZE)
+
+    def put(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject:
+        existing = self._known.get(sha256) or self.find(sha256)
+        if existing is not None:
+            self._known.set(sha256, existing)
+            return replace(existing, deduplicated=True)
+        stored = self._upload(path, public_id, size, sha256)
+        self._known.set(sha256, stored)
+        return stored
+
+    @abstractmethod
+    def find(self, sha256: str) -> StoredObject | None: ...
+
+    @abstractmethod
+    def _upload(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject: ...
+
+
+def _range_header(start: int, end: int | None) -> str:
+    """HTTP byte range; ``end`` is exclusive like a slice."""
+    return f"bytes={start}-" if end is None else f"bytes={start}-{end - 1}"
+
+
+def _write_atomically(destination: Path, write: Callable[[BinaryIO], object]) -> None:
+    """Writes via a temp file in the same directory and renames, so readers never see partial data."""
+    fd, tmp_name = tempfile.mkstemp(dir=destination.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            write(handle)
+        os.replace(tmp_name, destination)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class _ObjectIndex:
+    """``<root>/<sha[:2]>/<sha>.json`` records of archived objects, one ``StoredObject`` per hash."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+
+    def path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / f"{sha256}.json"
+
+    def get(self, sha256: str) -> StoredObject | None:
+        try:
+            meta = json.loads(self.path(sha256).read_text())
+        except (OSError, ValueError):
+            return None
+        return StoredObject(**meta)
+
+    def add(self, stored: StoredObject) -> None:
+        target = self.path(stored.sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        metadata = json.dumps(asdict(replace(stored, deduplicated=False))).encode()
+        _write_atomically(target, lambda handle: handle.write(metadata))
+
+
+class CloudinaryStorage(_DedupStorage):
+    """Raw uploads in Cloudinary, tagged with their content hash for dedup lookups.
+
+    Lookups hit the local ``OBJECT_INDEX_DIR`` index first; the Admin API is rate-limited
+    per hour, so it is only queried for hashes this deployment has not recorded yet.
+    """
+
+    name = "Cloudinary"
+
+    def __init__(self, index_dir: Path | None = None) -> None:
+        super().__init__()
+        self.folder = settings.cloudinary_upload_folder
+        self._index = _ObjectIndex(index_dir or settings.object_index_dir)
+        if self.configured:
+            cloudinary.config(
+                cloud_name=settings.cloudinary_cloud_name,
+                api_key=settings.cloudinary_api_key,
+                api_secret=settings.cloudinary_api_secret,
+                secure=True,
+            )
+        else:
+            logger.warning("Cloudinary configuration is incomplete. Upload endpoint will return 500 until configured.")
+
+    @property
+    def configured(self) -> bool:
+        return settings.cloudinary_configured
+
+    @staticmethod
+    def _tag(sha256: str) -> str:
+        return f"sha256_{sha256}"
+
+    @staticmethod
+    def _to_stored(result: dict, public_id: str, size: int, sha256: str) -> StoredObject:
+        return StoredObject(
+            asset_id=result.get("asset_id", ""),
+            public_id=result.get("public_id", public_id),
+            secure_url=result.get("secure_url", ""),
+            bytes=result.get("bytes", size),
+            format=result.get("format", "csv"),
+            sha256=sha256,
+        )
+
+    def _remember(self, stored: StoredObject) -> None:
+        try:
+            self._index.add(stored)
+        except OSError as exc:
+            logger.warning("Could not record %s in the object index: %s", stored.sha256, exc)
+
+    def find(self, sha256: str) -> StoredObject | None:
+        indexed = self._index.get(sha256)
+        if indexed is not None:
+            return indexed
+        try:
+            response = cloudinary.api.resources_by_tag(self._tag(sha256), resource_type="raw", max_results=1)
+        except Exception as exc:  # pragma: no cover - network call
+            logger.warning("Cloudinary dedup lookup failed, uploading anyway: %s", exc)
+            return None
+        resources = response.get("resources") or []
+        if not resources:
+            return None
+        resource = resources[0]
+        stored = self._to_stored(resource, resource.get("public_id", ""), resource.get("bytes", 0), sha256)
+        self._remember(stored)
+        return stored
+
+    def _upload(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject:
+        with path.open("rb") as handle:
+            result = cloudinary.uploader.upload(
+                handle,
+                resource_type="raw",
+                folder=self.folder,
+                public_id=public_id,
+                overwrite=False,
+                format="csv",
+                tags=[self._tag(sha256)],
+            )
+        stored = self._to_stored(result, public_id, size, sha256)
+        self._remember(stored)
+        return stored
+
+    def read_range(self, sha256: str, start: int = 0, end: int | None = None) -> bytes:
+        stored = self._known.get(sha256) or self.find(sha256)
+        if stored is None:
+            raise FileNotFoundError(sha256)
+        request = urllib.request.Request(stored.secure_url, headers={"Range": _range_header(start, end)})
+        with urllib.request.urlopen(request, timeout=60) as response:  # pragma: no cover - network call
+            data = response.read()
+            # Servers that ignore Range answer 200 with the whole object.
+            if response.status == 200:
+                data = data[start:end]
+        return data
+
+
+class S3Storage(_DedupStorage):
+    """S3-compatible bucket; objects live at ``<S3_PREFIX><sha256>.csv``."""
+
+    name = "S3"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.bucket = settings.s3_bucket
+        self.prefix = settings.s3_prefix
+        self._client = None
+        if not self.configured:
+            logger.warning("S3_BUCKET is not set. Upload endpoint will return 500 until configured.")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.bucket)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client(
+                "s3", endpoint_url=settings.s3_endpoint_url, region_name=settings.s3_region
+            )
+        return self._client
+
+    def _key(self, sha256: str) -> str:
+        return f"{self.prefix}{sha256}.csv"
+
+    def _url(self, key: str) -> str:
+        if settings.s3_endpoint_url:
+            return f"{settings.s3_endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        region = f".{settings.s3_region}" if settings.s3_region else ""
+        return f"https://{self.bucket}.s3{region}.amazonaws.com/{key}"
+
+    def find(self, sha256: str) -> StoredObject | None:
+        from botocore.exceptions import ClientError
+
+        key = self._key(sha256)
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(
+            asset_id=head.get("ETag", "").strip('"'),
+            public_id=head.get("Metadata", {}).get("public-id", sha256),
+            secure_url=self._url(key),
+            bytes=head.get("ContentLength", 0),
+            format="csv",
+            sha256=sha256,
+        )
+
+    def _upload(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject:
+        key = self._key(sha256)
+        self.client.upload_file(
+            str(path),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": "text/csv", "Metadata": {"public-id": public_id, "sha256": sha256}},
+        )
+        head = self.client.head_object(Bucket=self.bucket, Key=key)
+        return StoredObject(
+            asset_id=head.get("ETag", "").strip('"'),
+            public_id=public_id,
+            secure_url=self._url(key),
+            bytes=size,
+            format="csv",
+            sha256=sha256,
+        )
+
+    def read_range(self, sha256: str, start: int = 0, end: int | None = None) -> bytes:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(sha256), Range=_range_header(start, end)
+            )
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(sha256) from exc
+            raise
+        return response["Body"].read()
+
+
+class LocalStorage(_DedupStorage):
+    """Content-addressed directory for air-gapped sites: ``<root>/<sha[:2]>/<sha>.csv`` + ``.json``."""
+
+    name = "Local storage"
+
+    def __init__(self, root: Path | None = None, base_url: str | None = None) -> None:
+        super().__init__()
+        self.root = Path(root or settings.local_storage_dir)
+        self.base_url = base_url if base_url is not None else settings.local_storage_base_url
+        self._index = _ObjectIndex(self.root)
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    def _path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / f"{sha256}.csv"
+
+    def _url(self, path: Path, sha256: str) -> str:
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{sha256[:2]}/{sha256}.csv"
+        return path.resolve().as_uri()
+
+    def find(self, sha256: str) -> StoredObject | None:
+        return self._index.get(sha256)
+
+    def _upload(self, path: Path, public_id: str, size: int, sha256: str) -> StoredObject:
+        target = self._path(sha256)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        stored = StoredObject(
+            asset_id=sha256,
+            public_id=public_id,
+            secure_url=self._url(target, sha256),
+            bytes=size,
+            format="csv",
+            sha256=sha256,
+        )
+        # The metadata file is written last; its presence marks the object as complete.
+        with path.open("rb") as source:
+            _write_atomically(target, lambda handle: shutil.copyfileobj(source, handle))
+        self._index.add(stored)
+        return stored
+
+    def read_range(self, sha256: str, start: int = 0, end: int | None = None) -> bytes:
+        with self._path(sha256).open("rb") as handle:
+            handle.seek(start)
+            return handle.read(-1 if end is None else max(0, end - start))
+
+
+def _create_storage() -> ObjectStorage:
+    backend = settings.object_storage_backend
+    if backend == "s3":
+        return S3Storage()
+    if backend == "local":
+        return LocalStorage()
+    if backend != "cloudinary":
+        logger.warning("Unknown OBJECT_STORAGE_BACKEND '%s'; falling back to Cloudinary", backend)
+    return CloudinaryStorage()
+
+
+_storage: ObjectStorage | None = None
+
+
+def get_storage() -> ObjectStorage:
+    global _storage
+    if _storage is None:
+        _storage = _create_storage()
+    return _storage
+
+
+def set_storage(storage: ObjectStorage) -> None:
+    """Swaps the archive backend, e.g. for a local fake in tests."""
+    global _storage
+    _storage = storage
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import math
+import os
+from threading import Lock
+from typing import Any, Dict, Hashable, Mapping, Optional
+
+from . import model_registry
+from .lru_cache import LRUCache
+
+# Single-row predictions keyed by the quantized feature dict + the bundle version that scored them.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+# Significant digits kept per feature value; inputs equal at this precision share a result.
+PREDICTION_CACHE_PRECISION = int(os.getenv("PREDICTION_CACHE_PRECISION", "6"))
+
+
+def _quantize(value: Any) -> Hashable:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if not math.isfinite(number):
+        return str(number)
+    return float(f"{number:.{PREDICTION_CACHE_PRECISION}g}")
+
+
+class PredictionCache:
+    """Bounded LRU/TTL cache of prediction results in front of the inference executor.
+
+    Every registry swap clears the cache and starts a new ``generation``. Callers read the
+    generation before dispatching, and ``set`` drops results from an older generation, so a batch
+    scored on the previous bundle that finishes after a swap is never cached. Within a generation,
+    entries are keyed by the bundle version the workers report with their results. The first
+    version stored wins, and results of any other version are not cached. Neither path reads the
+    model directory.
+    """
+
+    def __init__(self) -> None:
+        self._cache: LRUCache[Hashable, Dict[str, Any]] = LRUCache(
+            PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS
+        )
+        self._lock = Lock()
+        self.generation = 0
+        self._version: Optional[str] = None
+        model_registry.add_listener(lambda bundle, previous: self.clear())
+
+    def key(self, features: Mapping[str, Any]) -> Optional[Hashable]:
+        """Cache key for ``features``; None (do not cache) when the cache is disabled."""
+        if self._cache.maxsize == 0:
+            return None
+        return tuple(sorted((str(name), _quantize(value)) for name, value in features.items()))
+
+    def get(self, key: Optional[Hashable]) -> Optional[Dict[str, Any]]:
+        version = self._version
+        if key is None or version is None:
+            return None
+        return self._cache.get((version, key))
+
+    def set(self, key: Optional[Hashable], generation: int, version: str, result: Dict[str, Any]) -> None:
+        """Stores ``result``, scored by bundle ``version`` for a request that saw ``generation``."""
+        if key is None:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if self._version is None:
+                self._version = version
+            elif version != self._version:
+                return
+            self._cache.set((version, key), result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._version = None
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
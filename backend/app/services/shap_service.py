@@ -1,38 +1,288 @@
 import pandas as pd
 import numpy as np
-import shap
+import json
 import logging
-import joblib
 import os
+from dataclasses import dataclass
 from pathlib import Path
+from threading import Lock
+
+from . import model_registry
+from .feature_engine import ChannelStats, assemble_features
+from .lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
-MODEL_DIR = Path(__file__).resolve().parent.parent.parent / "dcrm_models" / "shap_models"
-_xgb_shap_model = None
-_ada_shap_model = None
-_shap_feature_names = []
+# Explainers are tied to the model objects they were built from and rebuilt only when those change.
+_explainer_lock = Lock()
+_explainer_models = None
+_explainers = None
+
+# SHAP outputs keyed by upload content hash + segment size + model bundle version.
+SHAP_CACHE_SIZE = int(os.getenv("SHAP_CACHE_SIZE", "64"))
+SHAP_CACHE_DIR = os.getenv("SHAP_CACHE_DIR")
+_result_cache: LRUCache[str, dict] = LRUCache(SHAP_CACHE_SIZE)
 
-def _load_shap_models():
-    """Lazy loads the dedicated SHAP models."""
-    global _xgb_shap_model, _ada_shap_model, _shap_feature_names
+def get_shap_models():
+    """Returns the models and feature names of the shared bundle, or Nones when it cannot load."""
     try:
-        if not _xgb_shap_model:
-            _xgb_shap_model = joblib.load(MODEL_DIR / "xgb_shap_model.pkl")
-        if not _ada_shap_model:
-            _ada_shap_model = joblib.load(MODEL_DIR / "ada_shap_model.pkl")
-        if not _shap_feature_names:
-            _shap_feature_names = joblib.load(MODEL_DIR / "shap_feature_names.pkl")
-    except Exception as e:
+        bundle = model_registry.get_bundle()
+    except RuntimeError as e:
         logger.error(f"Error loading SHAP models: {e}")
+        return None, None, []
+    return bundle.xgboost, bundle.adaboost, bundle.feature_names
+
+def _get_explainers(xgb_model, ada_model):
+    """Returns cached ``(xgb_explainer, ada_explainer)``; the AdaBoost one is None when unsupported."""
+    global _explainer_models, _explainers
+    with _explainer_lock:
+        if _explainer_models is not None and _explainer_models[0] is xgb_model and _explainer_models[1] is ada_model:
+            return _explainers
+
+        # SHAP pulls in most of sklearn/scipy; import it with the first explainer, not at app start.
+        import shap
+
+        explainer_xgb = shap.TreeExplainer(xgb_model)
+        explainer_ada = None
+        # AdaBoost (might need KernelExplainer if not tree-based, but usually is)
+        if hasattr(ada_model, "estimators_"):
+            try:
+                explainer_ada = shap.TreeExplainer(ada_model)
+            except Exception:
+                # Fallback to zeros
+                explainer_ada = None
+
+        _explainer_models = (xgb_model, ada_model)
+        _explainers = (explainer_xgb, explainer_ada)
+        return _explainers
+
+
+def _on_bundle_swap(bundle, previous) -> None:
+    """Drops explainers and results tied to the replaced models."""
+    global _explainer_models, _explainers
+    with _explainer_lock:
+        _explainer_models = None
+        _explainers = None
+    _result_cache.clear()
+
+
+model_registry.add_listener(_on_bundle_swap)
+
+
+def prepare_explainers() -> None:
+    """Builds the explainers for the active models ahead of the first SHAP request."""
+    xgb_model, ada_model, _ = get_shap_models()
+    if xgb_model is None:
+        raise RuntimeError("SHAP models are not loaded")
+    _get_explainers(xgb_model, ada_model)
+
+
+def _model_fingerprint() -> str:
+    return model_registry.active_version() or "missing"
+
+
+def shap_cache_key(content_sha256: str, segment_ms: int = 10) -> str:
+    return f"{content_sha256}-{segment_ms}-{_model_fingerprint()}"
+
+
+def _disk_cache_path(key: str) -> Path | None:
+    if not SHAP_CACHE_DIR:
+        return None
+    return Path(SHAP_CACHE_DIR) / f"{key}.json"
+
+
+def get_cached_shap(key: str) -> dict | None:
+    """Looks up a SHAP result in memory, then in ``SHAP_CACHE_DIR`` when configured."""
+    result = _result_cache.get(key)
+    if result is not None:
+        return result
+
+    path = _disk_cache_path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        result = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable SHAP cache entry {path}: {e}")
+        return None
+    _result_cache.set(key, result)
+    return result
+
+
+def store_cached_shap(key: str, result: dict) -> None:
+    _result_cache.set(key, result)
+
+    path = _disk_cache_path(key)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(result))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not persist SHAP cache entry {path}: {e}")
+
+
+def _resolve_time_column(columns: list[str]) -> str | None:
+    # Common variations: "Time (ms)", "Time(ms)", "time", "Time"
+    time_col = next((col for col in columns if "time" in col.lower() and "ms" in col.lower()), None)
+    if time_col is None:
+        time_col = next((col for col in columns if col.lower() == "time"), None)
+    return time_col
+
+
+@dataclass
+class WindowFeatures:
+    """Per-window model features for ``[start, start + segment_ms)`` windows, keyed by feature name."""
+
+    starts: np.ndarray
+    segment_ms: int
+    features: dict[str, np.ndarray]
+
+    def time_windows(self) -> list[dict[str, int]]:
+        return [{"start_ms": int(start), "end_ms": int(start + self.segment_ms)} for start in self.starts]
+
+    def to_frame(self, feature_names: list[str]) -> pd.DataFrame:
+        zeros = np.zeros(len(self.starts))
+        return pd.DataFrame(
+            {fname: self.features.get(fname, zeros) for fname in feature_names},
+            columns=feature_names,
+        )
+
+
+class WindowFeatureAccumulator:
+    """Streams waveform rows into per-window mean/std/max so features never need the whole capture.
+
+    Chunks are merged with Chan's parallel variance update; a single ``update`` computes exactly
+    what a one-shot pass would. Features are assembled by ``feature_engine``, as in training.
+    """
+
+    def __init__(self, columns: list[str], segment_ms: int = 10) -> None:
+        self.segment_ms = segment_ms
+        self.time_column = _resolve_time_column(columns)
+        if self.time_column is None:
+            # Fallback: synthesize time assuming 10kHz (0.1ms per sample)
+            # This handles cases where CSV has no explicit time column
+            logger.warning("SHAP: 'timeMs' not found, synthesizing 10kHz time axis")
+        self.channels = {
+            "resistance": next((c for c in columns if "resistance" in c.lower()), None),
+            "travel": next((c for c in columns if "travel" in c.lower()), None),
+            "current": next((c for c in columns if "current" in c.lower() and "coil" not in c.lower()), None),
+        }
+        self._rows_seen = 0
+        self._max_time = np.nan
+        self._count = np.zeros(0, dtype=np.int64)
+        self._stats = {
+            channel: {"mean": np.zeros(0), "m2": np.zeros(0), "max": np.zeros(0)}
+            for channel, column in self.channels.items()
+            if column is not None
+        }
+
+    def _grow(self, size: int) -> None:
+        extra = size - len(self._count)
+        if extra <= 0:
+            return
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        for stats in self._stats.values():
+            for key in stats:
+                stats[key] = np.concatenate([stats[key], np.zeros(extra)])
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        n_rows = len(chunk)
+        if self.time_column is not None:
+            time_values = chunk[self.time_column].to_numpy(dtype=float)
+        else:
+            time_values = np.arange(self._rows_seen, self._rows_seen + n_rows) * 0.1
+        self._rows_seen += n_rows
+
+        valid_time = ~np.isnan(time_values)
+        if not valid_time.any():
+            return
+        chunk_max = time_values[valid_time].max()
+        self._max_time = chunk_max if np.isnan(self._max_time) else max(self._max_time, chunk_max)
+
+        # Window k holds k * segment_ms <= t < (k + 1) * segment_ms; the corrections make the
+        # floor agree with those exact comparisons at window edges.
+        segment = self.segment_ms
+        window_of_row = np.floor(np.where(valid_time, time_values, -1.0) / segment)
+        window_of_row -= window_of_row * segment > time_values
+        window_of_row += (window_of_row + 1) * segment <= time_values
+        rows = np.flatnonzero(valid_time & (window_of_row >= 0))
+        if len(rows) == 0:
+            return
+        order = rows[np.argsort(window_of_row[rows], kind="stable")]
+        window_idx = window_of_row[order].astype(np.int64)
+        windows, offsets, counts = np.unique(window_idx, return_index=True, return_counts=True)
+        self._grow(int(windows[-1]) + 1)
+
+        existing = self._count[windows]
+        fresh = existing == 0
+        total = existing + counts
+        for channel, stats in self._stats.items():
+            values = chunk[self.channels[channel]].to_numpy(dtype=float)[order]
+            mean_b = np.add.reduceat(values, offsets) / counts
+            deviations = values - np.repeat(mean_b, counts)
+            m2_b = np.add.reduceat(deviations * deviations, offsets)
+            max_b = np.maximum.reduceat(values, offsets)
+
+            mean_a = stats["mean"][windows]
+            delta = mean_b - mean_a
+            stats["mean"][windows] = np.where(fresh, mean_b, mean_a + delta * counts / total)
+            stats["m2"][windows] = np.where(
+                fresh, m2_b, stats["m2"][windows] + m2_b + delta * delta * existing * counts / total
+            )
+            stats["max"][windows] = np.where(fresh, max_b, np.maximum(stats["max"][windows], max_b))
+        self._count[windows] = total
+
+    def finalize(self) -> WindowFeatures | None:
+        if np.isnan(self._max_time):
+            return None
+        starts = np.arange(0, int(self._max_time), self.segment_ms)
+        n_windows = len(starts)
+        if n_windows == 0:
+            return None
+        self._grow(n_windows)
+
+        counts = self._count[:n_windows]
+        occupied = counts > 0
+
+        def channel_stats(channel: str) -> ChannelStats | None:
+            stats = self._stats.get(channel)
+            if stats is None:
+                return None
+            std = np.zeros(n_windows)
+            std[occupied] = np.sqrt(stats["m2"][:n_windows][occupied] / counts[occupied])
+            return ChannelStats(mean=stats["mean"][:n_windows], std=std, max=stats["max"][:n_windows])
+
+        features = assemble_features(
+            channel_stats("resistance"),
+            channel_stats("travel"),
+            channel_stats("current"),
+            shape=(n_windows,),
+            occupied=occupied,
+        )
+        return WindowFeatures(starts=starts, segment_ms=self.segment_ms, features=features)
+
+
+def compute_window_features(waveform_df: pd.DataFrame, segment_ms: int = 10) -> WindowFeatures | None:
+    accumulator = WindowFeatureAccumulator([str(col) for col in waveform_df.columns], segment_ms)
+    accumulator.update(waveform_df)
+    return accumulator.finalize()
 
-def get_shap_models():
-    """Returns the loaded SHAP models and feature names."""
-    if not (_xgb_shap_model and _ada_shap_model and _shap_feature_names):
-        _load_shap_models()
-    return _xgb_shap_model, _ada_shap_model, _shap_feature_names
 
 def calculate_shap_for_waveform(waveform_df: pd.DataFrame, segment_ms: int = 10) -> dict | None:
+    try:
+        window_features = compute_window_features(waveform_df, segment_ms)
+    except Exception as e:
+        logger.error(f"SHAP calculation failed: {e}")
+        return None
+    if window_features is None:
+        return None
+    return explain_window_features(window_features)
+
+
+def explain_window_features(window_features: WindowFeatures) -> dict | None:
     try:
         # 1. Get Models (Dedicated SHAP Models)
         xgb_model, ada_model, feature_names = get_shap_models()
@@ -40,117 +290,23 @@ def calculate_shap_for_waveform(waveform_df: pd.DataFrame, segment_ms: int = 10)
             logger.warning("SHAP skipped: Models not ready")
             return None
 
-        # 1. Segment Data
-        # 1. Segment Data
-        # Normalize columns if needed
-        # Common variations: "Time (ms)", "Time(ms)", "time", "Time"
-        for col in waveform_df.columns:
-            if "time" in col.lower() and "ms" in col.lower():
-                waveform_df = waveform_df.rename(columns={col: "timeMs"})
-                break
-        
-        if "timeMs" not in waveform_df.columns:
-             # Fallback: check for just "Time"
-             for col in waveform_df.columns:
-                if col.lower() == "time":
-                    waveform_df = waveform_df.rename(columns={col: "timeMs"})
-                    break
-
-        if "timeMs" not in waveform_df.columns:
-             # Fallback: synthesize time assuming 10kHz (0.1ms per sample)
-             # This handles cases where CSV has no explicit time column
-             logger.warning("SHAP: 'timeMs' not found, synthesizing 10kHz time axis")
-             waveform_df["timeMs"] =  pd.RangeIndex(len(waveform_df)) * 0.1
-             
-        max_time = waveform_df["timeMs"].max()
-        if pd.isna(max_time):
-            return None
-
-        windows = []
-        features_list = []
-        
-        # Determine sampling rate if possible, else assume 10kHz (0.1ms)
-        
-        for start in range(0, int(max_time), segment_ms):
-            end = start + segment_ms
-            windows.append({"start_ms": start, "end_ms": end})
-            
-            # Slice dataframe
-            segment = waveform_df[(waveform_df["timeMs"] >= start) & (waveform_df["timeMs"] < end)]
-            
-            features = {}
-            if not segment.empty:
-                # Basic Feature Engineering - mapping to likely model feature names
-                # Ideally this matches training exactly. 
-                # If feature_names are complex (e.g. "resistance_mean"), we generate them.
-                # If we don't know the feature names, we create a generic set and fill zeros for missing.
-                
-                # Check for resistance
-                res_col = next((c for c in segment.columns if "resistance" in c.lower()), None)
-                travel_col = next((c for c in segment.columns if "travel" in c.lower()), None)
-                curr_col = next((c for c in segment.columns if "current" in c.lower() and "coil" not in c.lower()), None)
-
-                if res_col:
-                    vals = segment[res_col].values
-                    features["window_mean_resistance"] = np.mean(vals)
-                    features["window_std_resistance"] = np.std(vals)
-                    features["window_max_resistance"] = np.max(vals)
-                    features["Rp_avg"] = np.mean(vals) # Consistent with training script
-                
-                if travel_col:
-                     vals = segment[travel_col].values
-                     features["window_mean_travel"] = np.mean(vals)
-                     features["window_std_travel"] = np.std(vals)
-                     features["window_max_travel"] = np.max(vals) # Note: Only if in training features
-                
-                if curr_col:
-                     vals = segment[curr_col].values
-                     features["window_mean_current"] = np.mean(vals)
-                     features["window_std_current"] = np.std(vals)
-                
-                # Cross-features
-                r_mean = features.get("window_mean_resistance", 0)
-                t_mean = features.get("window_mean_travel", 0)
-                features["Ra_ta"] = r_mean * t_mean
-                features["T_overlap"] = 0 # Placeholder matches training script
-            
-            # Fill the row for the model
-            # Fill the row for the model
-            row_values = []
-            for fname in feature_names:
-                val = features.get(fname, 0.0)
-                row_values.append(val)
-            
-            features_list.append(row_values)
-
-        if not features_list:
-            return None
-
-        X_windows = pd.DataFrame(features_list, columns=feature_names)
+        windows = window_features.time_windows()
+        X_windows = window_features.to_frame(feature_names)
 
         # 2. Compute SHAP
-        # Use TreeExplainer for speed
-        # Ensure we are using the booster if possible
-        
-        # XGBoost
-        explainer_xgb = shap.TreeExplainer(xgb_model)
+        # TreeExplainers are built once per loaded model and reused across uploads
+        explainer_xgb, explainer_ada = _get_explainers(xgb_model, ada_model)
         shap_xgb = explainer_xgb.shap_values(X_windows)
-        
-        # AdaBoost (might need KernelExplainer if not tree-based, but usually is)
-        # Check if adaboost has estimators_
-        if hasattr(ada_model, "estimators_"):
-             # For adaboost, using the first estimator or a kernel explainer is common
-             # or treating it as an ensemble. 
-             # Simpler fallback: just use XGBoost SHAP for main explanation if ada is complex
-             # But let's try TreeExplainer if it's a decision tree base
-             try:
-                 explainer_ada = shap.TreeExplainer(ada_model)
-                 shap_ada = explainer_ada.shap_values(X_windows)
-             except Exception:
-                 # Fallback to zeros or skipped
-                 shap_ada = np.zeros_like(shap_xgb)
-        else:
-             shap_ada = np.zeros_like(shap_xgb)
+
+        shap_ada = None
+        if explainer_ada is not None:
+            try:
+                shap_ada = explainer_ada.shap_values(X_windows)
+            except Exception:
+                shap_ada = None
+        if shap_ada is None:
+            # Fallback to zeros or skipped
+            shap_ada = np.zeros_like(shap_xgb)
 
 
         # 3. Aggregation & Normalization
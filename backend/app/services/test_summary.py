@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .shap_service import _resolve_time_column
+from .waveform_preview import _normalize_column, _to_float_array
+
+# Readings at or above this are the recorder's out-of-range marker (8000) and are ignored,
+# as in the dashboard's own statistics (src/app/api/dcrm-data/route.ts).
+_OUT_OF_RANGE = 8000.0
+# Sample spacing assumed when the capture has no time column (10 kHz).
+_DEFAULT_SAMPLE_MS = 0.1
+
+
+def _find_channel(columns: list[str], kind: str, channel: str) -> str | None:
+    for column in columns:
+        normalized = _normalize_column(column)
+        if kind in normalized and channel in normalized:
+            return column
+    return None
+
+
+class TestSummaryAccumulator:
+    """Streams the ``test_results`` summary columns over ingest chunks.
+
+    ``travelT1Max`` and ``velocityT1Max`` are maxima below the out-of-range marker;
+    ``resistanceCH1Avg`` is, like the dashboard, the minimum valid static resistance.
+    """
+
+    def __init__(self, columns: list[str]) -> None:
+        self.time_column = _resolve_time_column(columns)
+        self.travel_column = _find_channel(columns, "travel", "t1")
+        self.resistance_column = _find_channel(columns, "resistance", "ch1")
+        self._rows_seen = 0
+        self._travel_max = -np.inf
+        self._velocity_max = -np.inf
+        self._resistance_min = np.inf
+        # Last sample of the previous chunk, so velocity is continuous across chunk edges.
+        self._prev_time: float | None = None
+        self._prev_travel: float | None = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        n_rows = len(chunk)
+        if n_rows == 0:
+            return
+        if self.time_column is not None:
+            time_values = _to_float_array(chunk[self.time_column])
+        else:
+            time_values = np.arange(self._rows_seen, self._rows_seen + n_rows) * _DEFAULT_SAMPLE_MS
+        self._rows_seen += n_rows
+
+        if self.resistance_column is not None:
+            resistance = _to_float_array(chunk[self.resistance_column])
+            valid = resistance[(resistance > 0) & (resistance < _OUT_OF_RANGE)]
+            if len(valid):
+                self._resistance_min = min(self._resistance_min, float(valid.min()))
+
+        if self.travel_column is None:
+            return
+        travel = _to_float_array(chunk[self.travel_column])
+        valid = travel[travel < _OUT_OF_RANGE]
+        if len(valid):
+            self._travel_max = max(self._travel_max, float(valid.max()))
+
+        if self._prev_time is not None:
+            time_values = np.concatenate([[self._prev_time], time_values])
+            travel = np.concatenate([[self._prev_travel], travel])
+        else:
+            # The first sample's velocity is defined as 0.
+            self._velocity_max = max(self._velocity_max, 0.0)
+        dt = np.diff(time_values) / 1000.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocity = np.where(dt > 0, np.diff(travel) / dt, 0.0)
+        valid = velocity[velocity < _OUT_OF_RANGE]
+        if len(valid):
+            self._velocity_max = max(self._velocity_max, float(valid.max()))
+        self._prev_time = float(time_values[-1])
+        self._prev_travel = float(travel[-1])
+
+    def finalize(self) -> dict[str, float | None]:
+        def value(metric: float, present: bool) -> float | None:
+            if not present:
+                return None
+            return float(metric) if np.isfinite(metric) else 0.0
+
+        return {
+            "travelT1Max": value(self._travel_max, self.travel_column is not None),
+            "velocityT1Max": value(self._velocity_max, self.travel_column is not None),
+            "resistanceCH1Avg": value(self._resistance_min, self.resistance_column is not None),
+        }
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import logging
+import os
+import warnings
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import AdaBoostClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+logger = logging.getLogger(__name__)
+
+# "0" scores through the sklearn/XGBoost wrappers only (DataFrame validation, per-call DMatrix).
+TREE_FAST_PATH = os.getenv("TREE_FAST_PATH", "1").strip().lower() not in {"0", "false", "no"}
+_PROBE_ROWS = 512
+
+
+def _self_check(scorer: Any, model: Any, n_features: int) -> None:
+    """Raises ``ValueError`` unless ``scorer`` reproduces ``model`` exactly on random inputs of several scales."""
+    rng = np.random.default_rng(0)
+    probe = rng.standard_normal((_PROBE_ROWS, n_features)) * rng.choice([0.1, 1.0, 10.0, 100.0], (_PROBE_ROWS, 1))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # ndarray input to a model fitted on a DataFrame
+        expected = (np.asarray(model.predict(probe), dtype=int), model.predict_proba(probe))
+    actual = scorer.predict_with_proba(probe)
+    if not (np.array_equal(expected[0], actual[0]) and np.array_equal(expected[1], actual[1])):
+        raise ValueError("compiled scorer does not reproduce the model's predictions")
+
+
+class XGBoostScorer:
+    """``XGBClassifier`` scoring via ``Booster.inplace_predict`` on a contiguous float32 matrix.
+
+    Mirrors ``XGBClassifier.predict``/``predict_proba`` (iteration range, missing value, class
+    expansion and 0.5 cut-off), so outputs are bit-identical to the wrapper.
+    """
+
+    def __init__(self, model: Any) -> None:
+        objective = model.get_params().get("objective")
+        if objective not in {"binary:logistic", "multi:softprob"}:
+            raise ValueError(f"Unsupported XGBoost objective {objective}")
+        self._booster = model.get_booster()
+        self._missing = model.missing
+        self._n_classes = int(model.n_classes_)
+        try:
+            self._iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self._iteration_range = (0, 0)
+
+    def predict_with_proba(self, matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        predictions = self._booster.inplace_predict(
+            np.ascontiguousarray(matrix, dtype=np.float32),
+            iteration_range=self._iteration_range,
+            predict_type="value",
+            missing=self._missing,
+            validate_features=False,
+        )
+        if predictions.ndim == 1:
+            indices = np.zeros(len(predictions), dtype=int)
+            indices[predictions > 0.5] = 1
+            return indices, np.vstack((1 - predictions, predictions)).transpose()
+        return np.argmax(predictions, axis=1), predictions
+
+
+class AdaBoostScorer:
+    """``AdaBoostClassifier`` over decision trees, flattened into node arrays.
+
+    Every estimator's contribution to the decision function depends only on the leaf a row
+    reaches, so it is tabulated per node once. Scoring walks all trees level by level,
+    gathers the leaf contributions and sums them over estimators in sklearn's order.
+    The result matches ``predict``/``predict_proba`` bit for bit.
+    """
+
+    def __init__(self, model: Any) -> None:
+        if not isinstance(model, AdaBoostClassifier) or model.algorithm not in {"SAMME", "SAMME.R"}:
+            raise ValueError("Only SAMME/SAMME.R AdaBoostClassifier models can be compiled")
+        if not all(isinstance(est, DecisionTreeClassifier) and est.n_outputs_ == 1 for est in model.estimators_):
+            raise ValueError("AdaBoost estimators must be single-output decision trees")
+
+        self._classes = model.classes_
+        self._n_classes = int(model.n_classes_)
+        self._weight_sum = model.estimator_weights_.sum()
+
+        features, thresholds, lefts, rights, missing_left, contributions, roots = [], [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for estimator, weight in zip(model.estimators_, model.estimator_weights_):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            # Leaves point at themselves so every row can take max_depth steps.
+            own = np.arange(tree.node_count) + offset
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            missing_left.append(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)))
+            contributions.append(self._node_contributions(model, estimator, weight))
+            offset += tree.node_count
+            depth = max(depth, tree.max_depth)
+
+        self._feature = np.concatenate(features)
+        self._threshold = np.concatenate(thresholds)
+        self._left = np.concatenate(lefts)
+        self._right = np.concatenate(rights)
+        self._missing_left = np.concatenate(missing_left).astype(bool)
+        self._contribution = np.concatenate(contributions)
+        self._roots = np.asarray(roots)[:, np.newaxis]
+        self._depth = depth
+
+    def _node_contributions(self, model: Any, estimator: Any, weight: float) -> np.ndarray:
+        n_classes = self._n_classes
+        value = estimator.tree_.value[:, 0, :n_classes]
+        if model.algorithm == "SAMME.R":
+            # DecisionTreeClassifier.predict_proba (stored class fractions), then sklearn's _samme_proba.
+            proba = value.copy()
+            np.clip(proba, np.finfo(proba.dtype).eps, None, out=proba)
+            log_proba = np.log(proba)
+            return (n_classes - 1) * (log_proba - (1.0 / n_classes) * log_proba.sum(axis=1)[:, np.newaxis])
+        predicted = estimator.classes_.take(np.argmax(value, axis=1), axis=0)
+        return np.where(predicted[:, np.newaxis] == model.classes_[np.newaxis, :], weight, -1 / (n_classes - 1) * weight)
+
+    def decision_function(self, matrix: np.ndarray) -> np.ndarray:
+        # Trees compare float32 inputs against float64 thresholds, like sklearn's Cython splitter.
+        values = np.asarray(matrix, dtype=np.float32)
+        rows = np.arange(len(values))[np.newaxis, :]
+        nodes = np.broadcast_to(self._roots, (len(self._roots), len(values)))
+        for _ in range(self._depth):
+            sample = values[rows, self._feature[nodes]]
+            go_left = np.where(np.isnan(sample), self._missing_left[nodes], sample <= self._threshold[nodes])
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+
+        # Reducing the leading axis adds estimator by estimator, as sklearn's sum() does.
+        decision = np.add.reduce(self._contribution[nodes], axis=0)
+        decision /= self._weight_sum
+        if self._n_classes == 2:
+            decision[:, 0] *= -1
+            return decision.sum(axis=1)
+        return decision
+
+    def predict_with_proba(self, matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        decision = self.decision_function(matrix)
+        if self._n_classes == 2:
+            labels = self._classes.take(decision > 0, axis=0)
+        else:
+            labels = self._classes.take(np.argmax(decision, axis=1), axis=0)
+        proba = AdaBoostClassifier._compute_proba_from_decision(decision.copy(), self._n_classes)
+        return np.asarray(labels, dtype=int), proba
+
+
+def _compile(kind: str, factory: Any, model: Any) -> Any:
+    if not TREE_FAST_PATH:
+        return None
+    try:
+        scorer = factory(model)
+        _self_check(scorer, model, model.n_features_in_)
+        return scorer
+    except (ValueError, AttributeError) as exc:
+        logger.warning("No compiled %s scorer; using the library wrapper: %s", kind, exc)
+        return None
+
+
+class TreeScorers:
+    """Class indices and probabilities for both tree ensembles of a bundle.
+
+    Inputs are ``(rows, features)`` arrays in ``feature_names`` order; models that could not be
+    compiled (or ``TREE_FAST_PATH=0``) go through their wrappers on a DataFrame.
+    """
+
+    def __init__(self, xgb_model: Any, ada_model: Any, feature_names: list[str]) -> None:
+        self._models = {"xgboost": xgb_model, "adaboost": ada_model}
+        self._feature_names = list(feature_names)
+        self.compiled = {
+            "xgboost": _compile("xgboost", XGBoostScorer, xgb_model),
+            "adaboost": _compile("adaboost", AdaBoostScorer, ada_model),
+        }
+
+    def _predict(self, name: str, matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        scorer = self.compiled[name]
+        if scorer is not None:
+            return scorer.predict_with_proba(matrix)
+        model = self._models[name]
+        frame = pd.DataFrame(matrix, columns=self._feature_names)
+        return np.asarray(model.predict(frame), dtype=int), model.predict_proba(frame)
+
+    def xgboost(self, matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return self._predict("xgboost", matrix)
+
+    def adaboost(self, matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return self._predict("adaboost", matrix)
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Protocol, Set
+
+from .lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps jobs in this process; "postgres" stores them in the upload_jobs table so any
+# API instance can answer status polls.
+UPLOAD_JOB_STORE = os.getenv("UPLOAD_JOB_STORE", "memory").strip().lower()
+UPLOAD_JOB_WORKERS = max(1, int(os.getenv("UPLOAD_JOB_WORKERS", "2")))
+# Seconds to wait before retrying a job that hit a saturated inference executor.
+UPLOAD_JOB_RETRY_DELAY = max(0.0, float(os.getenv("UPLOAD_JOB_RETRY_DELAY", "1")))
+# In-memory store: finished jobs kept (LRU) and for how long after they finished.
+UPLOAD_JOB_RETENTION = max(0, int(os.getenv("UPLOAD_JOB_RETENTION", "256")))
+UPLOAD_JOB_TTL_SECONDS = float(os.getenv("UPLOAD_JOB_TTL_SECONDS", "3600"))
+# Postgres store: unfinished jobs of this instance refresh updated_at every HEARTBEAT seconds;
+# unfinished jobs not refreshed for STALE_AFTER seconds belonged to an instance that died.
+UPLOAD_JOB_HEARTBEAT_SECONDS = max(1.0, float(os.getenv("UPLOAD_JOB_HEARTBEAT_SECONDS", "30")))
+UPLOAD_JOB_STALE_AFTER_SECONDS = max(
+    3 * UPLOAD_JOB_HEARTBEAT_SECONDS, float(os.getenv("UPLOAD_JOB_STALE_AFTER_SECONDS", "120"))
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+_FINISHED = {JOB_SUCCEEDED, JOB_FAILED}
+_ORPHANED_ERROR = "Upload job was interrupted by a server restart; please upload the file again"
+
+JobRecord = Dict[str, Any]
+
+
+class JobStore(Protocol):
+    async def create(self, file_name: str, include_shap: bool) -> JobRecord: ...
+
+    async def update(self, job_id: str, **fields: Any) -> None: ...
+
+    async def get(self, job_id: str) -> Optional[JobRecord]: ...
+
+    async def discard_result(self, job_id: str) -> None: ...
+
+    async def heartbeat(self, job_ids: Iterable[str]) -> None: ...
+
+    async def fail_orphaned(self) -> int: ...
+
+
+class InMemoryJobStore:
+    """Jobs of this process only; finished jobs are evicted by count and age.
+
+    Queued and running jobs are never evicted. Once a job finishes it moves to an LRU bounded by
+    ``UPLOAD_JOB_RETENTION`` entries and ``UPLOAD_JOB_TTL_SECONDS``, and a served result is
+    dropped right away so only the small status record lingers.
+    """
+
+    def __init__(self, retention: int = UPLOAD_JOB_RETENTION, ttl_seconds: float = UPLOAD_JOB_TTL_SECONDS) -> None:
+        self._active: Dict[str, JobRecord] = {}
+        self._finished: LRUCache[str, JobRecord] = LRUCache(retention, ttl_seconds)
+
+    async def create(self, file_name: str, include_shap: bool) -> JobRecord:
+        now = datetime.utcnow()
+        record: JobRecord = {
+            "jobId": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "fileName": file_name,
+            "includeShap": include_shap,
+            "error": None,
+            "errorStatus": None,
+            "result": None,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        self._active[record["jobId"]] = record
+        return dict(record)
+
+    def _lookup(self, job_id: str) -> Optional[JobRecord]:
+        record = self._active.get(job_id)
+        return record if record is not None else self._finished.get(job_id)
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        record = self._lookup(job_id)
+        if record is None:
+            return
+        record.update(fields, updatedAt=datetime.utcnow())
+        if record["status"] in _FINISHED and self._active.pop(job_id, None) is not None:
+            self._finished.set(job_id, record)
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        record = self._lookup(job_id)
+        return dict(record) if record is not None else None
+
+    async def discard_result(self, job_id: str) -> None:
+        record = self._finished.get(job_id)
+        if record is not None:
+            record["result"] = None
+
+    async def heartbeat(self, job_ids: Iterable[str]) -> None:
+        return None
+
+    async def fail_orphaned(self) -> int:
+        # Jobs of a previous process died with it; there is nothing to recover.
+        return 0
+
+
+class PostgresJobStore:
+    """Job records in the ``upload_jobs`` table (see prisma/schema.prisma).
+
+    Results stay in the table after they are served, so any instance can answer ``/result``.
+    """
+
+    _COLUMNS = {
+        "status": "status",
+        "error": "error",
+        "errorStatus": "error_status",
+        "result": "result",
+    }
+
+    async def create(self, file_name: str, include_shap: bool) -> JobRecord:
+        from ..db import database
+
+        now = datetime.utcnow()
+        job_id = uuid.uuid4().hex
+        query = """
+            INSERT INTO upload_jobs (job_id, status, file_name, include_shap, created_at, updated_at)
+            VALUES (:job_id, :status, :file_name, :include_shap, :now, :now)
+        """
+        await database.execute(
+            query=query,
+            values={
+                "job_id": job_id,
+                "status": JOB_QUEUED,
+                "file_name": file_name,
+                "include_shap": include_shap,
+                "now": now,
+            },
+        )
+        return {
+            "jobId": job_id,
+            "status": JOB_QUEUED,
+            "fileName": file_name,
+            "includeShap": include_shap,
+            "error": None,
+            "errorStatus": None,
+            "result": None,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        from ..db import database
+
+        assignments = ["updated_at = :updated_at"]
+        values: Dict[str, Any] = {"job_id": job_id, "updated_at": datetime.utcnow()}
+        for key, value in fields.items():
+            column = self._COLUMNS[key]
+            if key == "result":
+                assignments.append(f"{column} = CAST(:{column} AS JSONB)")
+                value = json.dumps(value) if value is not None else None
+            else:
+                assignments.append(f"{column} = :{column}")
+            values[column] = value
+        query = f"UPDATE upload_jobs SET {', '.join(assignments)} WHERE job_id = :job_id"
+        await database.execute(query=query, values=values)
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        from ..db import database
+
+        query = """
+            SELECT job_id, status, file_name, include_shap, error, error_status, result, created_at, updated_at
+            FROM upload_jobs
+            WHERE job_id = :job_id
+        """
+        row = await database.fetch_one(query=query, values={"job_id": job_id})
+        if row is None:
+            return None
+        row = dict(row)
+        result = row["result"]
+        if isinstance(result, str):
+            result = json.loads(result)
+        return {
+            "jobId": row["job_id"],
+            "status": row["status"],
+            "fileName": row["file_name"],
+            "includeShap": row["include_shap"],
+            "error": row["error"],
+            "errorStatus": row["error_status"],
+            "result": result,
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+
+    async def discard_result(self, job_id: str) -> None:
+        return None
+
+    async def heartbeat(self, job_ids: Iterable[str]) -> None:
+        from ..db import database
+
+        values = [{"job_id": job_id, "updated_at": datetime.utcnow()} for job_id in job_ids]
+        if values:
+            query = "UPDATE upload_jobs SET updated_at = :updated_at WHERE job_id = :job_id"
+            await database.execute_many(query=query, values=values)
+
+    async def fail_orphaned(self) -> int:
+        """Fails queued/running jobs whose instance stopped sending heartbeats (crash, kill -9)."""
+        from ..db import database
+
+        now = datetime.utcnow()
+        query = """
+            UPDATE upload_jobs
+            SET status = :failed, error = :error, error_status = 500, updated_at = :now
+            WHERE status IN (:queued, :running) AND updated_at < :stale_before
+            RETURNING job_id
+        """
+        rows = await database.fetch_all(
+            query=query,
+            values={
+                "failed": JOB_FAILED,
+                "error": _ORPHANED_ERROR,
+                "now": now,
+                "queued": JOB_QUEUED,
+                "running": JOB_RUNNING,
+                "stale_before": now - timedelta(seconds=UPLOAD_JOB_STALE_AFTER_SECONDS),
+            },
+        )
+        return len(rows)
+
+
+def _create_store() -> JobStore:
+    if UPLOAD_JOB_STORE == "postgres":
+        return PostgresJobStore()
+    if UPLOAD_JOB_STORE != "memory":
+        logger.warning("Unknown UPLOAD_JOB_STORE '%s'; falling back to in-memory jobs", UPLOAD_JOB_STORE)
+    return InMemoryJobStore()
+
+
+_store: JobStore | None = None
+_slots: asyncio.Semaphore | None = None
+_tasks: Set[asyncio.Task[None]] = set()
+_job_ids: Set[str] = set()
+_maintenance: asyncio.Task[None] | None = None
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = _create_store()
+    return _store
+
+
+def set_job_store(store: JobStore) -> None:
+    global _store
+    _store = store
+
+
+class JobFailed(Exception):
+    """Raised by a job body to record a failure with an HTTP-style status code."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def submit_job(
+    job_id: str,
+    run: Callable[[], Awaitable[Dict[str, Any]]],
+    *,
+    retry_on: tuple[type[BaseException], ...] = (),
+    cleanup: Callable[[], None] | None = None,
+) -> None:
+    """Schedules ``run`` on the local worker pool (at most ``UPLOAD_JOB_WORKERS`` at once).
+
+    ``run`` returns the JSON-serialisable result; exceptions in ``retry_on`` re-queue the job
+    after ``UPLOAD_JOB_RETRY_DELAY`` and ``cleanup`` runs once the job has finished either way.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(UPLOAD_JOB_WORKERS)
+    task = asyncio.get_running_loop().create_task(_run_job(job_id, run, retry_on, cleanup))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _run_job(
+    job_id: str,
+    run: Callable[[], Awaitable[Dict[str, Any]]],
+    retry_on: tuple[type[BaseException], ...],
+    cleanup: Callable[[], None] | None,
+) -> None:
+    store = get_job_store()
+    assert _slots is not None
+    _job_ids.add(job_id)
+    try:
+        while True:
+            async with _slots:
+                await store.update(job_id, status=JOB_RUNNING)
+                try:
+                    result = await run()
+                except retry_on as exc:
+                    logger.info("Upload job %s deferred: %s", job_id, exc)
+                    await store.update(job_id, status=JOB_QUEUED)
+                except JobFailed as exc:
+                    await store.update(job_id, status=JOB_FAILED, error=exc.detail, errorStatus=exc.status_code)
+                    return
+                except Exception as exc:
+                    logger.exception("Upload job %s failed", job_id)
+                    detail = str(exc) or "Upload processing failed"
+                    await store.update(job_id, status=JOB_FAILED, error=detail, errorStatus=500)
+                    return
+                else:
+                    await store.update(job_id, status=JOB_SUCCEEDED, result=result)
+                    return
+            await asyncio.sleep(UPLOAD_JOB_RETRY_DELAY)
+    except Exception:
+        logger.exception("Could not record the outcome of upload job %s", job_id)
+    finally:
+        _job_ids.discard(job_id)
+        if cleanup is not None:
+            cleanup()
+
+
+async def _maintain() -> None:
+    store = get_job_store()
+    while True:
+        try:
+            await store.heartbeat(list(_job_ids))
+            failed = await store.fail_orphaned()
+            if failed:
+                logger.warning("Marked %d orphaned upload job(s) as failed", failed)
+        except Exception:
+            logger.exception("Upload job maintenance failed")
+        await asyncio.sleep(UPLOAD_JOB_HEARTBEAT_SECONDS)
+
+
+def start() -> None:
+    """Starts the heartbeat / orphan sweep on the running event loop; the first sweep runs now."""
+    global _maintenance
+    if _maintenance is None:
+        _maintenance = asyncio.get_running_loop().create_task(_maintain())
+
+
+def active_jobs() -> int:
+    return len(_tasks)
+
+
+async def shutdown() -> None:
+    global _maintenance
+    if _maintenance is not None:
+        _maintenance.cancel()
+        _maintenance = None
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Load the models in the background right after startup; otherwise the first request pays for it.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1").strip().lower() not in {"0", "false", "no"}
+# Heavy ML libraries imported by the warm-up in the order the services first need them.
+# TensorFlow is left out: the autoencoder imports it only when served through Keras.
+_ML_MODULES = ("sklearn", "xgboost", "shap")
+
+_state = "pending" if MODEL_WARMUP else "lazy"
+_api_stages: list[dict[str, Any]] = []
+_worker_reports: list[dict[str, Any]] = []
+_errors: list[str] = []
+_task: asyncio.Task | None = None
+
+_models_lock = Lock()
+_models_report: dict[str, Any] | None = None
+
+
+def record(stage: str, seconds: float) -> None:
+    """Adds an API-process startup stage to the timing report."""
+    _api_stages.append({"stage": stage, "seconds": round(seconds, 4)})
+
+
+@contextmanager
+def timed(stage: str, stages: list[dict[str, Any]] | None = None) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if stages is None:
+            record(stage, elapsed)
+        else:
+            stages.append({"stage": stage, "seconds": round(elapsed, 4)})
+
+
+def warm_models() -> dict[str, Any]:
+    """Imports the ML libraries and loads every model in this process, once.
+
+    Runs as the inference worker initializer and as the warm-up job, so it returns the cached
+    report on repeat calls. Failures are reported rather than raised; the services raise their
+    own errors when a request actually needs the missing model.
+    """
+    global _models_report
+    with _models_lock:
+        if _models_report is not None:
+            return _models_report
+
+        from . import advanced_models_service, diagnostics_service, shap_service
+
+        stages: list[dict[str, Any]] = []
+        errors: list[str] = []
+        for module in _ML_MODULES:
+            try:
+                with timed(f"import {module}", stages):
+                    importlib.import_module(module)
+            except ImportError as exc:
+                errors.append(f"import {module}: {exc}")
+
+        steps = (
+            ("load model bundle", diagnostics_service.ensure_models_ready),
+            ("load autoencoder", advanced_models_service.ensure_advanced_models_ready),
+            ("build SHAP explainers", shap_service.prepare_explainers),
+        )
+        for stage, step in steps:
+            try:
+                with timed(stage, stages):
+                    step()
+            except RuntimeError as exc:
+                logger.warning("Model warm-up step '%s' failed: %s", stage, exc)
+                errors.append(f"{stage}: {exc}")
+
+        _models_report = {"pid": os.getpid(), "stages": stages, "errors": errors}
+        return _models_report
+
+
+async def _run() -> None:
+    global _state
+    from . import inference_executor
+
+    _state = "warming"
+    started = time.perf_counter()
+    try:
+        reports = await inference_executor.warm_up()
+    except Exception as exc:  # pragma: no cover - defensive: readiness must not hang
+        logger.exception("Model warm-up failed")
+        _errors.append(str(exc))
+        _state = "failed"
+        return
+    record("model warm-up", time.perf_counter() - started)
+    _worker_reports.extend(reports)
+    _errors.extend(error for report in reports for error in report["errors"])
+    _state = "failed" if _errors else "ready"
+    logger.info("Startup timing: %s", report())
+
+
+def start() -> None:
+    """Schedules the background warm-up on the running event loop (no-op when disabled)."""
+    global _task
+    if MODEL_WARMUP and _task is None:
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+def stop() -> None:
+    if _task is not None and not _task.done():
+        _task.cancel()
+
+
+def is_ready() -> bool:
+    """True once the models are warm, or always when warm-up is disabled and models load lazily."""
+    return _state in {"ready", "lazy"}
+
+
+def report() -> dict[str, Any]:
+    return {
+        "status": _state,
+        "api": list(_api_stages),
+        "workers": list(_worker_reports),
+        "errors": list(_errors),
+    }
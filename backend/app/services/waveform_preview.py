@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from ..models import WaveformPreview
+
+# Target number of samples per series; the full trace is decimated down to this budget.
+MAX_WAVEFORM_POINTS = int(os.getenv("WAVEFORM_PREVIEW_POINTS", "600"))
+MAX_WAVEFORM_SERIES = 8
+# Column alias definitions to align incoming CSV headers with expected telemetry fields
+_COLUMN_ALIASES = {
+    "timeMs": [
+        "time_ms",
+        "time",
+        "timestamp",
+        "milliseconds",
+        "ms",
+        "t",
+    ],
+}
+
+
+def _normalize_column(name: str) -> str:
+    return (
+        name.strip()
+        .lower()
+        .replace(" ", "")
+        .replace("-", "")
+        .replace("/", "")
+        .replace("\\", "")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("_", "")
+    )
+
+
+def _slugify_column(name: str) -> str:
+    normalized = _normalize_column(name)
+    return normalized or "value"
+
+
+def _match_column(columns: list[str], aliases: list[str]) -> str | None:
+    normalized_aliases = {_normalize_column(alias) for alias in aliases}
+    for column in columns:
+        if _normalize_column(column) in normalized_aliases:
+            return column
+    return None
+
+
+def _to_float_array(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        values = values.astype(str).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _json_floats(values: np.ndarray, float32_source: bool = False) -> list[float | None]:
+    if float32_source:
+        # Shortest float32 repr, so 12.3 parsed as float32 is sent as 12.3, not 12.300000190734863
+        values = values.astype(np.float32).astype(str).astype(float)
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+@dataclass
+class _Buckets:
+    """Min/max summary of consecutive rows; ``min_pos``/``max_pos`` are global row positions."""
+
+    count: np.ndarray
+    t_first: np.ndarray
+    t_last: np.ndarray
+    min_val: np.ndarray
+    min_pos: np.ndarray
+    max_val: np.ndarray
+    max_pos: np.ndarray
+
+    @classmethod
+    def concat(cls, parts: list["_Buckets"]) -> "_Buckets":
+        return cls(*(np.concatenate([getattr(part, f.name) for part in parts]) for f in fields(cls)))
+
+    def split_last(self) -> tuple["_Buckets", "_Buckets"]:
+        head = _Buckets(*(getattr(self, f.name)[:-1] for f in fields(self)))
+        tail = _Buckets(*(getattr(self, f.name)[-1:] for f in fields(self)))
+        return head, tail
+
+
+def _aggregate(time_values: np.ndarray, values: np.ndarray, first_pos: int, bucket_size: int) -> _Buckets:
+    """Summarizes ``values`` (rows x series) in buckets of ``bucket_size`` rows; the last may be short."""
+    n_rows, n_series = values.shape
+    n_buckets = math.ceil(n_rows / bucket_size)
+    padding = n_buckets * bucket_size - n_rows
+    starts = np.arange(n_buckets) * bucket_size
+    ends = np.minimum(starts + bucket_size, n_rows) - 1
+
+    blocks = np.pad(values, ((0, padding), (0, 0)), constant_values=np.nan)
+    blocks = blocks.reshape(n_buckets, bucket_size, n_series)
+    missing = np.isnan(blocks)
+    argmin = np.where(missing, np.inf, blocks).argmin(axis=1)
+    argmax = np.where(missing, -np.inf, blocks).argmax(axis=1)
+    return _Buckets(
+        count=ends - starts + 1,
+        t_first=time_values[starts],
+        t_last=time_values[ends],
+        min_val=np.take_along_axis(blocks, argmin[:, None, :], axis=1)[:, 0, :],
+        min_pos=first_pos + starts[:, None] + argmin,
+        max_val=np.take_along_axis(blocks, argmax[:, None, :], axis=1)[:, 0, :],
+        max_pos=first_pos + starts[:, None] + argmax,
+    )
+
+
+def _merge(left: _Buckets, right: _Buckets) -> _Buckets:
+    """Combines bucket summaries pairwise; ``right`` always holds the later rows."""
+    take_right_min = (right.min_val < left.min_val) | (np.isnan(left.min_val) & ~np.isnan(right.min_val))
+    take_right_max = (right.max_val > left.max_val) | (np.isnan(left.max_val) & ~np.isnan(right.max_val))
+    return _Buckets(
+        count=left.count + right.count,
+        t_first=left.t_first,
+        t_last=right.t_last,
+        min_val=np.where(take_right_min, right.min_val, left.min_val),
+        min_pos=np.where(take_right_min, right.min_pos, left.min_pos),
+        max_val=np.where(take_right_max, right.max_val, left.max_val),
+        max_pos=np.where(take_right_max, right.max_pos, left.max_pos),
+    )
+
+
+class PreviewAccumulator:
+    """Builds the columnar min/max preview from row chunks without keeping the trace in memory.
+
+    ``expected_rows`` (an upper bound is fine) fixes the bucket size up front; traces that fit in
+    ``budget`` are returned sample for sample.
+    """
+
+    def __init__(self, columns: list[str], expected_rows: int, budget: int = MAX_WAVEFORM_POINTS) -> None:
+        self.time_column = _match_column(columns, _COLUMN_ALIASES["timeMs"])
+        self.value_columns = [column for column in columns if column != self.time_column]
+        self.bucket_size = 1 if expected_rows <= budget else math.ceil(expected_rows / max(1, budget // 2))
+        self._rows_seen = 0
+        self._valid_rows = 0
+        self._has_values = np.zeros(len(self.value_columns), dtype=bool)
+        self._float32 = np.zeros(len(self.value_columns), dtype=bool)
+        self._closed: list[_Buckets] = []
+        self._open: _Buckets | None = None
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        n_rows = len(chunk)
+        if n_rows == 0:
+            return
+        if self.time_column:
+            time_values = _to_float_array(chunk[self.time_column])
+        else:
+            # Fallback: synthesize a time axis when CSV lacks explicit timestamps
+            time_values = np.arange(self._rows_seen, self._rows_seen + n_rows, dtype=float)
+        self._rows_seen += n_rows
+
+        values = np.empty((n_rows, len(self.value_columns)))
+        for idx, column in enumerate(self.value_columns):
+            series = chunk[column]
+            self._float32[idx] |= series.dtype == np.float32
+            values[:, idx] = _to_float_array(series)
+
+        valid = ~np.isnan(time_values)
+        if not valid.all():
+            time_values = time_values[valid]
+            values = values[valid]
+        if len(time_values) == 0:
+            return
+        self._has_values |= ~np.isnan(values).all(axis=0)
+
+        position = self._valid_rows
+        self._valid_rows += len(time_values)
+        if self._open is not None:
+            needed = self.bucket_size - int(self._open.count[0])
+            head = _aggregate(time_values[:needed], values[:needed], position, needed)
+            self._open = _merge(self._open, head)
+            time_values, values = time_values[needed:], values[needed:]
+            position += needed
+            if self._open.count[0] < self.bucket_size:
+                return
+            self._closed.append(self._open)
+            self._open = None
+        if len(time_values) == 0:
+            return
+
+        buckets = _aggregate(time_values, values, position, self.bucket_size)
+        if buckets.count[-1] < self.bucket_size:
+            buckets, self._open = buckets.split_last()
+        if len(buckets.count):
+            self._closed.append(buckets)
+
+    def finalize(self) -> WaveformPreview | None:
+        parts = self._closed + ([self._open] if self._open is not None else [])
+        if not parts:
+            return None
+        selected = np.flatnonzero(self._has_values)[:MAX_WAVEFORM_SERIES]
+        if len(selected) == 0:
+            return None
+
+        column_map: dict[str, str] = {}
+        ordered_columns: list[str] = []
+        for idx in selected:
+            original = str(self.value_columns[idx])
+            slug = _slugify_column(original)
+            candidate = slug
+            suffix = 1
+            while candidate in column_map:
+                suffix += 1
+                candidate = f"{slug}{suffix}"
+            column_map[candidate] = original
+            ordered_columns.append(candidate)
+
+        buckets = _Buckets.concat(parts)
+        if self.bucket_size == 1:
+            time_values = buckets.t_first
+            series = [buckets.min_val[:, idx] for idx in selected]
+        else:
+            # Two samples per bucket, stamped with its first and last timestamps; each series
+            # places its minimum and maximum there in the order they occurred.
+            time_values = np.empty(len(buckets.count) * 2)
+            time_values[0::2] = buckets.t_first
+            time_values[1::2] = buckets.t_last
+            series = []
+            for idx in selected:
+                min_first = buckets.min_pos[:, idx] <= buckets.max_pos[:, idx]
+                decimated = np.empty(len(time_values))
+                decimated[0::2] = np.where(min_first, buckets.min_val[:, idx], buckets.max_val[:, idx])
+                decimated[1::2] = np.where(min_first, buckets.max_val[:, idx], buckets.min_val[:, idx])
+                series.append(decimated)
+
+        return WaveformPreview(
+            rowCount=len(time_values),
+            totalRows=self._valid_rows,
+            downsampling=None if self.bucket_size == 1 else "minmax",
+            sourceName=self.time_column or "row_index",
+            valueColumns=ordered_columns,
+            columnMap=column_map or None,
+            timeMs=time_values.tolist(),
+            series={
+                slug: _json_floats(values, bool(self._float32[idx]))
+                for slug, values, idx in zip(ordered_columns, series, selected)
+            },
+        )
+
+
+def build_waveform_preview(df: pd.DataFrame, budget: int = MAX_WAVEFORM_POINTS) -> WaveformPreview | None:
+    """Columnar preview of the whole trace, decimated to at most ``budget`` samples per series."""
+    accumulator = PreviewAccumulator([str(column) for column in df.columns], len(df), budget)
+    accumulator.update(df.set_axis([str(column) for column in df.columns], axis=1))
+    return accumulator.finalize()
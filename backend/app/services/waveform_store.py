@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from .shap_service import _resolve_time_column
+from .waveform_preview import _COLUMN_ALIASES, _match_column, _to_float_array
+
+logger = logging.getLogger(__name__)
+
+# Parsed uploads, one directory per publicId: manifest.json plus one raw little-endian
+# column file each, memory-mapped on read so re-analysis never parses CSV text again.
+WAVEFORM_STORE_DIR = Path(
+    os.getenv("WAVEFORM_STORE_DIR", str(Path(__file__).resolve().parent.parent.parent / "storage" / "waveforms"))
+)
+PERSIST_WAVEFORMS = os.getenv("PERSIST_WAVEFORMS", "true").strip().lower() not in ("0", "false", "no")
+_MANIFEST = "manifest.json"
+_FORMAT_VERSION = 1
+
+
+def _artifact_dir(public_id: str) -> Path:
+    """Directory of ``public_id``'s artifact; raises ``ValueError`` for ids that would escape the store.
+
+    Cloudinary ids contain folders, so the id is percent-encoded into one flat directory name.
+    That leaves ``.`` and ``..`` as they are, and dot-names are reserved for the store itself
+    (``.staging``), so they are refused, as is anything that does not resolve directly under the root.
+    """
+    name = quote(public_id, safe="")
+    root = WAVEFORM_STORE_DIR.resolve()
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid waveform id {public_id!r}")
+    path = (root / name).resolve()
+    if path.parent != root:
+        raise ValueError(f"Invalid waveform id {public_id!r}")
+    return path
+
+
+class WaveformWriter:
+    """Appends ingested chunks column by column into a staging directory.
+
+    Measurement columns are stored as float32 and time columns as float64, matching the upload
+    parser. ``commit`` publishes the artifact under its publicId once the upload is archived.
+    """
+
+    def __init__(self, columns: list[str], sha256: str) -> None:
+        staging_root = WAVEFORM_STORE_DIR / ".staging"
+        staging_root.mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(dir=staging_root))
+        self.sha256 = sha256
+        self.columns = columns
+        time_columns = {_resolve_time_column(columns), _match_column(columns, _COLUMN_ALIASES["timeMs"])}
+        self.dtypes = [np.dtype("<f8") if column in time_columns else np.dtype("<f4") for column in columns]
+        self.rows = 0
+        self._handles = [(self.path / f"{idx}.bin").open("wb") for idx in range(len(columns))]
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for handle, column, dtype in zip(self._handles, self.columns, self.dtypes):
+            _to_float_array(chunk[column]).astype(dtype, copy=False).tofile(handle)
+        self.rows += len(chunk)
+
+    def close(self) -> None:
+        for handle in self._handles:
+            handle.close()
+        self._handles = []
+        manifest = {
+            "version": _FORMAT_VERSION,
+            "rows": self.rows,
+            "sha256": self.sha256,
+            "createdAt": datetime.utcnow().isoformat(),
+            "columns": [
+                {"name": column, "file": f"{idx}.bin", "dtype": dtype.str}
+                for idx, (column, dtype) in enumerate(zip(self.columns, self.dtypes))
+            ],
+        }
+        (self.path / _MANIFEST).write_text(json.dumps(manifest))
+
+    def commit(self, public_id: str) -> Path:
+        """Moves the staged artifact into place; an existing artifact for the id is kept.
+
+        Raises ``ValueError`` (and drops the staged files) when ``public_id`` is not a valid id.
+        """
+        try:
+            target = _artifact_dir(public_id)
+        except ValueError:
+            self.discard()
+            raise
+        if self._handles:
+            self.close()
+        if target.exists():
+            self.discard()
+            return target
+        try:
+            os.replace(self.path, target)
+        except OSError:
+            # Another request published the same id first.
+            self.discard()
+        return target
+
+    def discard(self) -> None:
+        for handle in self._handles:
+            handle.close()
+        self._handles = []
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+@dataclass
+class StoredWaveform:
+    public_id: str
+    path: Path
+    rows: int
+    sha256: str
+    columns: list[str]
+    _dtypes: list[str]
+
+    def column(self, name: str) -> np.ndarray:
+        idx = self.columns.index(name)
+        if self.rows == 0:
+            return np.empty(0, dtype=self._dtypes[idx])
+        return np.memmap(self.path / f"{idx}.bin", dtype=self._dtypes[idx], mode="r", shape=(self.rows,))
+
+    def iter_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Yields row windows whose columns are views on the memory-mapped files."""
+        arrays = {name: self.column(name) for name in self.columns}
+        for start in range(0, self.rows, max(1, chunk_rows)):
+            stop = min(start + chunk_rows, self.rows)
+            yield pd.DataFrame(
+                {name: values[start:stop] for name, values in arrays.items()},
+                index=pd.RangeIndex(start, stop),
+                copy=False,
+            )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: self.column(name) for name in self.columns}, copy=False)
+
+
+def open_waveform(public_id: str) -> StoredWaveform | None:
+    try:
+        path = _artifact_dir(public_id)
+        manifest = json.loads((path / _MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != _FORMAT_VERSION:
+        logger.warning("Ignoring waveform artifact %s with unsupported version %s", path, manifest.get("version"))
+        return None
+    return StoredWaveform(
+        public_id=public_id,
+        path=path,
+        rows=int(manifest["rows"]),
+        sha256=manifest.get("sha256", ""),
+        columns=[column["name"] for column in manifest["columns"]],
+        _dtypes=[column["dtype"] for column in manifest["columns"]],
+    )
@@ -1,17 +1,21 @@
 import os
-import glob
+import sys
+import argparse
+import hashlib
+import multiprocessing
 import pandas as pd
 import numpy as np
-import joblib
 import warnings
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sklearn.ensemble import AdaBoostClassifier
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 import xgboost as xgb
 from pathlib import Path
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers, models
+
+# Add backend directory to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services import dcrm_csv, feature_engine, model_registry
 
 # Suppress warnings
 warnings.filterwarnings('ignore')
@@ -19,138 +23,127 @@ warnings.filterwarnings('ignore')
 # Configuration
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_FILE = BASE_DIR / "DCRM CSV files" / "402" / "402-B 26-11-2021.csv"
-MODEL_DIR = BASE_DIR / "dcrm_models" / "shap_models"
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
+MODEL_DIR = model_registry.MODEL_BUNDLE_DIR
+# Per-file feature matrices, keyed by file content hash, feature-spec version and window size.
+FEATURE_CACHE_DIR = BASE_DIR / "dcrm_models" / "feature_cache"
+WINDOW_SIZE = 100
+SEED = 42
+MODEL_NAMES = ("xgboost", "adaboost", "autoencoder")
+
+# Hyperparameters; retrain a single model with --models after editing its entry.
+XGB_PARAMS = {"n_estimators": 100, "max_depth": 3, "learning_rate": 0.1, "eval_metric": "logloss"}
+ADA_PARAMS = {"n_estimators": 100, "learning_rate": 0.1}
+AE_PARAMS = {"epochs": 50, "batch_size": 32}
 
 def parse_dcrm_csv(file_path):
-    """Parses DCRM CSV file to extract data points."""
+    """Parses DCRM CSV file to extract data points (shared with the upload API)."""
     try:
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-        
-        data_start_index = -1
-        for i, line in enumerate(lines):
-            if "Coil Current C1 (A)" in line:
-                data_start_index = i + 1
-                break
-        
-        if data_start_index == -1:
-            print(f"Skipping {file_path}: Data header not found")
-            return None
-
-        # Extract data
-        data_lines = [line.strip().split(',') for line in lines[data_start_index:] if line.strip()]
-        
-        parsed_data = []
-        for row in data_lines:
-            if len(row) < 26: continue
-            try:
-                def get_val(idx):
-                    val = float(row[idx])
-                    return 0 if (val > 7900 or val < -100) else val # Filter outliers
-
-                point = {
-                    'resistance': [get_val(14), get_val(16), get_val(18), get_val(20), get_val(22), get_val(24)],
-                    'travel': [get_val(7), get_val(8), get_val(9), get_val(10), get_val(11), get_val(12)],
-                    'current': [get_val(15), get_val(17), get_val(19), get_val(21), get_val(23), get_val(25)],
-                }
-                parsed_data.append(point)
-            except ValueError:
-                continue
-                
-        return parsed_data
+        return dcrm_csv.parse_dcrm_csv(file_path)
     except Exception as e:
         print(f"Error parsing {file_path}: {e}")
         return None
 
-def extract_window_features(data, window_size=100):
-    """Extracts features from windows of data points."""
-    features = []
-    n_points = len(data)
-    
-    for i in range(0, n_points - window_size, window_size):
-        window = data[i:i+window_size]
-        
-        for ch in range(6):
-            r_vals = np.array([pt['resistance'][ch] for pt in window])
-            t_vals = np.array([pt['travel'][ch] for pt in window])
-            c_vals = np.array([pt['current'][ch] for pt in window])
-            
-            f_row = {
-                'window_mean_resistance': np.mean(r_vals),
-                'window_std_resistance': np.std(r_vals),
-                'window_max_resistance': np.max(r_vals),
-                
-                'window_mean_travel': np.mean(t_vals),
-                'window_std_travel': np.std(t_vals),
-                
-                'window_mean_current': np.mean(c_vals),
-                'window_std_current': np.std(c_vals),
-                
-                'Rp_avg': np.mean(r_vals),
-                'Ra_ta': np.mean(r_vals) * np.mean(t_vals) if np.mean(t_vals) != 0 else 0,
-                'T_overlap': 0
-            }
-            features.append(f_row)
-            
-    return pd.DataFrame(features)
-
-def generate_dataset():
-    print(f"Loading data from {DATA_FILE}...")
-    raw_data = parse_dcrm_csv(DATA_FILE)
-    if not raw_data:
+def extract_window_features(data, window_size=WINDOW_SIZE):
+    """Extracts features from windows of data points (one row per window and channel)."""
+    # Same window count as the original range(0, n - window_size, window_size) loop.
+    n_windows = max(0, (len(data) - 1) // window_size)
+    stats = {
+        channel: feature_engine.strided_window_stats(getattr(data, channel).T, window_size, n_windows)
+        for channel in ("resistance", "travel", "current")
+    }
+    features = feature_engine.assemble_features(
+        stats["resistance"], stats["travel"], stats["current"], shape=(n_windows, 6)
+    )
+    return pd.DataFrame({name: features[name].ravel() for name in feature_engine.FEATURE_NAMES})
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_file_features(file_path, cache_dir=FEATURE_CACHE_DIR, window_size=WINDOW_SIZE):
+    """Feature matrix of one capture, read from the cache when the file was seen before."""
+    cache_path = Path(cache_dir) / (
+        f"{_file_sha256(file_path)}-v{feature_engine.FEATURE_SPEC_VERSION}-w{window_size}.npy"
+    )
+    if cache_path.exists():
+        return np.load(cache_path), True
+
+    raw_data = parse_dcrm_csv(file_path)
+    if raw_data is None:
+        return None, False
+    matrix = extract_window_features(raw_data, window_size).to_numpy(dtype=np.float64)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, cache_path)
+    return matrix, False
+
+def find_csv_files(paths):
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() == ".csv"))
+        else:
+            files.append(path)
+    return files
+
+def generate_dataset(files, workers=None, cache_dir=FEATURE_CACHE_DIR, seed=SEED):
+    print(f"Loading features from {len(files)} file(s)...")
+    # Parsing and feature extraction are per file; fan them out over processes.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(load_file_features, files, [cache_dir] * len(files)))
+
+    matrices = [matrix for matrix, _ in results if matrix is not None and len(matrix)]
+    cached = sum(1 for _, hit in results if hit)
+    print(f"{cached} of {len(files)} file(s) served from the feature cache")
+    if not matrices:
         raise ValueError("Could not load training data")
-        
-    df_healthy = extract_window_features(raw_data)
+
+    df_healthy = pd.DataFrame(np.concatenate(matrices), columns=list(feature_engine.FEATURE_NAMES))
     df_healthy['label'] = 0 # Healthy
-    
+
     print(f"Extracted {len(df_healthy)} healthy samples")
-    
+
     df_faulty = df_healthy.copy()
-    
+    rng = np.random.default_rng(seed)
+
     # Fault generation: Resistance drift, Travel stiction
-    df_faulty['window_mean_resistance'] *= np.random.uniform(1.5, 5.0, size=len(df_faulty))
-    df_faulty['window_max_resistance'] *= np.random.uniform(1.5, 5.0, size=len(df_faulty))
-    df_faulty['Rp_avg'] *= np.random.uniform(1.5, 5.0, size=len(df_faulty))
-    df_faulty['window_mean_travel'] *= np.random.uniform(0.5, 0.9, size=len(df_faulty))
-    
+    df_faulty['window_mean_resistance'] *= rng.uniform(1.5, 5.0, size=len(df_faulty))
+    df_faulty['window_max_resistance'] *= rng.uniform(1.5, 5.0, size=len(df_faulty))
+    df_faulty['Rp_avg'] *= rng.uniform(1.5, 5.0, size=len(df_faulty))
+    df_faulty['window_mean_travel'] *= rng.uniform(0.5, 0.9, size=len(df_faulty))
+
     df_faulty['label'] = 1 # Faulty
     print(f"Generated {len(df_faulty)} faulty samples")
-    
+
     return pd.concat([df_healthy, df_faulty], ignore_index=True)
 
-def train_and_save_all_models():
-    df = generate_dataset()
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-    
-    X = df.drop(columns=['label'])
-    y = df['label']
-    feature_names = X.columns.tolist()
-    
-    # 1. Advanced Artifacts: Scaler & Encoder
-    print("Fitting Scaler and LabelEncoder...")
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled = pd.DataFrame(X_scaled, columns=feature_names)
-    
-    label_encoder = LabelEncoder()
-    y_encoded = label_encoder.fit_transform(y)
-    
-    # 2. Train Classifiers (XGB & Adaboost)
-    print("Training classifiers...")
-    xgb_model = xgb.XGBClassifier(n_estimators=100, max_depth=3, learning_rate=0.1, eval_metric='logloss')
-    xgb_model.fit(X_scaled, y_encoded)
-    
-    ada_model = AdaBoostClassifier(n_estimators=100, learning_rate=0.1)
-    ada_model.fit(X_scaled, y_encoded)
-    
-    # 3. Train Autoencoder (Anomaly Detection)
-    # Train only on healthy data (label=0)
-    print("Training Autoencoder...")
-    X_healthy = X_scaled[y_encoded == 0]
-    
+def train_xgboost(X, y, seed=SEED):
+    model = xgb.XGBClassifier(**XGB_PARAMS, random_state=seed, n_jobs=max(1, (os.cpu_count() or 1) - 1))
+    model.fit(X, y)
+    return model
+
+def train_adaboost(X, y, seed=SEED):
+    model = AdaBoostClassifier(**ADA_PARAMS, random_state=seed)
+    model.fit(X, y)
+    return model
+
+def train_autoencoder(X_healthy, seed=SEED):
+    """Trains the anomaly autoencoder on healthy rows; returns ``(model, threshold)``."""
+    # TensorFlow is only imported here so the AdaBoost process and cached runs skip it.
+    import tensorflow as tf
+    from tensorflow import keras
+    from tensorflow.keras import layers, models
+
+    keras.utils.set_random_seed(seed)
+    tf.config.experimental.enable_op_determinism()
+
     input_dim = X_healthy.shape[1]
-    
+
     autoencoder = models.Sequential([
         layers.Input(shape=(input_dim,)),
         layers.Dense(8, activation='relu'),
@@ -158,34 +151,107 @@ def train_and_save_all_models():
         layers.Dense(8, activation='relu'),
         layers.Dense(input_dim, activation='linear')
     ])
-    
+
     autoencoder.compile(optimizer='adam', loss='mse')
-    autoencoder.fit(X_healthy, X_healthy, epochs=50, batch_size=32, shuffle=True, verbose=0)
-    
+    autoencoder.fit(X_healthy, X_healthy, **AE_PARAMS, shuffle=True, verbose=0)
+
     # Calculate Threshold
-    reconstructions = autoencoder.predict(X_healthy)
+    reconstructions = autoencoder.predict(X_healthy, verbose=0)
     mse = np.mean(np.power(X_healthy - reconstructions, 2), axis=1)
     threshold = float(np.max(mse) * 1.5) # Margin
-    print(f"Autoencoder threshold: {threshold}")
-    
-    # 4. Save Artifacts
-    print(f"Saving all artifacts to {MODEL_DIR}...")
-    
-    # SHAP requirements
-    joblib.dump(xgb_model, MODEL_DIR / "xgb_shap_model.pkl")
-    joblib.dump(ada_model, MODEL_DIR / "ada_shap_model.pkl")
-    joblib.dump(feature_names, MODEL_DIR / "shap_feature_names.pkl")
-    
-    # Advanced Service requirements
-    joblib.dump(scaler, MODEL_DIR / "scaler.pkl")
-    joblib.dump(label_encoder, MODEL_DIR / "label_encoder.pkl")
-    joblib.dump(feature_names, MODEL_DIR / "feature_names.pkl")
-    joblib.dump(xgb_model, MODEL_DIR / "xgboost_model.pkl")
-    joblib.dump(ada_model, MODEL_DIR / "adaboost_model.pkl")
-    joblib.dump(threshold, MODEL_DIR / "ae_threshold.pkl")
-    autoencoder.save(MODEL_DIR / "autoencoder_model.keras")
-    
-    print("Consolidated model generation complete.")
+    return autoencoder, threshold
+
+def train_and_save_all_models(files=None, models_to_train=MODEL_NAMES, workers=None, cache_dir=FEATURE_CACHE_DIR, seed=SEED):
+    df = generate_dataset(files or [DATA_FILE], workers, cache_dir, seed)
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    X = df.drop(columns=['label'])
+    y = df['label']
+    feature_names = X.columns.tolist()
+    retrain_all = set(models_to_train) == set(MODEL_NAMES)
+
+    # 1. Advanced Artifacts: Scaler & Encoder
+    previous = None
+    if retrain_all:
+        print("Fitting Scaler and LabelEncoder...")
+        scaler = StandardScaler().fit(X)
+        label_encoder = LabelEncoder().fit(y)
+    else:
+        # The models that are not retrained were fitted against the active bundle's scaler; keep it.
+        bundle_path = model_registry.active_bundle_path(MODEL_DIR)
+        if bundle_path is None:
+            raise ValueError(f"No model bundle in {MODEL_DIR} to retrain {', '.join(models_to_train)} against")
+        previous = model_registry.load_bundle(bundle_path)
+        print(f"Reusing Scaler, LabelEncoder and untouched models from bundle {previous.version}...")
+        scaler = previous.scaler
+        label_encoder = previous.label_encoder
+    X_scaled = pd.DataFrame(scaler.transform(X), columns=feature_names)
+    y_encoded = label_encoder.transform(y)
+
+    # 2. Train models concurrently: AdaBoost in its own process (pure Python loop),
+    # XGBoost on native threads, the autoencoder in this thread.
+    print(f"Training {', '.join(models_to_train)}...")
+    results = {}
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as processes, \
+            ThreadPoolExecutor(max_workers=1) as threads:
+        futures = {}
+        if "adaboost" in models_to_train:
+            futures["adaboost"] = processes.submit(train_adaboost, X_scaled, y_encoded, seed)
+        if "xgboost" in models_to_train:
+            futures["xgboost"] = threads.submit(train_xgboost, X_scaled, y_encoded, seed)
+        if "autoencoder" in models_to_train:
+            # Train only on healthy data (label=0)
+            results["autoencoder"] = train_autoencoder(X_scaled[y_encoded == 0], seed)
+        for name, future in futures.items():
+            results[name] = future.result()
+
+    # 3. Save one bundle shared by the diagnostics, advanced and SHAP services
+    if "autoencoder" in results:
+        autoencoder, threshold = results["autoencoder"]
+        print(f"Autoencoder threshold: {threshold}")
+    else:
+        autoencoder = previous.path / previous.manifest["artifacts"]["autoencoder"]["file"]
+        threshold = previous.ae_threshold
+    print(f"Saving model bundle to {MODEL_DIR}...")
+    bundle_path = model_registry.export_bundle(
+        xgb_model=results["xgboost"] if "xgboost" in results else previous.xgboost,
+        ada_model=results["adaboost"] if "adaboost" in results else previous.adaboost,
+        scaler=scaler,
+        label_encoder=label_encoder,
+        feature_names=feature_names,
+        ae_threshold=threshold,
+        autoencoder=autoencoder,
+        root=MODEL_DIR,
+        metadata={
+            "trainedModels": list(models_to_train),
+            "basedOn": previous.version if previous is not None else None,
+            "seed": seed,
+            "files": len(files or [DATA_FILE]),
+        },
+    )
+
+    print(f"Consolidated model generation complete: {bundle_path.name}")
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Train the window SHAP/advanced models from vendor DCRM CSVs.")
+    parser.add_argument("paths", nargs="*", default=[str(DATA_FILE)], help="CSV files or directories (searched recursively)")
+    parser.add_argument("--models", default=",".join(MODEL_NAMES), help=f"Comma-separated subset of {', '.join(MODEL_NAMES)}")
+    parser.add_argument("--workers", type=int, default=None, help="Feature extraction processes (default: one per CPU)")
+    parser.add_argument("--cache-dir", default=str(FEATURE_CACHE_DIR), help="Feature matrix cache directory")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    models_to_train = tuple(name.strip() for name in args.models.split(",") if name.strip())
+    unknown = set(models_to_train) - set(MODEL_NAMES)
+    if unknown or not models_to_train:
+        parser.error(f"--models must be a subset of {', '.join(MODEL_NAMES)}")
+    return args, models_to_train
 
 if __name__ == "__main__":
-    train_and_save_all_models()
+    args, models_to_train = _parse_args()
+    train_and_save_all_models(
+        files=find_csv_files(args.paths),
+        models_to_train=models_to_train,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        seed=args.seed,
+    )
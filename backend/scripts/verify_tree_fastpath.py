@@ -0,0 +1,110 @@
+"""Checks that the compiled tree scorers reproduce the XGBoost/AdaBoost wrappers bit for bit.
+
+    python scripts/verify_tree_fastpath.py [--rows 20000] [--timing-runs 2000]
+
+Compares class indices and probabilities on random rows of several scales, rows sitting exactly
+on AdaBoost split thresholds, and single-row calls; then reports single-row latency of both
+paths. Exits non-zero on any mismatch.
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services import model_registry
+from app.services.tree_fastpath import AdaBoostScorer, XGBoostScorer
+
+warnings.filterwarnings('ignore')
+
+
+def build_inputs(bundle, rows, seed):
+    rng = np.random.default_rng(seed)
+    n_features = len(bundle.feature_names)
+    scales = rng.choice([0.01, 0.1, 1.0, 10.0, 1000.0], size=(rows, 1))
+    random_rows = rng.standard_normal((rows, n_features)) * scales
+
+    # Rows exactly on (and one float32 step either side of) every split threshold.
+    split_rows = []
+    for estimator in bundle.adaboost.estimators_:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue
+            for value in np.float32(threshold) + np.array([0, -1, 1]) * np.spacing(np.float32(threshold)):
+                row = rng.standard_normal(n_features)
+                row[feature] = value
+                split_rows.append(row)
+    return np.vstack([random_rows, np.asarray(split_rows)])
+
+
+def wrapper_predict(model, frame):
+    return np.asarray(model.predict(frame), dtype=int), model.predict_proba(frame)
+
+
+def check_parity(name, model, scorer, matrix, feature_names):
+    frame = pd.DataFrame(matrix, columns=feature_names)
+    expected = wrapper_predict(model, frame)
+    actual = scorer.predict_with_proba(matrix)
+    mismatches = int(np.sum(expected[0] != actual[0])) + int(np.sum(np.any(expected[1] != actual[1], axis=1)))
+
+    for idx in range(0, len(matrix), max(1, len(matrix) // 200)):
+        single = scorer.predict_with_proba(matrix[idx:idx + 1])
+        if single[0][0] != expected[0][idx] or not np.array_equal(single[1][0], expected[1][idx]):
+            mismatches += 1
+    print(f"{name}: {len(matrix)} rows, {mismatches} mismatches")
+    return mismatches
+
+
+def time_single_row(func, runs):
+    timings = np.empty(runs)
+    for idx in range(runs):
+        started = time.perf_counter()
+        func()
+        timings[idx] = time.perf_counter() - started
+    return np.percentile(timings, 50) * 1e6, np.percentile(timings, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and time the compiled tree scorers.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--timing-runs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bundle = model_registry.get_bundle()
+    print(f"Model bundle {bundle.version}")
+    matrix = build_inputs(bundle, args.rows, args.seed)
+    feature_names = bundle.feature_names
+    scorers = {
+        "xgboost": (bundle.xgboost, XGBoostScorer(bundle.xgboost)),
+        "adaboost": (bundle.adaboost, AdaBoostScorer(bundle.adaboost)),
+    }
+
+    mismatches = sum(
+        check_parity(name, model, scorer, matrix, feature_names) for name, (model, scorer) in scorers.items()
+    )
+
+    row = matrix[:1]
+    frame = pd.DataFrame(row, columns=feature_names)
+    for name, (model, scorer) in scorers.items():
+        wrapper = time_single_row(lambda: wrapper_predict(model, frame), args.timing_runs)
+        compiled = time_single_row(lambda: scorer.predict_with_proba(row), args.timing_runs)
+        print(
+            f"{name} single row: wrapper p50 {wrapper[0]:.1f}us p99 {wrapper[1]:.1f}us, "
+            f"compiled p50 {compiled[0]:.1f}us p99 {compiled[1]:.1f}us"
+        )
+
+    if mismatches:
+        print("FAILED: compiled scorers differ from the wrappers")
+        sys.exit(1)
+    print("OK: compiled scorers are bit-identical to the wrappers")
+
+
+if __name__ == "__main__":
+    main()
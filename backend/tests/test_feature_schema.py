@@ -0,0 +1,119 @@
+"""``FeatureSchema`` and ``DenseNetwork`` against the pandas/sklearn/Keras reference path."""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from app.services import model_registry
+from app.services.dense_runtime import DenseNetwork
+from app.services.feature_schema import DROP_COLUMNS, FeatureSchema
+
+FEATURE_NAMES = ["a", "b", "kind_x", "kind_y", "b_high", "c"]
+
+
+def _reference(frame: pd.DataFrame, scaler) -> np.ndarray:
+    """The encoding the advanced models were trained with: per-row ``get_dummies``, aligned, scaled."""
+    rows = []
+    for _, row in frame.iterrows():
+        encoded = pd.get_dummies(pd.DataFrame([row.to_dict()]).drop(columns=list(DROP_COLUMNS), errors="ignore"))
+        encoded = encoded.apply(pd.to_numeric, errors="coerce")
+        rows.append(encoded.reindex(columns=FEATURE_NAMES, fill_value=0.0).fillna(0.0).iloc[0])
+    aligned = pd.DataFrame(rows, columns=FEATURE_NAMES).astype(float)
+    if aligned.empty:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+    return np.asarray(scaler.transform(aligned), dtype=np.float32)
+
+
+@pytest.fixture(params=[StandardScaler, MinMaxScaler])
+def scaler(request):
+    rng = np.random.default_rng(0)
+    train = pd.DataFrame(rng.standard_normal((200, len(FEATURE_NAMES))) * 5 + 3, columns=FEATURE_NAMES)
+    return request.param().fit(train)
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame(
+        {
+            "a": [1.5, np.nan, -3.0, 1e6, 0.0],
+            # Mixed column: numbers stay numeric, text becomes an indicator, unknown text is dropped.
+            "b": [2.0, "high", None, "unseen", 7],
+            # "z" and None are categories the model has never seen.
+            "kind": ["x", "y", "z", None, "x"],
+            "breaker_id": ["br-1", "br-2", "br-3", "br-4", "br-5"],
+            "not_a_feature": [1, 2, 3, 4, 5],
+            # "c" is missing entirely.
+        }
+    )
+
+
+def test_frame_matches_reference(frame, scaler):
+    schema = FeatureSchema(FEATURE_NAMES, scaler)
+
+    actual = schema.transform(frame)
+
+    assert actual.dtype == np.float32
+    np.testing.assert_array_equal(actual, _reference(frame, scaler))
+
+
+def test_records_match_reference(frame, scaler):
+    schema = FeatureSchema(FEATURE_NAMES, scaler)
+    records = frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+    np.testing.assert_array_equal(schema.transform(records), _reference(frame, scaler))
+
+
+def test_empty_input(scaler):
+    schema = FeatureSchema(FEATURE_NAMES, scaler)
+
+    assert schema.transform(pd.DataFrame(columns=["a", "kind"])).shape == (0, len(FEATURE_NAMES))
+    assert schema.transform([]).shape == (0, len(FEATURE_NAMES))
+
+
+def test_bundle_schema_matches_reference():
+    bundle = model_registry.get_bundle()
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame(rng.standard_normal((50, len(bundle.feature_names))), columns=bundle.feature_names)
+    data["breaker_id"] = "br-1"
+    data = data.drop(columns=bundle.feature_names[-1])
+
+    aligned = data.drop(columns="breaker_id").reindex(columns=bundle.feature_names, fill_value=0.0)
+    expected = bundle.scaler.transform(aligned)
+    np.testing.assert_array_equal(bundle.feature_schema.transform(data), np.asarray(expected, dtype=np.float32))
+
+
+@pytest.fixture(scope="module")
+def keras():
+    return pytest.importorskip("tensorflow").keras
+
+
+def test_dense_network_matches_keras(keras):
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential(
+        [
+            keras.Input(shape=(12,)),
+            keras.layers.Dense(8, activation="relu"),
+            keras.layers.Dense(4, activation="tanh"),
+            keras.layers.Dense(8, activation="sigmoid"),
+            keras.layers.Dense(12, activation="linear"),
+        ]
+    )
+    network = DenseNetwork.from_keras(model)
+    x = np.random.default_rng(2).standard_normal((300, 12)).astype(np.float32) * 4
+
+    np.testing.assert_allclose(network.predict(x), model.predict(x, verbose=0), rtol=1e-5, atol=1e-6)
+    assert network.predict(np.empty((0, 12))).shape == (0, 12)
+
+
+def test_bundle_autoencoder_weights_match_keras(keras):
+    bundle = model_registry.get_bundle()
+    artifacts = bundle.manifest["artifacts"]
+    if "autoencoder" not in artifacts or "autoencoder_weights" not in artifacts:
+        pytest.skip("bundle does not ship both autoencoder formats")
+    model = keras.models.load_model(bundle.path / artifacts["autoencoder"]["file"], compile=False)
+    network = DenseNetwork.load(bundle.path / artifacts["autoencoder_weights"]["file"])
+
+    rng = np.random.default_rng(3)
+    data = pd.DataFrame(rng.standard_normal((200, len(bundle.feature_names))) * 3, columns=bundle.feature_names)
+    x = bundle.feature_schema.transform(data)
+    np.testing.assert_allclose(network.predict(x), model.predict(x, verbose=0), rtol=1e-5, atol=1e-6)
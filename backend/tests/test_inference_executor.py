@@ -0,0 +1,86 @@
+"""Every function the routers send through ``run_inference`` must survive the process boundary."""
+import asyncio
+import threading
+
+import pandas as pd
+import pytest
+
+from app.services import (
+    advanced_models_service,
+    csv_ingest,
+    diagnostics_service,
+    inference_executor,
+    shap_service,
+    warmup,
+)
+
+from .conftest import SAMPLE_CSV
+
+ROWS = 8
+
+
+@pytest.fixture(scope="module")
+def sample_frame():
+    return pd.read_csv(SAMPLE_CSV, nrows=ROWS)
+
+
+@pytest.fixture(scope="module")
+def window_features():
+    ingested = csv_ingest.ingest_csv(SAMPLE_CSV, expected_rows=5000, diagnostic_rows=ROWS, include_shap=True)
+    assert ingested.window_features is not None
+    return ingested.window_features
+
+
+@pytest.fixture
+def executor_mode(monkeypatch):
+    def use(mode):
+        inference_executor.shutdown()
+        monkeypatch.setattr(inference_executor, "INFERENCE_EXECUTOR", mode)
+        inference_executor._pickle_checked.clear()
+
+    yield use
+    inference_executor.shutdown()
+
+
+def _calls(sample_frame, window_features):
+    """(function, args) for every ``run_inference`` call site in app/routers and warm-up."""
+    records = sample_frame.to_dict(orient="records")
+    return [
+        (warmup.warm_models, ()),
+        (diagnostics_service.check_models_ready, ()),
+        (advanced_models_service.check_advanced_models_ready, ()),
+        (diagnostics_service.predict_batch, (sample_frame,)),
+        (diagnostics_service.predict_batch_versioned, (records,)),
+        (advanced_models_service.batch_predict, (sample_frame,)),
+        (advanced_models_service.batch_predict_with_models, (records,)),
+        (shap_service.explain_window_features, (window_features,)),
+    ]
+
+
+def test_router_calls_run_on_a_process_pool(executor_mode, sample_frame, window_features):
+    executor_mode("process")
+
+    async def run_all():
+        return [
+            await inference_executor.run_inference(func, *args) for func, args in _calls(sample_frame, window_features)
+        ]
+
+    results = asyncio.run(run_all())
+    assert all(result is not None for result in results)
+
+
+def test_thread_executor_rejects_unpicklable_results(executor_mode):
+    executor_mode("thread")
+
+    with pytest.raises(TypeError, match="cannot be pickled"):
+        asyncio.run(inference_executor.run_inference(threading.Lock))
+
+
+def test_thread_executor_accepts_router_calls(executor_mode, sample_frame, window_features):
+    executor_mode("thread")
+
+    async def run_all():
+        for func, args in _calls(sample_frame, window_features):
+            await inference_executor.run_inference(func, *args)
+
+    asyncio.run(run_all())
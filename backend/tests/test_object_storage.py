@@ -0,0 +1,75 @@
+import cloudinary.api
+import cloudinary.uploader
+import pytest
+
+from app.services.object_storage import CloudinaryStorage, LocalStorage
+
+SHA = "ab" * 32
+
+
+class FakeCloudinary:
+    def __init__(self, resources=()):
+        self.resources = list(resources)
+        self.admin_calls = 0
+        self.uploads = 0
+
+    def resources_by_tag(self, tag, **kwargs):
+        self.admin_calls += 1
+        return {"resources": self.resources}
+
+    def upload(self, handle, **kwargs):
+        self.uploads += 1
+        return {
+            "asset_id": "asset-1",
+            "public_id": f"{kwargs['folder']}/{kwargs['public_id']}",
+            "secure_url": "https://res.example/raw/upload/upload-1.csv",
+            "bytes": len(handle.read()),
+            "format": "csv",
+        }
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeCloudinary()
+    monkeypatch.setattr(cloudinary.api, "resources_by_tag", fake.resources_by_tag)
+    monkeypatch.setattr(cloudinary.uploader, "upload", fake.upload)
+    return fake
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "upload.csv"
+    path.write_text("time,value\n0,1\n")
+    return path
+
+
+def test_indexed_hash_skips_the_admin_api(fake, tmp_path, csv_file):
+    size = csv_file.stat().st_size
+    first = CloudinaryStorage(index_dir=tmp_path / "index")
+    stored = first.put(csv_file, "upload-1", size, SHA)
+    assert fake.uploads == 1 and fake.admin_calls == 1
+
+    # A fresh instance (new worker / restart) has an empty in-memory cache but shares the index.
+    second = CloudinaryStorage(index_dir=tmp_path / "index")
+    again = second.put(csv_file, "upload-2", size, SHA)
+    assert fake.admin_calls == 1 and fake.uploads == 1
+    assert again.deduplicated and again.public_id == stored.public_id
+
+
+def test_admin_api_hit_is_recorded(fake, tmp_path, csv_file):
+    fake.resources = [{"asset_id": "asset-9", "public_id": "dcrm/csv/old", "secure_url": "https://x", "bytes": 3}]
+
+    CloudinaryStorage(index_dir=tmp_path / "index").put(csv_file, "upload-1", 3, SHA)
+    found = CloudinaryStorage(index_dir=tmp_path / "index").find(SHA)
+
+    assert fake.admin_calls == 1 and fake.uploads == 0
+    assert found.public_id == "dcrm/csv/old" and not found.deduplicated
+
+
+def test_local_storage_round_trip(tmp_path, csv_file):
+    storage = LocalStorage(tmp_path / "objects", base_url="")
+    size = csv_file.stat().st_size
+    storage.put(csv_file, "upload-1", size, SHA)
+
+    assert LocalStorage(tmp_path / "objects", base_url="").put(csv_file, "upload-2", size, SHA).deduplicated
+    assert storage.read_range(SHA, 5, 10) == csv_file.read_bytes()[5:10]
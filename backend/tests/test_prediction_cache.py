@@ -0,0 +1,34 @@
+from app.services.prediction_cache import PredictionCache
+
+FEATURES = {"a": 1.0, "b": "x"}
+
+
+def test_hit_after_set():
+    cache = PredictionCache()
+    key = cache.key(FEATURES)
+    cache.set(key, cache.generation, "v1", {"diagnosis": "Healthy"})
+
+    assert cache.get(cache.key(dict(FEATURES))) == {"diagnosis": "Healthy"}
+
+
+def test_result_scored_before_a_swap_is_not_cached():
+    cache = PredictionCache()
+    key = cache.key(FEATURES)
+    generation = cache.generation  # request dispatched on the old bundle
+
+    cache.clear()  # registry swap
+    cache.set(key, generation, "v1", {"diagnosis": "old"})
+    assert cache.get(key) is None
+
+    cache.set(key, cache.generation, "v2", {"diagnosis": "new"})
+    assert cache.get(key) == {"diagnosis": "new"}
+
+
+def test_other_versions_do_not_flip_the_cache():
+    cache = PredictionCache()
+    key = cache.key(FEATURES)
+    cache.set(key, cache.generation, "v2", {"diagnosis": "new"})
+    cache.set(cache.key({"a": 2.0}), cache.generation, "v1", {"diagnosis": "old"})
+
+    assert cache.get(key) == {"diagnosis": "new"}
+    assert cache.get(cache.key({"a": 2.0})) is None
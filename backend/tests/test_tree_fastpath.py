@@ -0,0 +1,84 @@
+"""Compiled tree scorers must reproduce ``predict``/``predict_proba`` of the library wrappers."""
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import AdaBoostClassifier
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+from app.services import model_registry
+from app.services.tree_fastpath import AdaBoostScorer, TreeScorers, XGBoostScorer
+
+N_FEATURES = 6
+
+
+def _dataset(n_classes, rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, N_FEATURES))
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1] + 0.3 * rng.standard_normal(rows), np.linspace(-1, 1, n_classes - 1))
+    return X, y
+
+
+def _probe(model, rows=2000, seed=1, missing=False):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, N_FEATURES)) * rng.choice([0.01, 1.0, 100.0], (rows, 1))
+    # Rows sitting exactly on split thresholds exercise the <= comparison and float32 rounding.
+    estimators = getattr(model, "estimators_", [])
+    for tree in (est.tree_ for est in estimators[:5]):
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature >= 0:
+                row = rng.standard_normal(N_FEATURES)
+                row[feature] = np.float32(threshold)
+                X = np.vstack([X, row])
+    if missing:  # XGBoost only; AdaBoost rejects NaN inputs
+        X[::97, 2] = np.nan
+    return X
+
+
+def _assert_parity(model, scorer, X):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected_labels = np.asarray(model.predict(X), dtype=int)
+        expected_proba = model.predict_proba(X)
+    labels, proba = scorer.predict_with_proba(X)
+
+    np.testing.assert_array_equal(labels, expected_labels)
+    assert np.allclose(proba, expected_proba, rtol=0, atol=1e-12)
+    # Single rows take the same path as a request to /predict.
+    for idx in range(0, len(X), 250):
+        single_labels, single_proba = scorer.predict_with_proba(X[idx : idx + 1])
+        assert single_labels[0] == expected_labels[idx]
+        assert np.allclose(single_proba[0], expected_proba[idx], rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("n_classes", [2, 4])
+def test_xgboost_scorer_matches_wrapper(n_classes):
+    X, y = _dataset(n_classes)
+    model = XGBClassifier(n_estimators=25, max_depth=4, learning_rate=0.3).fit(X, y)
+
+    _assert_parity(model, XGBoostScorer(model), _probe(model, missing=True))
+
+
+@pytest.mark.parametrize("algorithm", ["SAMME", "SAMME.R"])
+@pytest.mark.parametrize("n_classes", [2, 4])
+def test_adaboost_scorer_matches_wrapper(algorithm, n_classes):
+    X, y = _dataset(n_classes)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)  # SAMME.R deprecation
+        model = AdaBoostClassifier(
+            DecisionTreeClassifier(max_depth=3), n_estimators=20, algorithm=algorithm, random_state=0
+        ).fit(X, y)
+
+    _assert_parity(model, AdaBoostScorer(model), _probe(model))
+
+
+def test_bundle_models_compile_and_match():
+    bundle = model_registry.get_bundle()
+    scorers = TreeScorers(bundle.xgboost, bundle.adaboost, bundle.feature_names)
+    assert all(scorer is not None for scorer in scorers.compiled.values())
+
+    rng = np.random.default_rng(2)
+    X = rng.standard_normal((1000, len(bundle.feature_names))) * rng.choice([0.1, 1.0, 10.0], (1000, 1))
+    for name, model in (("xgboost", bundle.xgboost), ("adaboost", bundle.adaboost)):
+        _assert_parity(model, scorers.compiled[name], X)
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import uploads
+from app.services import inference_executor, object_storage, upload_jobs, waveform_store
+
+from .conftest import SAMPLE_CSV
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Upload routes on the default process-pool executor, archiving to a temp directory."""
+    monkeypatch.setattr(inference_executor, "INFERENCE_EXECUTOR", "process")
+    monkeypatch.setattr(waveform_store, "WAVEFORM_STORE_DIR", tmp_path / "waveforms")
+    inference_executor.shutdown()
+    object_storage.set_storage(object_storage.LocalStorage(tmp_path / "objects", base_url=""))
+    upload_jobs.set_job_store(upload_jobs.InMemoryJobStore())
+
+    app = FastAPI()
+    app.include_router(uploads.router)
+    with TestClient(app) as test_client:
+        yield test_client
+    inference_executor.shutdown()
+    object_storage.set_storage(None)
+    upload_jobs.set_job_store(None)
+
+
+def _post_sample(client, url):
+    with SAMPLE_CSV.open("rb") as handle:
+        return client.post(url, files={"file": ("faulty_sample.csv", handle, "text/csv")})
+
+
+def _assert_scored(body):
+    assert body["diagnosticsProcessedRows"] > 0
+    assert len(body["diagnostics"]) == body["diagnosticsProcessedRows"]
+    assert body["advancedDiagnostics"]
+
+
+def test_upload_scores_through_process_pool(client):
+    response = _post_sample(client, "/api/v1/uploads/")
+
+    assert response.status_code == 200, response.text
+    _assert_scored(response.json())
+
+
+def test_upload_job_scores_through_process_pool(client):
+    response = _post_sample(client, "/api/v1/uploads/jobs")
+    assert response.status_code == 202, response.text
+    job_id = response.json()["jobId"]
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/uploads/jobs/{job_id}").json()
+        if job["status"] in (upload_jobs.JOB_SUCCEEDED, upload_jobs.JOB_FAILED):
+            break
+        time.sleep(0.2)
+
+    assert job["status"] == upload_jobs.JOB_SUCCEEDED, job
+    result = client.get(f"/api/v1/uploads/jobs/{job_id}/result")
+    assert result.status_code == 200, result.text
+    _assert_scored(result.json())
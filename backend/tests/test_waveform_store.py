@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from app.services import waveform_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    root = tmp_path / "waveforms"
+    monkeypatch.setattr(waveform_store, "WAVEFORM_STORE_DIR", root)
+    return root
+
+
+def _write(public_id):
+    writer = waveform_store.WaveformWriter(["Time (ms)", "Resistance CH1 (microOhm)"], "ab" * 32)
+    writer.update(pd.DataFrame({"Time (ms)": [0.0, 0.1], "Resistance CH1 (microOhm)": [50.0, 51.0]}))
+    return writer, writer.commit(public_id)
+
+
+def test_folder_ids_round_trip(store):
+    _, path = _write("dcrm/csv/upload-1")
+
+    assert path.parent == store.resolve()
+    waveform = waveform_store.open_waveform("dcrm/csv/upload-1")
+    assert waveform is not None
+    assert waveform.column("Resistance CH1 (microOhm)").tolist() == [50.0, 51.0]
+
+
+@pytest.mark.parametrize("public_id", ["", ".", "..", ".staging", "../outside", "..\\x"])
+def test_ids_outside_the_store_are_refused(store, public_id):
+    assert waveform_store.open_waveform(public_id) is None
+    with pytest.raises(ValueError):
+        waveform_store._artifact_dir(public_id)
+
+
+@pytest.mark.parametrize("public_id", ["/etc/passwd", "a/../../x", "folder/.."])
+def test_separators_stay_inside_one_directory(store, public_id):
+    assert waveform_store._artifact_dir(public_id).parent == store.resolve()
+
+
+def test_commit_with_invalid_id_discards_staging(store):
+    writer = waveform_store.WaveformWriter(["Time (ms)"], "ab" * 32)
+    with pytest.raises(ValueError):
+        writer.commit("..")
+
+    assert not writer.path.exists()
+    assert not (store.parent / "manifest.json").exists()
@@ -180,11 +180,12 @@ export function ChatArea() {
           })
         }
 
-        if (result.waveformPreview?.points?.length) {
+        if (result.waveformPreview?.timeMs?.length) {
+          const { rowCount, totalRows } = result.waveformPreview
           uploadMessages.push({
             id: (Date.now() + 20).toString(),
             role: "assistant",
-            content: `Waveform preview ready. ${result.waveformPreview.points.length} samples synced to the dashboard charts.`,
+            content: `Waveform preview ready. ${rowCount} of ${totalRows} samples synced to the dashboard charts.`,
             timestamp: new Date(),
           })
         }
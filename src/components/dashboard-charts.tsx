@@ -107,14 +107,14 @@ const singleChartConfig = {
 export function DashboardCharts() {
   const { preview } = useWaveformPreview()
   const waveformData = React.useMemo(() => {
-    if (preview?.points?.length && preview.valueColumns?.length) {
+    if (preview?.timeMs?.length && preview.valueColumns?.length) {
       const columns = preview.valueColumns
-      const data = preview.points.map((point, idx) => {
+      const data = preview.timeMs.map((timeMs, idx) => {
         const row: Record<string, number | null | undefined> = {
-          timeMs: point.timeMs ?? idx,
+          timeMs: timeMs ?? idx,
         }
         columns.forEach((column) => {
-          row[column] = point.values?.[column] ?? null
+          row[column] = preview.series?.[column]?.[idx] ?? null
         })
         return row
       })
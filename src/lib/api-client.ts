@@ -117,11 +117,14 @@ export interface UploadResponse {
   secureUrl: string;
   bytes: number;
   format: string;
+  contentSha256?: string | null;
+  deduplicated?: boolean;
   diagnostics?: DiagnosticResult[];
   diagnosticsProcessedRows?: number;
   diagnosticsTotalRows?: number;
   advancedDiagnostics?: AdvancedDiagnosticResultDto[];
   waveformPreview?: WaveformPreviewDto;
+  testResultId?: string | null;
 }
 
 export function uploadCsv(file: File) {
@@ -133,6 +136,33 @@ export function uploadCsv(file: File) {
   });
 }
 
+export interface UploadJobDto {
+  jobId: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  fileName: string;
+  includeShap: boolean;
+  error?: string | null;
+  createdAt: string;
+  updatedAt: string;
+}
+
+export function submitUploadJob(file: File, includeShap = false) {
+  const formData = new FormData();
+  formData.append("file", file);
+  return apiFetch<UploadJobDto>(`/api/v1/uploads/jobs?include_shap=${includeShap}`, {
+    method: "POST",
+    body: formData,
+  });
+}
+
+export function getUploadJob(jobId: string) {
+  return apiFetch<UploadJobDto>(`/api/v1/uploads/jobs/${encodeURIComponent(jobId)}`);
+}
+
+export function getUploadJobResult(jobId: string) {
+  return apiFetch<UploadResponse>(`/api/v1/uploads/jobs/${encodeURIComponent(jobId)}/result`);
+}
+
 export interface ClassifierResultDto {
   label: string;
   confidence: number;
@@ -197,17 +227,15 @@ export interface AdvancedBatchEnvelopeDto {
   results: AdvancedDiagnosticResultDto[];
 }
 
-export interface WaveformPointDto {
-  timeMs: number;
-  values: Record<string, number | null | undefined>;
-}
-
 export interface WaveformPreviewDto {
   rowCount: number;
+  totalRows: number;
+  downsampling?: string | null;
   sourceName?: string;
   valueColumns: string[];
   columnMap?: Record<string, string>;
-  points: WaveformPointDto[];
+  timeMs: number[];
+  series: Record<string, Array<number | null>>;
 }
 
 export function getAdvancedModelStatus() {